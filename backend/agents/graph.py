@@ -1,12 +1,20 @@
 """
 LangGraph ReAct agent with Cerebras.
 Supports onboarding mode and coaching mode routing.
+The graph runs asynchronously: model calls stream through the async client and
+tools (sync DB code) run on worker threads.
+The graph is compiled once; per-turn dependencies travel in config["configurable"]:
+`db` (SQLAlchemy session), `session_id`, and an optional `emit` callback that
+receives token and tool events as they happen.
 """
 import os
 import json
+import asyncio
 import logging
-from typing import Literal
+from typing import AsyncIterator, Callable, Literal, Optional
 
+import anyio.to_thread
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 from sqlalchemy.orm import Session
@@ -17,10 +25,14 @@ from agents.prompts import (
     COACHING_SYSTEM_PROMPT,
     ONBOARDING_QUESTIONS,
 )
-from tools.bias_tools import TOOLS_SCHEMA, TOOL_MAP
+from tools.bias_tools import TOOLS_SCHEMA, TOOL_MAP, turn_scope
+from agents import memory
+from metrics import span
 
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = os.getenv("CEREBRAS_MODEL", "llama3.1-8b")
+
 # Lazy-init Cerebras client
 _cerebras_client = None
 
@@ -28,11 +40,19 @@ _cerebras_client = None
 def _get_client():
     global _cerebras_client
     if _cerebras_client is None:
-        from cerebras.cloud.sdk import Cerebras
-        _cerebras_client = Cerebras(api_key=os.environ.get("CEREBRAS_API_KEY"))
+        from cerebras.cloud.sdk import AsyncCerebras
+        # The SDK reads CEREBRAS_BASE_URL, so any OpenAI-compatible server works.
+        # TCP warming makes a blocking request from a throwaway sync client; skip it.
+        _cerebras_client = AsyncCerebras(api_key=os.environ.get("CEREBRAS_API_KEY"), warm_tcp_connection=False)
     return _cerebras_client
 
 
+def _emit(config: Optional[RunnableConfig], event_type: str, **data):
+    emit = (config or {}).get("configurable", {}).get("emit")
+    if emit is not None:
+        emit({"type": event_type, **data})
+
+
 def _build_system_prompt(state: AgentState) -> str:
     if not state.get("onboarding_complete", False):
         profile = state.get("psychological_profile", {})
@@ -54,37 +74,53 @@ def _build_system_prompt(state: AgentState) -> str:
         )
 
 
-def call_model(state: AgentState) -> AgentState:
-    """Call Cerebras LLM with appropriate system prompt."""
+async def call_model(state: AgentState, config: RunnableConfig) -> AgentState:
+    """Call Cerebras LLM with appropriate system prompt, streaming tokens to the emitter."""
+    with span("agent.call_model"):
+        return await _call_model(state, config)
+
+
+async def _call_model(state: AgentState, config: RunnableConfig) -> AgentState:
     client = _get_client()
     system_prompt = _build_system_prompt(state)
 
     messages = [{"role": "system", "content": system_prompt}] + list(state["messages"])
 
-    response = client.chat.completions.create(
-        model="llama3.1-8b",
+    stream = await client.chat.completions.create(
+        model=MODEL_NAME,
         messages=messages,
         tools=TOOLS_SCHEMA,
         tool_choice="auto",
         max_tokens=1024,
+        stream=True,
     )
 
-    ai_message = response.choices[0].message
-    content = ai_message.content or ""
-    msg_dict = {"role": "assistant", "content": content}
-    
-    if hasattr(ai_message, "tool_calls") and ai_message.tool_calls:
-        msg_dict["tool_calls"] = [
-            {
-                "id": tc.id,
+    parts = []
+    tool_calls = {}     # index -> tool call assembled from deltas
+    async for chunk in stream:
+        if not getattr(chunk, "choices", None):
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            parts.append(delta.content)
+            _emit(config, "token", content=delta.content)
+        for tc in delta.tool_calls or []:
+            call = tool_calls.setdefault(tc.index or 0, {
+                "id": None,
                 "type": "function",
-                "function": {
-                    "name": tc.function.name,
-                    "arguments": tc.function.arguments,
-                },
-            }
-            for tc in ai_message.tool_calls
-        ]
+                "function": {"name": "", "arguments": ""},
+            })
+            if tc.id:
+                call["id"] = tc.id
+            if tc.function is not None:
+                call["function"]["name"] += tc.function.name or ""
+                call["function"]["arguments"] += tc.function.arguments or ""
+
+    content = "".join(parts)
+    msg_dict = {"role": "assistant", "content": content}
+
+    if tool_calls:
+        msg_dict["tool_calls"] = [tool_calls[i] for i in sorted(tool_calls)]
     else:
         # Fallback for models that output pseudo-JSON tool calls inside the content
         import re
@@ -115,8 +151,45 @@ def call_model(state: AgentState) -> AgentState:
     }
 
 
-def call_tools(state: AgentState, db: Session) -> AgentState:
+def _run_tool(fn_name: str, args: dict, session_id: str, db: Session) -> str:
+    tool_fn = TOOL_MAP.get(fn_name)
+    if not tool_fn:
+        return f"Unknown tool: {fn_name}"
+    try:
+        # All tools take session_id and db as first args
+        with span(f"agent.tool.{fn_name}"):
+            if "profile_update" in args:
+                return tool_fn(session_id, args["profile_update"], db)
+            elif "adjustments_json" in args:
+                return tool_fn(session_id, args["adjustments_json"], db)
+            elif "by" in args:
+                return tool_fn(session_id, args["by"], db)
+            elif fn_name == "get_range_analysis":
+                return tool_fn(session_id, args.get("date_from"), args.get("date_to"), args.get("asset"), db)
+            else:
+                return tool_fn(session_id, db)
+    except Exception as e:
+        return f"Tool error: {str(e)}"
+
+
+def _session_updates(session_id: str, db: Session) -> dict:
+    from models.db_models import TradingSession
+    session_obj = db.query(TradingSession).filter(TradingSession.id == session_id).first()
+    if not session_obj:
+        return {}
+    return {
+        "onboarding_complete": session_obj.onboarding_complete,
+        "psychological_profile": session_obj.get_psychological_profile(),
+    }
+
+
+async def call_tools(state: AgentState, config: RunnableConfig) -> AgentState:
     """Execute any tool calls from the last assistant message."""
+    with span("agent.call_tools"):
+        return await _call_tools(state, config)
+
+
+async def _call_tools(state: AgentState, config: RunnableConfig) -> AgentState:
     last_msg = state["messages"][-1]
     tool_calls = last_msg.get("tool_calls", [])
 
@@ -124,7 +197,8 @@ def call_tools(state: AgentState, db: Session) -> AgentState:
         return state
 
     tool_results = []
-    session_id = state["session_id"]
+    db = config["configurable"]["db"]
+    session_id = config["configurable"].get("session_id", state["session_id"])
 
     for tc in tool_calls:
         fn_name = tc["function"]["name"]
@@ -134,20 +208,9 @@ def call_tools(state: AgentState, db: Session) -> AgentState:
         except json.JSONDecodeError:
             args = {}
 
-        tool_fn = TOOL_MAP.get(fn_name)
-        if tool_fn:
-            try:
-                # All tools take session_id and db as first args
-                if "profile_update" in args:
-                    result = tool_fn(session_id, args["profile_update"], db)
-                elif "adjustments_json" in args:
-                    result = tool_fn(session_id, args["adjustments_json"], db)
-                else:
-                    result = tool_fn(session_id, db)
-            except Exception as e:
-                result = f"Tool error: {str(e)}"
-        else:
-            result = f"Unknown tool: {fn_name}"
+        _emit(config, "tool_start", name=fn_name)
+        result = await anyio.to_thread.run_sync(_run_tool, fn_name, args, session_id, db)
+        _emit(config, "tool_end", name=fn_name)
 
         tool_results.append({
             "role": "tool",
@@ -156,13 +219,8 @@ def call_tools(state: AgentState, db: Session) -> AgentState:
         })
 
     # After tool calls, re-fetch onboarding state from DB
-    from models.db_models import TradingSession
-    session_obj = db.query(TradingSession).filter(TradingSession.id == session_id).first()
     updates = {"messages": tool_results}
-    if session_obj:
-        updates["onboarding_complete"] = session_obj.onboarding_complete
-        updates["psychological_profile"] = session_obj.get_psychological_profile()
-
+    updates.update(await anyio.to_thread.run_sync(_session_updates, session_id, db))
     return updates
 
 
@@ -173,15 +231,11 @@ def should_continue(state: AgentState) -> Literal["call_tools", "end"]:
     return "end"
 
 
-def build_graph(db: Session):
-    """Build and compile the LangGraph graph, injecting db dependency."""
-
-    def _call_tools_with_db(state: AgentState):
-        return call_tools(state, db)
-
+def build_graph():
+    """Build and compile the LangGraph graph. Use get_graph() for the shared instance."""
     workflow = StateGraph(AgentState)
     workflow.add_node("call_model", call_model)
-    workflow.add_node("call_tools", _call_tools_with_db)
+    workflow.add_node("call_tools", call_tools)
 
     workflow.set_entry_point("call_model")
     workflow.add_conditional_edges(
@@ -197,15 +251,52 @@ def build_graph(db: Session):
     return workflow.compile()
 
 
+_graph = None
+
+
+def get_graph():
+    """The compiled graph, built on first use and shared by every turn."""
+    global _graph
+    if _graph is None:
+        _graph = build_graph()
+    return _graph
+
+
 async def run_agent(
     session_id: str,
     message: str,
     history: list,
     db: Session,
+    emit: Optional[Callable[[dict], None]] = None,
 ):
     """
     Run the agent for one turn. Returns (response_text, updated_session).
+    `emit` receives token / tool_start / tool_end events while the turn runs.
+    The conversation so far comes from server-side memory (agents/memory.py);
+    `history` only seeds it for sessions that have none stored yet.
     """
+    session_obj, initial_state, unsummarized = await anyio.to_thread.run_sync(
+        _start_turn, session_id, message, history, db
+    )
+
+    config = {"configurable": {"db": db, "session_id": session_id, "emit": emit}}
+    with span("agent.graph"), turn_scope() as reports:
+        result = await get_graph().ainvoke(initial_state, config=config)
+    tool_calls = sum(1 for m in result["messages"] if m.get("role") == "tool")
+    logger.info(f"Agent turn for {session_id}: {tool_calls} tool calls, {reports.parses} report parses")
+
+    # Re-fetch session after graph execution (tools may have updated it)
+    await anyio.to_thread.run_sync(db.refresh, session_obj)
+
+    response_text = result["messages"][-1].get("content", "")
+    turn = [{"role": "user", "content": message}, {"role": "assistant", "content": response_text}]
+    await anyio.to_thread.run_sync(memory.save_messages, db, session_id, turn)
+    if memory.needs_compaction(unsummarized + turn):
+        memory.schedule_compaction(session_id)
+    return response_text, session_obj
+
+
+def _start_turn(session_id: str, message: str, history: list, db: Session):
     from models.db_models import TradingSession
 
     session_obj = db.query(TradingSession).filter(TradingSession.id == session_id).first()
@@ -218,19 +309,35 @@ async def run_agent(
 
     psych_profile = session_obj.get_psychological_profile()
 
+    summary, unsummarized = memory.load_memory(db, session_obj)
+    if summary is None and not unsummarized and history:
+        # Clients that still send the transcript seed the stored memory once
+        memory.save_messages(db, session_id, history)
+        unsummarized = list(history)
+
     initial_state: AgentState = {
-        "messages": history + [{"role": "user", "content": message}],
+        "messages": memory.build_context(summary, unsummarized) + [{"role": "user", "content": message}],
         "session_id": session_id,
         "onboarding_complete": session_obj.onboarding_complete,
         "psychological_profile": psych_profile,
         "turn_count": session_obj.chat_turn_count,
     }
+    return session_obj, initial_state, unsummarized
 
-    graph = build_graph(db)
-    result = graph.invoke(initial_state)
 
-    # Re-fetch session after graph execution (tools may have updated it)
-    db.refresh(session_obj)
-
-    response_text = result["messages"][-1].get("content", "")
-    return response_text, session_obj
+async def stream_agent(session_id: str, message: str, history: list, db: Session) -> AsyncIterator[dict]:
+    """
+    Run one turn, yielding its events as they happen and finally
+    {"type": "done", "response": ..., "session": updated_session}.
+    Errors from the turn propagate; closing the iterator cancels the turn.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(run_agent(session_id, message, history, db, emit=queue.put_nowait))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while (event := await queue.get()) is not None:
+            yield event
+        response_text, session_obj = task.result()
+        yield {"type": "done", "response": response_text, "session": session_obj}
+    finally:
+        task.cancel()
@@ -0,0 +1,136 @@
+"""
+Server-side conversation memory.
+Each turn's user message and final reply are stored in `chat_messages`. The
+prompt carries a rolling summary of older messages plus the most recent ones
+verbatim, within CHAT_CONTEXT_TOKENS, so prompt size stays flat however long
+a coaching session runs. Once the unsummarized messages overflow the budget,
+the oldest are folded into the summary in the background after the turn.
+"""
+import os
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+import anyio.to_thread
+from sqlalchemy.orm import Session
+
+from agents.prompts import SUMMARY_SYSTEM_PROMPT
+from models.db_models import ChatMessage, TradingSession
+
+logger = logging.getLogger(__name__)
+
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "2000"))
+SUMMARY_MAX_WORDS = 200
+
+_compacting: set = set()
+_background: set = set()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English chat)."""
+    return len(text) // 4 + 1
+
+
+def load_memory(db: Session, session: TradingSession) -> Tuple[Optional[str], List[dict]]:
+    """The session's rolling summary and the stored messages it does not cover yet."""
+    query = db.query(ChatMessage).filter(ChatMessage.session_id == session.id)
+    if session.chat_summary_through is not None:
+        query = query.filter(ChatMessage.id > session.chat_summary_through)
+    rows = query.order_by(ChatMessage.id).all()
+    return session.chat_summary, [{"role": r.role, "content": r.content} for r in rows]
+
+
+def build_context(summary: Optional[str], messages: List[dict], budget: int = CHAT_CONTEXT_TOKENS) -> List[dict]:
+    """Summary first, then as many of the newest messages as fit in `budget` tokens (at least one)."""
+    used = estimate_tokens(summary) if summary else 0
+    recent = []
+    for message in reversed(messages):
+        cost = estimate_tokens(message["content"])
+        if recent and used + cost > budget:
+            break
+        recent.append(message)
+        used += cost
+    recent.reverse()
+
+    context = []
+    if summary:
+        context.append({"role": "system", "content": f"Summary of the conversation so far:\n{summary}"})
+    return context + recent
+
+
+def save_messages(db: Session, session_id: str, messages: List[dict]):
+    db.add_all(ChatMessage(session_id=session_id, role=m["role"], content=m["content"]) for m in messages)
+    db.commit()
+
+
+def needs_compaction(messages: List[dict], budget: int = CHAT_CONTEXT_TOKENS) -> bool:
+    return sum(estimate_tokens(m["content"]) for m in messages) > budget
+
+
+def schedule_compaction(session_id: str, budget: int = CHAT_CONTEXT_TOKENS):
+    """Compact in the background; at most one compaction per session at a time."""
+    if session_id in _compacting:
+        return
+    _compacting.add(session_id)
+    task = asyncio.create_task(compact(session_id, budget))
+    _background.add(task)
+
+    def _done(t):
+        _background.discard(t)
+        _compacting.discard(session_id)
+
+    task.add_done_callback(_done)
+
+
+async def compact(session_id: str, budget: int = CHAT_CONTEXT_TOKENS):
+    """Fold the oldest unsummarized messages into the summary, leaving about half the budget verbatim."""
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        session = await anyio.to_thread.run_sync(
+            lambda: db.query(TradingSession).filter(TradingSession.id == session_id).first()
+        )
+        if not session:
+            return
+        query = db.query(ChatMessage).filter(ChatMessage.session_id == session_id)
+        if session.chat_summary_through is not None:
+            query = query.filter(ChatMessage.id > session.chat_summary_through)
+        rows = await anyio.to_thread.run_sync(lambda: query.order_by(ChatMessage.id).all())
+
+        kept, split = 0, len(rows)
+        for i in range(len(rows) - 1, -1, -1):
+            cost = estimate_tokens(rows[i].content)
+            if kept + cost > budget // 2:
+                break
+            kept += cost
+            split = i
+        old = rows[:split]
+        if not old:
+            return
+
+        session.chat_summary = await summarize(session.chat_summary, old)
+        session.chat_summary_through = old[-1].id
+        await anyio.to_thread.run_sync(db.commit)
+    except Exception as e:
+        # The budget still caps the prompt; the next turn retries
+        logger.warning(f"Conversation compaction failed for session {session_id}: {e}")
+    finally:
+        await anyio.to_thread.run_sync(db.close)
+
+
+async def summarize(summary: Optional[str], messages: List[ChatMessage]) -> str:
+    from agents.graph import _get_client, MODEL_NAME
+
+    transcript = "\n".join(f"{m.role}: {m.content}" for m in messages)
+    response = await _get_client().chat.completions.create(
+        model=MODEL_NAME,
+        messages=[
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT.format(
+                max_words=SUMMARY_MAX_WORDS, summary=summary or "(none yet)",
+            )},
+            {"role": "user", "content": transcript},
+        ],
+        max_tokens=SUMMARY_MAX_WORDS * 2,
+    )
+    return response.choices[0].message.content.strip()
@@ -48,3 +48,12 @@ Rules:
 Conversation turn count: {turn_count}
 If turn_count > 10, reduce follow-up questions to only when very relevant.
 """
+
+SUMMARY_SYSTEM_PROMPT = """You maintain the running memory of a coaching conversation between a trading psychology coach and a trader.
+
+Update the summary below with the new messages. Keep every fact the coach may need later: the trader's stated habits and feelings, numbers quoted from their data, recommendations given and whether the trader accepted them, and open questions.
+Write plain prose, at most {max_words} words. Return only the updated summary.
+
+Current summary:
+{summary}
+"""
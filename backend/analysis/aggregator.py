@@ -1,44 +1,82 @@
 """
-Aggregator — runs all bias detectors concurrently using ThreadPoolExecutor.
+Aggregator — runs all bias detectors concurrently on an execution backend
+(inline, thread pool or shared-memory process pool; see analysis/execution.py).
+The report holds only the analysis; chart series are served by GET /session/{id}/trades.
+
+Each detector folds trades into a small running state, so a session's analysis
+state can be updated with appended trades and the report rebuilt from it
+without touching the trades already analyzed.
 """
-import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from typing import Callable, Optional
 
 import pandas as pd
 
-from analysis.overtrading import detect_overtrading
-from analysis.loss_aversion import detect_loss_aversion
-from analysis.revenge_trading import detect_revenge_trading
-from analysis.risk_profile import compute_risk_profile
-from analysis.ml_scoring import predict_bias_scores
+from analysis.overtrading import update_overtrading_state, overtrading_result
+from analysis.loss_aversion import update_loss_aversion_state, loss_aversion_result
+from analysis.revenge_trading import update_revenge_state, revenge_result
+from analysis.features import build_feature_frame, update_feature_context
+from analysis.execution import run_updates
+from analysis.session_stats import update_session_stats, pnl_std
+from analysis.risk_profile import risk_profile_from_stats
+from analysis.ml_scoring import features_from_stats, predict_from_features, model_version
+from analysis.breakdown import bias_breakdown
+from metrics import span
+
 
+# Bump when a state layout changes so stored states are rebuilt from the trades
+ANALYSIS_STATE_VERSION = 2
 
-DETECTORS = [
-    detect_overtrading,
-    detect_loss_aversion,
-    detect_revenge_trading,
-]
+DETECTORS = {
+    "overtrading": (update_overtrading_state, overtrading_result),
+    "loss_aversion": (update_loss_aversion_state, loss_aversion_result),
+    "revenge_trading": (update_revenge_state, revenge_result),
+}
 
 
-def run_full_analysis(df: pd.DataFrame, session_id: str) -> dict:
+def update_analysis_state(state: dict | None, df: pd.DataFrame, backend: Optional[str] = None,
+                          on_done: Optional[Callable[[str, int, int], None]] = None) -> dict:
     """
-    Runs all detectors in parallel using ThreadPoolExecutor.
-    Returns full report dict.
+    Folds a chunk of trades into every detector's state in parallel.
+    Pass state=None to analyze from scratch; otherwise `df` must only hold
+    trades after the ones already folded in.
+    The shared feature frame is built once and handed to every detector.
+    `backend` overrides the execution backend chosen from the chunk size;
+    `on_done(name, completed, total)` is called as each detector finishes.
     """
-    bias_results = [None] * len(DETECTORS)
-
-    with ThreadPoolExecutor(max_workers=len(DETECTORS)) as executor:
-        future_to_idx = {
-            executor.submit(detector, df): idx
-            for idx, detector in enumerate(DETECTORS)
-        }
-        for future in as_completed(future_to_idx):
-            idx = future_to_idx[future]
-            bias_results[idx] = future.result()
-            
+    state = state or {}
+    with span("analysis.features"):
+        features = build_feature_frame(df, state.get("context"))
+    updaters = {name: update for name, (update, _) in DETECTORS.items()}
+    updaters["session"] = update_session_stats
+
+    new_state = {
+        "version": ANALYSIS_STATE_VERSION,
+        "context": update_feature_context(state.get("context"), df, features),
+    }
+    new_state.update(run_updates(updaters, state, df, features, backend, on_done))
+    return new_state
+
+
+def is_current_state(state: dict | None, trade_count: int) -> bool:
+    """True if `state` was built by this code version and covers all `trade_count` trades."""
+    return bool(state) and state.get("version") == ANALYSIS_STATE_VERSION and state["session"]["n"] == trade_count
+
+
+def analysis_version() -> str:
+    """Identifies the detector state layout and ML model that produced a report (part of cache keys)."""
+    return f"{ANALYSIS_STATE_VERSION}:{model_version()}"
+
+
+def build_report(state: dict, session_id: str) -> dict:
+    """Builds the full report dict from an analysis state."""
+    bias_results = [result(state[name]) for name, (_, result) in DETECTORS.items()]
+    stats = state["session"]
+    n = stats["n"]
+
     # --- Override deterministic scores with ML predictions ---
-    ml_scores = predict_bias_scores(df)
+    with span("analysis.ml_predict"):
+        ml_scores = predict_from_features(features_from_stats(stats))
     for result in bias_results:
         # Match by ID to safely map predictions
         if result["bias"] == "overtrading":
@@ -47,7 +85,7 @@ def run_full_analysis(df: pd.DataFrame, session_id: str) -> dict:
             result["score"] = ml_scores["loss_aversion"] / 100.0
         elif result["bias"] == "revenge_trading":
             result["score"] = ml_scores["revenge"] / 100.0
-            
+
         # Update severity string based on new ML score
         sc = result["score"] * 100
         if sc < 40:
@@ -61,7 +99,11 @@ def run_full_analysis(df: pd.DataFrame, session_id: str) -> dict:
     scores = [b["score"] for b in bias_results]
     overall_risk_score = round(sum(scores) / len(scores), 3) if scores else 0.0
 
-    risk_profile = compute_risk_profile(df, bias_results)
+    if n == 0:
+        mean_balance = 1.0
+    else:
+        mean_balance = stats["balance_sum"] / stats["balance_count"] if stats["balance_count"] else float("nan")
+    risk_profile = risk_profile_from_stats(mean_balance, pnl_std(stats), bias_results)
 
     # Pick top recommendation from highest-scoring bias
     worst_bias = max(bias_results, key=lambda b: b["score"])
@@ -69,23 +111,20 @@ def run_full_analysis(df: pd.DataFrame, session_id: str) -> dict:
     if worst_bias.get("recommendations"):
         top_rec = worst_bias["recommendations"][0]["text"]
 
-    # Date range
-    date_from = str(df["timestamp"].min())
-    date_to = str(df["timestamp"].max())
+    # Date range (trades are stored sorted by timestamp)
+    date_from = str(pd.Timestamp(stats["first_timestamp"]))
+    date_to = str(pd.Timestamp(stats["last_timestamp"]))
 
     # Trade stats for frontend
-    win_count = int((df["profit_loss"] > 0).sum())
-    loss_count = int((df["profit_loss"] < 0).sum())
-    win_rate = round(win_count / len(df), 3) if len(df) > 0 else 0.0
-    avg_pnl = round(float(df["profit_loss"].mean()), 2) if len(df) > 0 else 0.0
-
-    # No capped sampling; send full dataset for charts (as requested)
-    display_df = df
+    win_count = stats["win_count"]
+    loss_count = stats["loss_count"]
+    win_rate = round(win_count / n, 3) if n > 0 else 0.0
+    avg_pnl = round(stats["pnl_mean"], 2) if n > 0 else 0.0
 
     report = {
         "session_id": session_id,
         "generated_at": datetime.utcnow().isoformat(),
-        "trade_count": len(df),
+        "trade_count": n,
         "date_range": {"from": date_from, "to": date_to},
         "biases": bias_results,
         "risk_profile": risk_profile,
@@ -96,10 +135,25 @@ def run_full_analysis(df: pd.DataFrame, session_id: str) -> dict:
             "loss_count": loss_count,
             "win_rate": win_rate,
             "avg_pnl": avg_pnl,
-            "total_pnl": round(float(df["profit_loss"].sum()), 2),
+            "avg_win": round(stats["win_sum"] / win_count, 2) if win_count > 0 else 0.0,
+            "avg_loss": round(abs(stats["loss_sum"]) / loss_count, 2) if loss_count > 0 else 0.0,
+            "total_pnl": round(stats["pnl_sum"], 2),
         },
-        # Sampled trade data for charts (max 5000 points)
-        "trades": json.loads(display_df.to_json(orient="records", date_format="iso")),
     }
 
     return report
+
+
+def run_full_analysis(df: pd.DataFrame, session_id: str, backend: Optional[str] = None,
+                      breakdown: bool = False) -> dict:
+    """
+    Runs all detectors in parallel over the whole DataFrame.
+    Returns full report dict; `breakdown` adds per-asset and per-side scores.
+    """
+    state = update_analysis_state(None, df, backend)
+    with span("analysis.report"):
+        report = build_report(state, session_id)
+    if breakdown:
+        with span("analysis.breakdown"):
+            report["breakdown"] = bias_breakdown(df)
+    return report
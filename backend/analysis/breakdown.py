@@ -0,0 +1,46 @@
+"""
+Per-asset and per-side bias breakdown.
+
+Each group (every asset, BUY / SELL) is scored as if its trades were a session
+of their own — the same scores as running the detectors on each group's
+slice — but for all groups in one grouped pass: trades are stably reordered by
+group, features are built per group (features.grouped_feature_frame) and the
+signals are scored together (analysis/grouped_scores.py).
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from analysis.features import grouped_feature_frame
+from analysis.grouped_scores import group_scores, score_record
+
+BREAKDOWN_KEYS = ("asset", "side")
+
+
+def bias_breakdown(df: pd.DataFrame, by: Sequence[str] = BREAKDOWN_KEYS) -> Dict[str, List[dict]]:
+    """
+    For each column in `by`, one record per value — {<column>: value,
+    trade_count, scores, ml_scores} — ordered by trade count (largest first).
+    `df` must be sorted by timestamp.
+    """
+    return {key: _breakdown_by(df, key) for key in by}
+
+
+def _breakdown_by(df: pd.DataFrame, key: str) -> List[dict]:
+    if len(df) == 0:
+        return []
+    codes, labels = pd.factorize(df[key], sort=True, use_na_sentinel=False)
+    # Stable, so each group keeps its trades in time order
+    order = np.argsort(codes, kind="stable")
+    grouped = df.iloc[order].reset_index(drop=True)
+    groups = codes[order]
+    starts = np.r_[True, groups[1:] != groups[:-1]]
+
+    scores = group_scores(grouped, grouped_feature_frame(grouped, groups), groups, starts)
+    records = [
+        {key: None if pd.isna(labels[code]) else str(labels[code]), **score_record(row)}
+        for code, row in zip(scores.index, scores.itertuples())
+    ]
+    records.sort(key=lambda r: r["trade_count"], reverse=True)
+    return records
@@ -0,0 +1,162 @@
+"""
+Execution backends for the aggregator's state updates.
+
+  inline  — run the updates one after another in the calling thread
+  thread  — fan out on a thread pool (cheap, but the pandas work mostly holds the GIL)
+  process — fan out on a process pool; the numeric trade and feature columns are
+            placed in one shared-memory block that workers map as NumPy views,
+            so nothing but the small state dicts is pickled
+
+ANALYSIS_BACKEND selects a backend ("auto" by default, which picks one from the
+row count using ANALYSIS_THREAD_MIN_ROWS / ANALYSIS_PROCESS_MIN_ROWS).
+Each update is timed where it runs and recorded as an `analysis.detector.<name>`
+stage in the calling process. An optional `on_done(name, completed, total)`
+callback is called in the calling thread as each update finishes (analysis
+jobs report their progress and stop early from it).
+"""
+import os
+import time
+import atexit
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from metrics import observe
+
+BACKENDS = ("inline", "thread", "process")
+
+THREAD_MIN_ROWS = int(os.getenv("ANALYSIS_THREAD_MIN_ROWS", "20000"))
+PROCESS_MIN_ROWS = int(os.getenv("ANALYSIS_PROCESS_MIN_ROWS", "500000"))
+
+# Trade columns the detectors read; strings (asset, side) never leave the parent
+SHARED_TRADE_COLUMNS = ["timestamp", "quantity", "entry_price", "exit_price", "profit_loss", "balance"]
+
+_ALIGN = 64
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def choose_backend(n_rows: int, backend: Optional[str] = None) -> str:
+    """Resolve the backend for a chunk of `n_rows` trades."""
+    backend = (backend or os.getenv("ANALYSIS_BACKEND", "auto")).lower()
+    if backend in BACKENDS:
+        return backend
+    if backend != "auto":
+        raise ValueError(f"Unknown analysis backend '{backend}'. Use one of: auto, {', '.join(BACKENDS)}")
+    if n_rows >= PROCESS_MIN_ROWS and (os.cpu_count() or 1) > 1:
+        return "process"
+    if n_rows >= THREAD_MIN_ROWS:
+        return "thread"
+    return "inline"
+
+
+def run_updates(
+    updaters: Dict[str, Callable],
+    states: Dict[str, Optional[dict]],
+    df: pd.DataFrame,
+    features: pd.DataFrame,
+    backend: Optional[str] = None,
+    on_done: Optional[Callable[[str, int, int], None]] = None,
+) -> Dict[str, dict]:
+    """Calls `update(states[name], df, features)` for every updater on the chosen backend."""
+    backend = choose_backend(len(df), backend)
+    timed = {}
+
+    def finished(name: str, result: Tuple[dict, float]):
+        timed[name] = result
+        if on_done is not None:
+            on_done(name, len(timed), len(updaters))
+
+    if backend == "inline":
+        for name, update in updaters.items():
+            finished(name, _timed(update, states.get(name), df, features))
+    elif backend == "thread":
+        with ThreadPoolExecutor(max_workers=len(updaters)) as executor:
+            future_to_name = {
+                executor.submit(_timed, update, states.get(name), df, features): name
+                for name, update in updaters.items()
+            }
+            for f in as_completed(future_to_name):
+                finished(future_to_name[f], f.result())
+    else:
+        _run_in_processes(updaters, states, df, features, finished)
+
+    results = {}
+    for name, (result, seconds) in timed.items():
+        observe(f"analysis.detector.{name}", seconds)
+        results[name] = result
+    return results
+
+
+def _timed(update: Callable, state: Optional[dict], df: pd.DataFrame, features: pd.DataFrame) -> Tuple[dict, float]:
+    start = time.perf_counter()
+    result = update(state, df, features)
+    return result, time.perf_counter() - start
+
+
+# ── Process backend ──────────────────────────────────
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # spawn, not fork: the API process runs threads (uvicorn, SQLAlchemy pool)
+        _process_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        atexit.register(_process_pool.shutdown, wait=False, cancel_futures=True)
+    return _process_pool
+
+
+def _share_frames(df: pd.DataFrame, features: pd.DataFrame) -> Tuple[shared_memory.SharedMemory, dict]:
+    """Copy the numeric columns into one shared-memory block. Returns it and its layout."""
+    arrays = [("df", c, df[c].to_numpy()) for c in SHARED_TRADE_COLUMNS]
+    arrays += [("features", c, features[c].to_numpy()) for c in features.columns]
+
+    layout, offset = [], 0
+    for frame, col, arr in arrays:
+        layout.append((frame, col, arr.dtype.str, offset))
+        offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for (frame, col, dtype, start), (_, _, arr) in zip(layout, arrays):
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf, offset=start)[:] = arr
+    return shm, {"name": shm.name, "rows": len(df), "columns": layout}
+
+
+def _attach_frames(spec: dict) -> Tuple[shared_memory.SharedMemory, pd.DataFrame, pd.DataFrame]:
+    """Worker side: map the shared block back into two DataFrames without copying."""
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    columns = {"df": {}, "features": {}}
+    for frame, col, dtype, start in spec["columns"]:
+        columns[frame][col] = np.ndarray((spec["rows"],), dtype=np.dtype(dtype), buffer=shm.buf, offset=start)
+    df = pd.DataFrame(columns["df"], copy=False)
+    features = pd.DataFrame(columns["features"], copy=False)
+    return shm, df, features
+
+
+def _process_worker(update: Callable, state: Optional[dict], spec: dict) -> Tuple[dict, float]:
+    shm, df, features = _attach_frames(spec)
+    try:
+        return _timed(update, state, df, features)
+    finally:
+        # The frames hold views into the block; release them before closing it
+        del df, features
+        shm.close()
+
+
+def _run_in_processes(updaters, states, df, features, finished: Callable[[str, Tuple[dict, float]], None]):
+    shm, spec = _share_frames(df, features)
+    try:
+        pool = _get_process_pool()
+        future_to_name = {
+            pool.submit(_process_worker, update, states.get(name), spec): name
+            for name, update in updaters.items()
+        }
+        for f in as_completed(future_to_name):
+            finished(future_to_name[f], f.result())
+    finally:
+        shm.close()
+        shm.unlink()
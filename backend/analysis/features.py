@@ -0,0 +1,112 @@
+"""
+Shared feature frame — the per-trade columns every detector and the ML scorer
+need, computed once per analysis run (or once per appended chunk).
+All operations are vectorized.
+"""
+import numpy as np
+import pandas as pd
+from analysis.utils import is_loss, is_win, rolling_avg_quantity
+
+ROLLING_WINDOW = 5
+
+
+def init_feature_context() -> dict:
+    """What a chunk needs from the trades before it: last timestamp, quantity tail, balance peak."""
+    return {
+        "last_timestamp": None,
+        "recent_quantities": [],    # last ROLLING_WINDOW-1 quantities
+        "peak_balance": None,
+    }
+
+
+def build_feature_frame(df: pd.DataFrame, context: dict | None = None) -> pd.DataFrame:
+    """
+    Returns a frame aligned with `df` holding:
+      hour, gap_seconds (NaN for the very first trade), gap_minutes (0 for it),
+      is_loss, is_win, rolling_qty, running_peak, drawdown_pct (fraction).
+    `context` carries the previous chunk's tail so appended chunks line up.
+    """
+    context = context or init_feature_context()
+    timestamp = df["timestamp"]
+
+    gap_seconds = timestamp.diff().dt.total_seconds().to_numpy(copy=True)
+    if context["last_timestamp"] is not None and len(df) > 0:
+        gap_seconds[0] = (timestamp.iloc[0] - pd.Timestamp(context["last_timestamp"])).total_seconds()
+    gap_minutes = gap_seconds / 60.0
+    gap_minutes[np.isnan(gap_minutes)] = 0
+
+    # Rolling average quantity, seeded with the previous chunk's tail
+    recent = context["recent_quantities"]
+    seeded = pd.DataFrame({"quantity": np.concatenate([recent, df["quantity"].to_numpy(dtype=float)])})
+    rolling_qty = rolling_avg_quantity(seeded, window=ROLLING_WINDOW).to_numpy()[len(recent):]
+    del seeded
+
+    running_peak = df["balance"].cummax().to_numpy()
+    if context["peak_balance"] is not None:
+        running_peak = np.where(np.isnan(running_peak), np.nan, np.fmax(running_peak, context["peak_balance"]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown_pct = (running_peak - df["balance"].to_numpy()) / np.where(running_peak == 0, np.nan, running_peak)
+
+    # Columns are handed over as arrays with copy=False so the frame never
+    # consolidates (and duplicates) them into 2-D blocks.
+    return pd.DataFrame({
+        "hour": timestamp.dt.hour.to_numpy().astype(np.int8),
+        "gap_seconds": gap_seconds,
+        "gap_minutes": gap_minutes,
+        "is_loss": is_loss(df).to_numpy(),
+        "is_win": is_win(df).to_numpy(),
+        "rolling_qty": rolling_qty,
+        "running_peak": running_peak,
+        "drawdown_pct": drawdown_pct,
+    }, index=df.index, copy=False)
+
+
+def update_feature_context(context: dict | None, df: pd.DataFrame, features: pd.DataFrame) -> dict:
+    """Advances the context past a chunk whose features were built from it."""
+    context = dict(context or init_feature_context())
+    if len(df) == 0:
+        return context
+    quantities = np.concatenate([context["recent_quantities"], df["quantity"].to_numpy(dtype=float)])
+    peaks = [p for p in (context["peak_balance"], features["running_peak"].max()) if p is not None and not np.isnan(p)]
+    context["last_timestamp"] = df["timestamp"].iloc[-1].isoformat()
+    context["recent_quantities"] = quantities[-(ROLLING_WINDOW - 1):].tolist()
+    context["peak_balance"] = float(max(peaks)) if peaks else None
+    return context
+
+
+def grouped_feature_frame(df: pd.DataFrame, groups: np.ndarray) -> pd.DataFrame:
+    """
+    build_feature_frame of each group of trades on its own, for many groups in
+    one pass. `groups` is aligned with `df`; each group's rows must be
+    contiguous and sorted by timestamp.
+    """
+    groups = np.asarray(groups)
+    starts = np.r_[True, groups[1:] != groups[:-1]] if len(groups) else np.zeros(0, dtype=bool)
+    features = build_feature_frame(df)
+
+    # Each group's first trade has no previous trade
+    gap_seconds = features["gap_seconds"].to_numpy(copy=True)
+    gap_seconds[starts] = np.nan
+    gap_minutes = gap_seconds / 60.0
+    gap_minutes[np.isnan(gap_minutes)] = 0
+
+    # Rolling average over the group's last ROLLING_WINDOW quantities
+    quantity = df["quantity"].to_numpy(dtype=float)
+    position = np.arange(len(df)) - np.maximum.accumulate(np.where(starts, np.arange(len(df)), 0))
+    rolling_sum = quantity.copy()
+    for lag in range(1, ROLLING_WINDOW):
+        in_group = position >= lag
+        rolling_sum[in_group] += quantity[np.flatnonzero(in_group) - lag]
+    rolling_qty = rolling_sum / np.minimum(position + 1, ROLLING_WINDOW)
+
+    running_peak = df["balance"].groupby(groups, sort=False).cummax().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown_pct = (running_peak - df["balance"].to_numpy()) / np.where(running_peak == 0, np.nan, running_peak)
+
+    return features.assign(
+        gap_seconds=gap_seconds,
+        gap_minutes=gap_minutes,
+        rolling_qty=rolling_qty,
+        running_peak=running_peak,
+        drawdown_pct=drawdown_pct,
+    )
@@ -0,0 +1,150 @@
+"""
+Compiled RandomForest inference — NumPy only.
+
+compile_forest() flattens a fitted scikit-learn RandomForestRegressor into
+one array per node attribute (every tree's nodes concatenated, child indexes
+made global) and saves them as .npy files next to a meta.json. Leaves point
+at themselves, so a walk that reaches one stays there. CompiledForest
+memory-maps the arrays and walks every (row, tree) pair one level per step,
+dropping pairs as they reach a leaf, so scoring needs neither sklearn nor a
+Python loop over trees.
+
+Predictions match sklearn exactly: inputs are cast to float32 before the
+threshold test, NaN follows each node's missing-value direction, and tree
+outputs are summed in estimator order before dividing, as sklearn does.
+
+    python -m analysis.forest bias_model.joblib bias_model_compiled
+"""
+import os
+import sys
+import json
+import hashlib
+from typing import List, Optional
+
+import numpy as np
+
+ARRAYS = ("feature", "threshold", "children", "missing_left", "value", "roots")
+
+# (row, tree) walkers advanced together; bounds the temporaries for large batches
+BLOCK_WALKERS = 1 << 17
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=12).hexdigest()
+
+
+def compile_forest(model, out_dir: str, source_path: Optional[str] = None) -> dict:
+    """Writes `model`'s trees to `out_dir` as flat arrays. Returns the metadata written."""
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    offsets = np.cumsum([0] + [t.node_count for t in trees])
+
+    def stacked(attr):
+        return np.concatenate([getattr(t, attr) for t in trees])
+
+    # (nodes, 2): global [left, right] child; a leaf's children are itself
+    own = np.arange(offsets[-1])
+    children = np.column_stack([
+        stacked("children_left") + np.repeat(offsets[:-1], [t.node_count for t in trees]),
+        stacked("children_right") + np.repeat(offsets[:-1], [t.node_count for t in trees]),
+    ])
+    leaf = stacked("children_left") == -1
+    children[leaf] = own[leaf, None]
+
+    arrays = {
+        "feature": np.where(leaf, 0, stacked("feature")).astype(np.int32),
+        "threshold": stacked("threshold").astype(np.float64),
+        "children": children.astype(np.int32),
+        "missing_left": stacked("missing_go_to_left").astype(np.bool_),
+        "value": stacked("value")[:, :, 0].astype(np.float64),     # (nodes, outputs)
+        "roots": offsets[:-1].astype(np.int32),
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), np.ascontiguousarray(array))
+
+    meta = {
+        "n_estimators": len(trees),
+        "n_outputs": int(model.n_outputs_),
+        "n_features": int(model.n_features_in_),
+        "feature_names": [str(f) for f in getattr(model, "feature_names_in_", [])],
+        "max_depth": int(max(t.max_depth for t in trees)),
+        "source": file_digest(source_path) if source_path else None,
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class CompiledForest:
+    """A compiled forest loaded from disk (memory-mapped by default)."""
+
+    def __init__(self, path: str, mmap: bool = True):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        mode = "r" if mmap else None
+        for name in ARRAYS:
+            # np.asarray keeps the mapping but drops the memmap subclass (and its per-result overhead)
+            setattr(self, name, np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)))
+        self._children_flat = self.children.reshape(-1)
+        self.feature_names: List[str] = self.meta["feature_names"]
+        self.version = self.meta["source"] or file_digest(os.path.join(path, "value.npy"))
+
+    def predict(self, X) -> np.ndarray:
+        """(n_rows, n_features) -> (n_rows, n_outputs), same as RandomForestRegressor.predict."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        n_trees = len(self.roots)
+        leaves = np.empty((len(X), n_trees), dtype=np.int32)
+        # Walk in blocks of rows so memory stays flat however many rows are scored
+        step = max(1, BLOCK_WALKERS // n_trees)
+        for start in range(0, len(X), step):
+            leaves[start:start + step] = self._leaves(X[start:start + step])
+
+        leaf_values = self.value[leaves]                # (rows, trees, outputs)
+        out = np.zeros((len(X), self.meta["n_outputs"]))
+        for t in range(n_trees):
+            out += leaf_values[:, t]
+        out /= n_trees
+        return out
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """(n_rows, n_trees) leaf node reached by each row in each tree."""
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        X_flat = np.ascontiguousarray(X).reshape(-1)
+        has_nan = bool(np.isnan(X_flat).any())
+
+        # One walker per (row, tree). Walkers on a leaf step onto it again, so
+        # finished ones are only dropped (into `leaves`) once enough pile up.
+        leaves = np.empty(n_rows * n_trees, dtype=np.int32)
+        active = np.arange(n_rows * n_trees, dtype=np.int32)
+        nodes = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.int32) * n_features, n_trees)
+        for _ in range(self.meta["max_depth"]):
+            x = X_flat[row_offset + self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            if has_nan:
+                go_left = np.where(np.isnan(x), self.missing_left[nodes], go_left)
+            step = self._children_flat[2 * nodes + ~go_left]
+            done = step == nodes
+            n_done = np.count_nonzero(done)
+            if n_done == len(nodes):
+                break
+            if n_done > len(nodes) // 4:
+                leaves[active[done]] = step[done]
+                moving = ~done
+                active, step, row_offset = active[moving], step[moving], row_offset[moving]
+            nodes = step
+        leaves[active] = nodes
+        return leaves.reshape(n_rows, n_trees)
+
+
+if __name__ == "__main__":
+    import joblib
+    source, target = (sys.argv[1:3] + [None, None])[:2]
+    source = source or "bias_model.joblib"
+    target = target or "bias_model_compiled"
+    meta = compile_forest(joblib.load(source), target, source_path=source)
+    print(f"Compiled {meta['n_estimators']} trees (max depth {meta['max_depth']}) from {source} into {target}/")
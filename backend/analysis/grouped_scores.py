@@ -0,0 +1,88 @@
+"""
+Bias scores for many groups of trades at once — behind the bias timeline
+(time windows) and the asset / side breakdown.
+
+Per-trade signals come from the detectors' *_trade_signals functions. They are
+summed per group with one groupby and scored with the detectors'
+*_window_scores rules; the ML model scores every group's features in one batch.
+"""
+import numpy as np
+import pandas as pd
+
+from analysis.overtrading import overtrading_trade_signals, overtrading_window_scores
+from analysis.loss_aversion import loss_aversion_trade_signals, loss_aversion_window_scores
+from analysis.revenge_trading import revenge_trade_signals, revenge_window_scores
+from analysis.session_stats import grouped_session_stats
+from analysis.ml_scoring import features_from_grouped_stats, predict_from_feature_frame
+
+BIAS_NAMES = ["overtrading", "loss_aversion", "revenge_trading"]
+
+_SUMMED_SIGNALS = [
+    "rapid", "post_event", "win", "loss", "win_pnl", "loss_abs",
+    "early_exit", "size_spike", "streak_escalation", "drawdown_rush",
+]
+
+
+def group_scores(df: pd.DataFrame, features: pd.DataFrame, groups: np.ndarray,
+                 starts: np.ndarray | None = None) -> pd.DataFrame:
+    """
+    One row per group, indexed by group id in ascending order: trade_count,
+    the detectors' rule scores (one column per BIAS_NAMES) and the model's
+    scores (ml_<name>), all 0-1. `groups` is aligned with `df`; each group's
+    rows must be contiguous and sorted by timestamp, group ids ascending.
+    `starts` (see the *_trade_signals functions) keeps each group's signals
+    from looking at its neighbours; without it they see the whole session.
+    """
+    over = overtrading_trade_signals(df, features, starts)
+    loss = loss_aversion_trade_signals(df, features)
+    revenge = revenge_trade_signals(df, features, starts)
+    signals = pd.DataFrame({
+        "group": groups,
+        "hour": over["hour"].to_numpy(),
+        "rapid": over["rapid"].to_numpy(),
+        "post_event": over["post_event"].to_numpy(),
+        "balance": over["balance"].to_numpy(),
+        "win": loss["win"].to_numpy(),
+        "loss": loss["loss"].to_numpy(),
+        "win_pnl": loss["win_pnl"].to_numpy(),
+        "loss_abs": loss["loss_abs"].to_numpy(),
+        "early_exit": loss["early_exit"].to_numpy(),
+        "size_spike": revenge["size_spike"].to_numpy(),
+        "streak_escalation": revenge["streak_escalation"].to_numpy(),
+        "drawdown_rush": revenge["drawdown_rush"].to_numpy(),
+    })
+    by_group = signals.groupby("group", sort=True)
+    sums = by_group[_SUMMED_SIGNALS].sum()
+    n = by_group.size().to_numpy()
+    max_hourly = signals.groupby(["group", "hour"]).size().groupby(level=0).max().to_numpy()
+
+    scores = pd.DataFrame({
+        "trade_count": n,
+        "overtrading": overtrading_window_scores(
+            n, max_hourly, sums["rapid"].to_numpy(), sums["post_event"].to_numpy(),
+            by_group["balance"].mean().to_numpy(),
+        ),
+        "loss_aversion": loss_aversion_window_scores(
+            n, sums["win"].to_numpy(), sums["loss"].to_numpy(), sums["win_pnl"].to_numpy(),
+            sums["loss_abs"].to_numpy(), sums["early_exit"].to_numpy(),
+        ),
+        "revenge_trading": revenge_window_scores(
+            n, sums["loss"].to_numpy(), sums["size_spike"].to_numpy(),
+            sums["streak_escalation"].to_numpy(), sums["drawdown_rush"].to_numpy(),
+        ),
+    }, index=sums.index)
+
+    # Model targets are in BIAS_NAMES order
+    ml = predict_from_feature_frame(features_from_grouped_stats(grouped_session_stats(df, groups))) / 100.0
+    for i, name in enumerate(BIAS_NAMES):
+        scores[f"ml_{name}"] = ml[:, i]
+    return scores
+
+
+def score_record(row) -> dict:
+    """trade_count, scores and ml_scores of one group_scores row (a namedtuple from itertuples)."""
+    return {
+        "trade_count": int(row.trade_count),
+        "scores": {name: float(getattr(row, name)) for name in BIAS_NAMES},
+        "ml_scores": {name: float(getattr(row, f"ml_{name}")) for name in BIAS_NAMES},
+    }
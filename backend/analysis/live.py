@@ -0,0 +1,145 @@
+"""
+Live bias signals — the detectors' per-trade rules applied one trade at a time.
+
+A LiveDetector keeps only what the next trade needs from the ones before it
+(last timestamp, the last few quantities, the balance peak, the open loss
+run), so its memory is constant however long a live session runs. Seeded
+from a session's stored analysis state, it continues where the uploaded
+history ends. Thresholds match the *_trade_signals functions of the
+overtrading and revenge trading detectors; an alert is raised on the trade
+that triggers it (the oversized trade after a loss, not the loss itself).
+"""
+import math
+from collections import deque
+from typing import List, Optional
+
+import pandas as pd
+
+from analysis.features import ROLLING_WINDOW
+
+RAPID_GAP_MINUTES = 10
+BIG_EVENT_PCT = 0.05
+POST_EVENT_MINUTES = 30
+SIZE_SPIKE_RATIO = 1.5
+STREAK_MIN_LOSSES = 3
+DRAWDOWN_RUSH_PCT = 0.10
+DRAWDOWN_RUSH_MINUTES = 15
+
+
+class LiveDetector:
+    """Online state of one live trade feed; update() folds in a trade and returns its alerts."""
+
+    __slots__ = (
+        "trade_count", "last_timestamp", "quantities", "rolling_qty", "peak_balance",
+        "last_quantity", "last_is_loss", "last_big_event", "loss_streak",
+        "gap_minutes", "drawdown_pct",
+    )
+
+    def __init__(self):
+        self.trade_count = 0
+        self.last_timestamp: Optional[pd.Timestamp] = None
+        self.quantities = deque(maxlen=ROLLING_WINDOW)
+        self.rolling_qty: Optional[float] = None
+        self.peak_balance: Optional[float] = None
+        self.last_quantity: Optional[float] = None
+        self.last_is_loss = False
+        self.last_big_event = False
+        self.loss_streak = 0
+        self.gap_minutes: Optional[float] = None
+        self.drawdown_pct = 0.0
+
+    @classmethod
+    def from_state(cls, state: Optional[dict]) -> "LiveDetector":
+        """Continues after the trades folded into `state` (an analysis state); None starts fresh."""
+        detector = cls()
+        if not state or not state["session"]["n"]:
+            return detector
+        context, revenge = state["context"], state["revenge_trading"]
+        detector.last_timestamp = pd.Timestamp(context["last_timestamp"])
+        detector.quantities.extend(context["recent_quantities"])
+        detector.peak_balance = context["peak_balance"]
+        detector.rolling_qty = revenge["last_rolling_avg"]
+        detector.last_quantity = revenge["last_quantity"]
+        detector.last_is_loss = revenge["last_is_loss"]
+        detector.loss_streak = revenge["loss_streak"]
+        detector.last_big_event = state["overtrading"]["last_big_event"]
+        return detector
+
+    def update(self, timestamp: pd.Timestamp, quantity: float, profit_loss: float, balance: float) -> List[dict]:
+        """Folds in the next trade (not older than the last one) and returns the alerts it triggers."""
+        alerts = []
+        gap = None
+        if self.last_timestamp is not None:
+            gap = (timestamp - self.last_timestamp).total_seconds() / 60.0
+            if gap < RAPID_GAP_MINUTES:
+                alerts.append(_alert(
+                    "overtrading", "rapid_trade", round(gap, 2),
+                    f"Trade placed {gap:.1f} min after the previous one (under {RAPID_GAP_MINUTES} min).",
+                ))
+            if self.last_big_event and gap < POST_EVENT_MINUTES:
+                alerts.append(_alert(
+                    "overtrading", "post_event", round(gap, 2),
+                    f"Trading {gap:.0f} min after a large win or loss; pause for {POST_EVENT_MINUTES} min after high-impact trades.",
+                ))
+
+        # Revenge rules look at the previous trade: a loss followed by a bigger position
+        if self.last_is_loss and self.last_quantity:
+            ratio = quantity / self.last_quantity
+            if ratio > SIZE_SPIKE_RATIO:
+                alerts.append(_alert(
+                    "revenge_trading", "size_spike", round(ratio, 2),
+                    f"Position {ratio:.1f}× the size of the losing trade before it.",
+                ))
+        if self.last_is_loss and self.loss_streak >= STREAK_MIN_LOSSES and self.rolling_qty:
+            ratio = quantity / self.rolling_qty
+            if ratio > SIZE_SPIKE_RATIO:
+                alerts.append(_alert(
+                    "revenge_trading", "streak_escalation", round(ratio, 2),
+                    f"Position {ratio:.1f}× your recent average after {self.loss_streak} losses in a row.",
+                ))
+
+        if self.peak_balance is None or balance > self.peak_balance:
+            self.peak_balance = balance
+        drawdown = (self.peak_balance - balance) / self.peak_balance if self.peak_balance else 0.0
+        if gap is not None and gap < DRAWDOWN_RUSH_MINUTES and drawdown > DRAWDOWN_RUSH_PCT:
+            alerts.append(_alert(
+                "revenge_trading", "drawdown_rush", round(drawdown, 4),
+                f"Trading {drawdown:.0%} below your peak balance, {gap:.0f} min after the previous trade.",
+            ))
+
+        is_loss = profit_loss < 0
+        self.trade_count += 1
+        self.last_timestamp = timestamp
+        self.quantities.append(quantity)
+        # Like the batch rolling mean, missing quantities are skipped
+        known = [q for q in self.quantities if not math.isnan(q)]
+        self.rolling_qty = sum(known) / len(known) if known else None
+        self.last_quantity = quantity
+        self.loss_streak = self.loss_streak + 1 if is_loss else 0
+        self.last_is_loss = is_loss
+        self.last_big_event = balance != 0 and abs(profit_loss) / balance > BIG_EVENT_PCT
+        self.gap_minutes = gap
+        self.drawdown_pct = drawdown
+        return alerts
+
+    def snapshot(self) -> dict:
+        """The running values behind the alerts, as of the last trade."""
+        return {
+            "gap_minutes": round(self.gap_minutes, 2) if self.gap_minutes is not None else None,
+            "loss_streak": self.loss_streak,
+            "rolling_quantity": self.rolling_qty,
+            "peak_balance": self.peak_balance,
+            "drawdown_pct": round(self.drawdown_pct, 4),
+        }
+
+
+def parse_timestamp(value: str) -> pd.Timestamp:
+    """A live trade's timestamp, naive like the stored ones (aware values are taken in UTC)."""
+    timestamp = pd.Timestamp(value)
+    if timestamp is pd.NaT:
+        raise ValueError(f"Invalid timestamp '{value}'.")
+    return timestamp.tz_convert(None) if timestamp.tzinfo is not None else timestamp
+
+
+def _alert(bias: str, signal: str, value: float, message: str) -> dict:
+    return {"bias": bias, "signal": signal, "value": value, "message": message}
@@ -1,27 +1,75 @@
 """
 Loss aversion bias detector.
 All operations use vectorized pandas — no Python loops.
+The detector keeps running sums so appended trades can be folded in
+without revisiting the session's history.
 """
 import pandas as pd
 import numpy as np
-from analysis.utils import is_loss, is_win, severity_from_score
+from analysis.features import build_feature_frame
+from analysis.utils import severity_from_score
 
 
-def detect_loss_aversion(df: pd.DataFrame) -> dict:
-    n = len(df)
-    if n == 0:
-        return _empty_result()
+def init_loss_aversion_state() -> dict:
+    return {
+        "n": 0,
+        "win_count": 0,
+        "loss_count": 0,
+        "win_sum": 0.0,
+        "loss_abs_sum": 0.0,
+        "early_exit_count": 0,
+    }
 
-    loss_mask = is_loss(df)
-    win_mask = is_win(df)
 
-    losses = df.loc[loss_mask, "profit_loss"]
-    wins = df.loc[win_mask, "profit_loss"]
+def loss_aversion_trade_signals(df: pd.DataFrame, features: pd.DataFrame) -> pd.DataFrame:
+    """Per-trade indicators and amounts: win, loss, win_pnl, loss_abs, early_exit."""
+    loss_mask = features["is_loss"]
+    win_mask = features["is_win"]
+
+    # Early winner exit: wins where profit < 30% of potential = |exit-entry| * qty
+    pnl = df["profit_loss"]
+    potential = (df["exit_price"] - df["entry_price"]).abs() * df["quantity"]
+    return pd.DataFrame({
+        "win": win_mask,
+        "loss": loss_mask,
+        "win_pnl": pnl.where(win_mask, 0.0),
+        "loss_abs": pnl.abs().where(loss_mask, 0.0),
+        "early_exit": win_mask & (pnl < 0.30 * potential),
+    }, index=df.index)
+
+
+def update_loss_aversion_state(state: dict, df: pd.DataFrame, features: pd.DataFrame) -> dict:
+    """Fold a chunk of trades into the state."""
+    state = dict(state or init_loss_aversion_state())
+    if len(df) == 0:
+        return state
+
+    signals = loss_aversion_trade_signals(df, features)
+    pnl = df["profit_loss"]
+    state["n"] += len(df)
+    state["win_count"] += int(signals["win"].sum())
+    state["loss_count"] += int(signals["loss"].sum())
+    state["win_sum"] += float(pnl[signals["win"]].sum())
+    state["loss_abs_sum"] += float(pnl[signals["loss"]].abs().sum())
+    state["early_exit_count"] += int(signals["early_exit"].sum())
+    return state
+
+
+def detect_loss_aversion(df: pd.DataFrame, features: pd.DataFrame | None = None) -> dict:
+    if features is None:
+        features = build_feature_frame(df)
+    return loss_aversion_result(update_loss_aversion_state(None, df, features))
+
+
+def loss_aversion_result(state: dict) -> dict:
+    n = state["n"]
+    if n == 0:
+        return _empty_result()
 
-    avg_loss = float(losses.abs().mean()) if len(losses) > 0 else 0.0
-    avg_win = float(wins.mean()) if len(wins) > 0 else 0.0
-    win_count = int(win_mask.sum())
-    loss_count = int(loss_mask.sum())
+    win_count = state["win_count"]
+    loss_count = state["loss_count"]
+    avg_loss = state["loss_abs_sum"] / loss_count if loss_count > 0 else 0.0
+    avg_win = state["win_sum"] / win_count if win_count > 0 else 0.0
     win_rate = win_count / n if n > 0 else 0.0
 
     signals = []
@@ -41,10 +89,7 @@ def detect_loss_aversion(df: pd.DataFrame) -> dict:
 
     # 2. early_winner_exit: wins where profit < 30% of potential = (exit-entry)*qty. Weight 0.20
     if win_count > 0:
-        win_df = df.loc[win_mask].copy()
-        potential = (win_df["exit_price"] - win_df["entry_price"]).abs() * win_df["quantity"]
-        early_exit_mask = win_df["profit_loss"] < 0.30 * potential
-        early_exit_count = int(early_exit_mask.sum())
+        early_exit_count = state["early_exit_count"]
         early_exit_pct = early_exit_count / win_count
         sig2_triggered = early_exit_pct > 0.30
     else:
@@ -110,6 +155,24 @@ def detect_loss_aversion(df: pd.DataFrame) -> dict:
     }
 
 
+def loss_aversion_window_scores(n, win_count, loss_count, win_sum, loss_abs_sum, early_exit_count) -> np.ndarray:
+    """loss_aversion_result's score for many windows at once, from per-window sums of the trade signals."""
+    n, win_count, loss_count = (np.asarray(a, dtype=float) for a in (n, win_count, loss_count))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_loss = np.where(loss_count > 0, loss_abs_sum / loss_count, 0.0)
+        avg_win = np.where(win_count > 0, win_sum / win_count, 0.0)
+        win_rate = np.where(n > 0, win_count / n, 0.0)
+        rr_ratio = np.where(avg_win > 0, avg_loss / avg_win, 0.0)
+        early_exit_pct = np.where(win_count > 0, early_exit_count / win_count, 0.0)
+    score = (
+        0.35 * ((avg_win > 0) & (avg_loss > 1.5 * avg_win))
+        + 0.20 * ((win_count > 0) & (early_exit_pct > 0.30))
+        + 0.35 * ((avg_win > 0) & (rr_ratio > 1.5))
+        + 0.10 * ((win_rate < 0.40) & (avg_loss > avg_win))
+    )
+    return np.where(n > 0, np.round(np.clip(score, 0.0, 1.0), 3), 0.0)
+
+
 def _empty_result():
     return {
         "bias": "loss_aversion",
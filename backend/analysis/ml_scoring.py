@@ -1,81 +1,150 @@
 import pandas as pd
 import numpy as np
-import joblib
 import os
+import logging
+import threading
+from typing import List
+
+from analysis.features import build_feature_frame
+from analysis.forest import CompiledForest, file_digest
+from analysis.session_stats import update_session_stats
+
+logger = logging.getLogger(__name__)
 
 model_path = os.path.join(os.path.dirname(__file__), "..", "bias_model.joblib")
+# NumPy export of model_path (python -m analysis.forest); scoring uses it when present
+compiled_model_path = os.path.join(os.path.dirname(__file__), "..", "bias_model_compiled")
 _ml_model = None
+_model_version = "none"
+_model_lock = threading.Lock()
 
 def get_model():
+    """The compiled forest (memory-mapped, no sklearn import), else the joblib model, else None."""
     global _ml_model
-    if _ml_model is None and os.path.exists(model_path):
-        _ml_model = joblib.load(model_path)
+    if _ml_model is None:
+        # Handlers run on a threadpool; load the model once, not once per thread
+        with _model_lock:
+            if _ml_model is None:
+                _ml_model = _load_model()
     return _ml_model
 
-def extract_features(df):
-    df = df.copy()
-    if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-    
-    df = df.sort_values("timestamp")
-    
-    # Feature 1: Trade frequency (avg seconds between trades)
-    if len(df) > 1:
-        time_diffs = df["timestamp"].diff().dt.total_seconds().dropna()
-        avg_time_between_trades = time_diffs.mean()
+def _load_model():
+    global _model_version
+    if os.path.exists(os.path.join(compiled_model_path, "meta.json")):
+        compiled = CompiledForest(compiled_model_path)
+        if not os.path.exists(model_path) or compiled.version == file_digest(model_path):
+            _model_version = compiled.version
+            return compiled
+        logger.warning("bias_model_compiled/ is older than bias_model.joblib; "
+                       "using sklearn until it is recompiled (python -m analysis.forest)")
+    if os.path.exists(model_path):
+        import joblib
+        stat = os.stat(model_path)
+        _model_version = f"{stat.st_size}-{int(stat.st_mtime)}"
+        return joblib.load(model_path)
+    return None
+
+def model_version() -> str:
+    """Identifies the loaded model (digest of the compiled model's source); "none" when no model is installed."""
+    get_model()
+    return _model_version
+
+FEATURE_COLUMNS = ["avg_time_between_trades", "loss_win_ratio", "avg_time_after_loss", "win_rate", "pnl_std"]
+
+
+def extract_features(df, features=None):
+    """Model features for a whole session; `features` is its shared feature frame if already built."""
+    if features is None:
+        if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+            df = df.assign(timestamp=pd.to_datetime(df["timestamp"]))
+        if not df["timestamp"].is_monotonic_increasing:
+            df = df.sort_values("timestamp")
+        features = build_feature_frame(df)
+    return features_from_stats(update_session_stats(None, df, features))
+
+
+def features_from_stats(stats: dict) -> dict:
+    """Model features from running session stats (see analysis/session_stats.py)."""
+    n = stats["n"]
+    if n > 1:
+        span = pd.Timestamp(stats["last_timestamp"]) - pd.Timestamp(stats["first_timestamp"])
+        span_seconds = span.total_seconds()
     else:
-        avg_time_between_trades = 3600
-        
-    # Feature 2: Loss to Win ratio
-    wins = df[df["profit_loss"] > 0]["profit_loss"]
-    losses = df[df["profit_loss"] < 0]["profit_loss"]
-    
-    avg_win = wins.mean() if len(wins) > 0 else 0.001
-    avg_loss = abs(losses.mean()) if len(losses) > 0 else 0.001
-    loss_win_ratio = avg_loss / avg_win if avg_win > 0 else 1.0
-    
-    # Feature 3: Time to re-entry after loss - VECTORIZED
-    # Create shifted profit_loss to detect trades after losses
-    prev_profit_loss = df["profit_loss"].shift(1)
-    time_diffs_after_loss = df["timestamp"].diff().dt.total_seconds()
-    
-    # Only consider times where previous trade was a loss
-    after_loss_mask = prev_profit_loss < 0
-    re_entry_times = time_diffs_after_loss[after_loss_mask].dropna()
-    
-    avg_time_after_loss = re_entry_times.mean() if len(re_entry_times) > 0 else avg_time_between_trades
-
-    # Feature 4: win rate
-    win_rate = len(wins) / len(df) if len(df) > 0 else 0.5
-    
-    # Feature 5: pnl std
-    pnl_std = df["profit_loss"].std() if len(df) > 1 else 0
-    
+        span_seconds = 0.0
+    columns = _feature_columns(dict(stats, span_seconds=span_seconds))
+    return {name: float(columns[name]) for name in FEATURE_COLUMNS}
+
+
+def features_from_grouped_stats(stats: pd.DataFrame) -> pd.DataFrame:
+    """Model features for every row of session_stats.grouped_session_stats (training)."""
+    return pd.DataFrame(_feature_columns(stats), index=stats.index)[FEATURE_COLUMNS]
+
+
+def _feature_columns(stats) -> dict:
+    """
+    The feature definitions, shared by scoring and training. `stats` maps
+    stat names to scalars (one session) or columns (one value per chunk).
+    """
+    n, win_count, loss_count, gap_count, pnl_count = (
+        np.asarray(stats[k], dtype=float)
+        for k in ("n", "win_count", "loss_count", "gap_after_loss_count", "pnl_count")
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Feature 1: Trade frequency (avg seconds between trades)
+        avg_time_between_trades = np.where(n > 1, np.asarray(stats["span_seconds"], dtype=float) / (n - 1), 3600.0)
+
+        # Feature 2: Loss to Win ratio
+        avg_win = np.where(win_count > 0, stats["win_sum"] / win_count, 0.001)
+        avg_loss = np.where(loss_count > 0, np.abs(stats["loss_sum"] / loss_count), 0.001)
+        loss_win_ratio = np.where(avg_win > 0, avg_loss / avg_win, 1.0)
+
+        # Feature 3: Time to re-entry after loss
+        avg_time_after_loss = np.where(gap_count > 0, stats["gap_after_loss_sum"] / gap_count, avg_time_between_trades)
+
+        # Feature 4: win rate
+        win_rate = np.where(n > 0, win_count / n, 0.5)
+
+        # Feature 5: pnl std (ddof=1, like pandas)
+        pnl_std = np.where(pnl_count > 1, np.sqrt(stats["pnl_m2"] / (pnl_count - 1)), 0.0)
+
     return {
         "avg_time_between_trades": avg_time_between_trades,
         "loss_win_ratio": loss_win_ratio,
         "avg_time_after_loss": avg_time_after_loss,
         "win_rate": win_rate,
-        "pnl_std": pnl_std
+        "pnl_std": pnl_std,
     }
 
 
-def predict_bias_scores(df: pd.DataFrame) -> dict:
+def predict_bias_scores(df: pd.DataFrame, features: pd.DataFrame | None = None) -> dict:
     """Predict Overtrading, Loss Aversion, and Revenge Trading scores"""
+    return predict_from_features(extract_features(df, features))
+
+
+def predict_from_features(features: dict) -> dict:
+    return predict_from_feature_rows([features])[0]
+
+
+def predict_from_feature_rows(rows: List[dict]) -> List[dict]:
+    """Scores many feature dicts in one model call."""
+    # Columns must match training
+    X = pd.DataFrame(rows, columns=FEATURE_COLUMNS, dtype=float)
+    preds = predict_from_feature_frame(X)
+    # Targets were modeled as: overtrading, loss_aversion, revenge
+    return [
+        {"overtrading": int(p[0]), "loss_aversion": int(p[1]), "revenge": int(p[2])}
+        for p in preds
+    ]
+
+
+def predict_from_feature_frame(features: pd.DataFrame) -> np.ndarray:
+    """(rows, 3) integer scores 0-100 — overtrading, loss_aversion, revenge — for a frame of FEATURE_COLUMNS."""
     model = get_model()
     if model is None:
-        return {"overtrading": 0, "loss_aversion": 0, "revenge": 0}
-        
-    features = extract_features(df)
-    X = pd.DataFrame([features])
-    
-    # Columns must match training: "avg_time_between_trades", "loss_win_ratio", "avg_time_after_loss", "win_rate", "pnl_std"
-    X = X[["avg_time_between_trades", "loss_win_ratio", "avg_time_after_loss", "win_rate", "pnl_std"]]
-    
-    preds = model.predict(X)[0] # Array of 3
-    # Targets were modeled as: overtrading, loss_aversion, revenge
-    return {
-        "overtrading": int(np.clip(preds[0], 0, 100)),
-        "loss_aversion": int(np.clip(preds[1], 0, 100)),
-        "revenge": int(np.clip(preds[2], 0, 100))
-    }
+        return np.zeros((len(features), 3), dtype=int)
+    X = features[FEATURE_COLUMNS].to_numpy(dtype=float)
+    if isinstance(model, CompiledForest):
+        preds = model.predict(X)
+    else:
+        preds = model.predict(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+    return np.clip(preds, 0, 100).astype(int)
@@ -1,13 +1,82 @@
 """
 Overtrading bias detector.
 All operations use vectorized pandas — no Python loops.
+The detector keeps a small running state so appended trades can be folded in
+without revisiting the session's history.
 """
+import numpy as np
 import pandas as pd
-from analysis.utils import time_gap_minutes, severity_from_score
+from analysis.features import build_feature_frame
+from analysis.utils import severity_from_score
 
 
-def detect_overtrading(df: pd.DataFrame) -> dict:
-    n = len(df)
+def init_overtrading_state() -> dict:
+    return {
+        "n": 0,
+        "hourly_counts": [0] * 24,
+        "rapid_pairs": 0,
+        "post_event_count": 0,
+        "balance_count": 0,
+        "balance_sum": 0.0,
+        "last_big_event": False,
+    }
+
+
+def overtrading_trade_signals(df: pd.DataFrame, features: pd.DataFrame, starts: np.ndarray | None = None) -> pd.DataFrame:
+    """
+    Per-trade indicators behind the signals: hour, rapid (<10 min after the
+    previous trade), big_event (|P&L| > 5% of balance), post_event (a big
+    event followed by a trade within 30 min; unknown for the last row) and balance.
+    `starts` marks rows that begin an independent sequence of trades
+    (see features.grouped_feature_frame); the row before each has no next trade.
+    """
+    gaps = features["gap_minutes"]
+    pct_impact = (df["profit_loss"].abs() / df["balance"].replace(0, float("nan"))).fillna(0)
+    big_events = pct_impact > 0.05
+    next_gap = gaps.shift(-1).fillna(999)
+    if starts is not None:
+        next_gap[np.r_[starts[1:], False]] = 999
+    return pd.DataFrame({
+        "hour": features["hour"],
+        "rapid": gaps < 10,
+        "big_event": big_events,
+        "post_event": big_events & (next_gap < 30),
+        "balance": df["balance"],
+    }, index=df.index)
+
+
+def update_overtrading_state(state: dict, df: pd.DataFrame, features: pd.DataFrame) -> dict:
+    """Fold a chunk of trades (sorted, all after the state's last trade) into the state."""
+    state = dict(state or init_overtrading_state())
+    if len(df) == 0:
+        return state
+
+    signals = overtrading_trade_signals(df, features)
+    hourly = np.bincount(signals["hour"].to_numpy(), minlength=24)
+
+    # The previous chunk's last trade is paired with this chunk's first gap
+    post_event = int(signals["post_event"].sum())
+    if state["last_big_event"] and features["gap_minutes"].iloc[0] < 30:
+        post_event += 1
+
+    state["n"] += len(df)
+    state["hourly_counts"] = [a + int(b) for a, b in zip(state["hourly_counts"], hourly)]
+    state["rapid_pairs"] += int(signals["rapid"].sum())
+    state["post_event_count"] += post_event
+    state["balance_count"] += int(df["balance"].count())
+    state["balance_sum"] += float(df["balance"].sum())
+    state["last_big_event"] = bool(signals["big_event"].iloc[-1])
+    return state
+
+
+def detect_overtrading(df: pd.DataFrame, features: pd.DataFrame | None = None) -> dict:
+    if features is None:
+        features = build_feature_frame(df)
+    return overtrading_result(update_overtrading_state(None, df, features))
+
+
+def overtrading_result(state: dict) -> dict:
+    n = state["n"]
     if n == 0:
         return _empty_result()
 
@@ -15,9 +84,9 @@ def detect_overtrading(df: pd.DataFrame) -> dict:
     score = 0.0
 
     # 1. Hourly spike: any hour > 5 trades
-    hourly_counts = df.groupby(df["timestamp"].dt.hour).size()
-    max_hourly = int(hourly_counts.max())
-    peak_hour = int(hourly_counts.idxmax())
+    hourly_counts = state["hourly_counts"]
+    max_hourly = int(max(hourly_counts))
+    peak_hour = int(np.argmax(hourly_counts))
     hourly_triggered = max_hourly > 5
     if hourly_triggered:
         score += 0.25
@@ -30,8 +99,7 @@ def detect_overtrading(df: pd.DataFrame) -> dict:
     })
 
     # 2. Rapid succession: consecutive gaps < 10 min > 10% of trades
-    gaps = time_gap_minutes(df)
-    rapid_pairs = int((gaps < 10).sum())
+    rapid_pairs = state["rapid_pairs"]
     rapid_ratio = rapid_pairs / n
     rapid_triggered = rapid_ratio > 0.10
     if rapid_triggered:
@@ -44,11 +112,7 @@ def detect_overtrading(df: pd.DataFrame) -> dict:
     })
 
     # 3. Post-event trading: trade opened within 30 min after abs(PL) > 5% of balance
-    pct_impact = (df["profit_loss"].abs() / df["balance"].replace(0, float("nan"))).fillna(0)
-    big_events = pct_impact > 0.05
-    # Shift: next trade's time gap from current
-    next_gap = time_gap_minutes(df).shift(-1).fillna(999)
-    post_event_count = int((big_events & (next_gap < 30)).sum())
+    post_event_count = state["post_event_count"]
     post_event_triggered = post_event_count > 0
     if post_event_triggered:
         score += 0.25
@@ -60,7 +124,7 @@ def detect_overtrading(df: pd.DataFrame) -> dict:
     })
 
     # 4. Trade frequency ratio: total / mean(balance) > 0.005
-    avg_balance = float(df["balance"].mean())
+    avg_balance = state["balance_sum"] / state["balance_count"] if state["balance_count"] else float("nan")
     freq_ratio = n / avg_balance if avg_balance > 0 else 0
     freq_triggered = freq_ratio > 0.005
     if freq_triggered:
@@ -100,6 +164,20 @@ def detect_overtrading(df: pd.DataFrame) -> dict:
     }
 
 
+def overtrading_window_scores(n, max_hourly, rapid, post_event, balance_mean) -> np.ndarray:
+    """overtrading_result's score for many windows at once, from per-window aggregates of the trade signals."""
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        freq_ratio = np.where(balance_mean > 0, n / balance_mean, 0.0)
+        triggered = (
+            (np.asarray(max_hourly) > 5).astype(int)
+            + (np.asarray(rapid) / n > 0.10)
+            + (np.asarray(post_event) > 0)
+            + (freq_ratio > 0.005)
+        )
+    return np.where(n > 0, np.round(np.clip(0.25 * triggered, 0.0, 1.0), 3), 0.0)
+
+
 def _empty_result():
     return {
         "bias": "overtrading",
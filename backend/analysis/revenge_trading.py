@@ -1,27 +1,131 @@
 """
 Revenge trading bias detector.
 All operations use vectorized pandas — no Python loops.
+The detector keeps the open loss streak and the last trade's quantities so
+appended trades can be folded in without revisiting history; rolling quantity,
+gaps and drawdown come from the shared feature frame.
 """
 import pandas as pd
 import numpy as np
-from analysis.utils import is_loss, time_gap_minutes, rolling_avg_quantity, severity_from_score
+from analysis.features import build_feature_frame
+from analysis.utils import severity_from_score
 
 
-def detect_revenge_trading(df: pd.DataFrame) -> dict:
-    n = len(df)
+def init_revenge_state() -> dict:
+    return {
+        "n": 0,
+        "loss_count": 0,
+        "size_spike_count": 0,
+        "streak_escalation_count": 0,   # escalations after closed loss runs of 3+
+        "loss_streak": 0,               # length of the loss run ending at the last trade
+        "streak_pending": 0,            # escalations inside that open run
+        "last_quantity": None,
+        "last_rolling_avg": None,
+        "last_is_loss": False,
+        "drawdown_rush_count": 0,
+    }
+
+
+def revenge_trade_signals(df: pd.DataFrame, features: pd.DataFrame, starts: np.ndarray | None = None) -> pd.DataFrame:
+    """
+    Per-trade indicators: loss, size_spike (next qty > 1.5× this losing trade's),
+    escalation (next qty > 1.5× the rolling average after a loss),
+    streak_escalation (an escalation inside a run of 3+ losses, runs as seen in
+    `df`) and drawdown_rush. The next trade of the last row is unknown.
+    `starts` marks rows that begin an independent sequence of trades; loss runs
+    and next trades do not cross them.
+    """
+    loss = features["is_loss"].to_numpy()
+    roll_avg = features["rolling_qty"].to_numpy()
+    qty = df["quantity"].to_numpy(dtype=float)
+    next_qty = np.append(qty[1:], np.nan)
+    if starts is not None:
+        next_qty[np.r_[starts[1:], False]] = np.nan
+    escalation = loss & (next_qty > 1.5 * roll_avg)
+
+    # Loss runs via the cumsum trick
+    breaks = loss[1:] != loss[:-1]
+    if starts is not None:
+        breaks = breaks | starts[1:]
+    run_id = np.cumsum(np.r_[True, breaks]) if len(loss) else np.zeros(0, dtype=int)
+    run_len = np.bincount(run_id, weights=loss)
+
+    # >10% below the running peak, within 15 min of the previous trade
+    drawdown_rush = (features["drawdown_pct"] > 0.10) & (features["gap_minutes"] < 15)
+    return pd.DataFrame({
+        "loss": loss,
+        "size_spike": loss & (next_qty > 1.5 * qty),
+        "escalation": escalation,
+        "streak_escalation": escalation & (run_len[run_id] >= 3),
+        "drawdown_rush": drawdown_rush.to_numpy(),
+    }, index=df.index)
+
+
+def update_revenge_state(state: dict, df: pd.DataFrame, features: pd.DataFrame) -> dict:
+    """Fold a chunk of trades (sorted, all after the state's last trade) into the state."""
+    state = dict(state or init_revenge_state())
+    if len(df) == 0:
+        return state
+
+    signals = revenge_trade_signals(df, features)
+    loss = signals["loss"].to_numpy()
+    roll_avg = features["rolling_qty"].to_numpy()
+    qty = df["quantity"].to_numpy(dtype=float)
+
+    # The previous chunk's last trade is only resolved now that its next trade is known
+    prev_loss = state["last_is_loss"]
+    prev_spike = prev_loss and qty[0] > 1.5 * state["last_quantity"]
+    prev_escalation = prev_loss and qty[0] > 1.5 * state["last_rolling_avg"]
+
+    # 1. size_increase_after_loss: next qty > 1.5× current qty after a loss
+    size_spike_count = int(signals["size_spike"].sum()) + int(prev_spike)
+
+    # 2. streak_escalation: a loss run open at the chunk boundary continues the stored streak
+    escalation = signals["escalation"].to_numpy()
+    run_id = np.cumsum(np.r_[True, loss[1:] != loss[:-1]])
+    run_len = np.bincount(run_id, weights=loss)
+    run_escalations = np.bincount(run_id, weights=escalation)
+    committed = 0
+    if loss[0] and state["loss_streak"] > 0:
+        run_len[1] += state["loss_streak"]
+        run_escalations[1] += state["streak_pending"] + int(prev_escalation)
+    elif state["loss_streak"] >= 3:
+        committed += state["streak_pending"] + int(prev_escalation)
+    closed = run_len >= 3
+    if loss[-1]:
+        closed[run_id[-1]] = False
+    committed += int(run_escalations[closed].sum())
+
+    state["n"] += len(df)
+    state["loss_count"] += int(loss.sum())
+    state["size_spike_count"] += size_spike_count
+    state["streak_escalation_count"] += committed
+    state["loss_streak"] = int(run_len[run_id[-1]]) if loss[-1] else 0
+    state["streak_pending"] = int(run_escalations[run_id[-1]]) if loss[-1] else 0
+    state["last_quantity"] = float(qty[-1])
+    state["last_rolling_avg"] = float(roll_avg[-1])
+    state["last_is_loss"] = bool(loss[-1])
+    state["drawdown_rush_count"] += int(signals["drawdown_rush"].sum())
+    return state
+
+
+def detect_revenge_trading(df: pd.DataFrame, features: pd.DataFrame | None = None) -> dict:
+    if features is None:
+        features = build_feature_frame(df)
+    return revenge_result(update_revenge_state(None, df, features))
+
+
+def revenge_result(state: dict) -> dict:
+    n = state["n"]
     if n < 2:
         return _empty_result()
 
-    loss_mask = is_loss(df)
     signals = []
     score = 0.0
 
     # 1. size_increase_after_loss: next qty > 1.5× current qty after a loss. Weight 0.40
-    qty = df["quantity"].values
-    next_qty = pd.Series(qty).shift(-1).fillna(0).values
-    after_loss_spike = loss_mask.values & (next_qty > 1.5 * qty)
-    loss_count = int(loss_mask.sum())
-    size_spike_count = int(after_loss_spike.sum())
+    loss_count = state["loss_count"]
+    size_spike_count = state["size_spike_count"]
     sig1_triggered = (size_spike_count / loss_count > 0.15) if loss_count > 0 else False
     if sig1_triggered:
         score += 0.40
@@ -33,18 +137,9 @@ def detect_revenge_trading(df: pd.DataFrame) -> dict:
     })
 
     # 2. streak_escalation: runs of 3+ consecutive losses, next trade qty > 1.5× rolling avg. Weight 0.40
-    # Vectorized consecutive loss run detection using cumsum trick
-    loss_int = loss_mask.astype(int)
-    # group non-loss positions to create streak reset
-    group_id = (loss_int != loss_int.shift()).cumsum()
-    streak_len = loss_int.groupby(group_id).transform("sum") * loss_int
-    streak_3plus_end = (streak_len >= 3) & loss_mask  # rows that END a streak of 3+
-    # next trade after a streak end
-    next_qty_series = df["quantity"].shift(-1)
-    roll_avg = rolling_avg_quantity(df)
-    streak_escalation_count = int(
-        (streak_3plus_end & (next_qty_series > 1.5 * roll_avg)).sum()
-    )
+    streak_escalation_count = state["streak_escalation_count"]
+    if state["loss_streak"] >= 3:
+        streak_escalation_count += state["streak_pending"]
     sig2_triggered = streak_escalation_count > 0
     if sig2_triggered:
         score += 0.40
@@ -56,13 +151,7 @@ def detect_revenge_trading(df: pd.DataFrame) -> dict:
     })
 
     # 3. drawdown_rush: balance drop > 10% within 15-min window, new trade after. Weight 0.20
-    balance = df["balance"]
-    running_peak = balance.cummax()
-    drawdown_pct = (running_peak - balance) / running_peak.replace(0, float("nan"))
-    gaps = time_gap_minutes(df)
-    # Within 15 minutes of a >10% drawdown event
-    drawdown_rush = (drawdown_pct > 0.10) & (gaps < 15)
-    drawdown_rush_count = int(drawdown_rush.sum())
+    drawdown_rush_count = state["drawdown_rush_count"]
     sig3_triggered = drawdown_rush_count > 0
     if sig3_triggered:
         score += 0.20
@@ -101,6 +190,19 @@ def detect_revenge_trading(df: pd.DataFrame) -> dict:
     }
 
 
+def revenge_window_scores(n, loss_count, size_spike_count, streak_escalation_count, drawdown_rush_count) -> np.ndarray:
+    """revenge_result's score for many windows at once, from per-window sums of the trade signals."""
+    n, loss_count = np.asarray(n), np.asarray(loss_count, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spike_ratio = np.where(loss_count > 0, size_spike_count / loss_count, 0.0)
+    score = (
+        0.40 * (spike_ratio > 0.15)
+        + 0.40 * (np.asarray(streak_escalation_count) > 0)
+        + 0.20 * (np.asarray(drawdown_rush_count) > 0)
+    )
+    return np.where(n >= 2, np.round(np.clip(score, 0.0, 1.0), 3), 0.0)
+
+
 def _empty_result():
     return {
         "bias": "revenge_trading",
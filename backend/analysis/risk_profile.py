@@ -7,7 +7,12 @@ import numpy as np
 
 def compute_risk_profile(df: pd.DataFrame, bias_results: list) -> dict:
     n = len(df)
+    mean_balance = float(df["balance"].mean()) if n > 0 else 1.0
+    pl_std = float(df["profit_loss"].std()) if n > 1 else 0.0
+    return risk_profile_from_stats(mean_balance, pl_std, bias_results)
+
 
+def risk_profile_from_stats(mean_balance: float, pl_std: float, bias_results: list) -> dict:
     # Map bias name → score
     bias_map = {b["bias"]: b["score"] for b in bias_results}
 
@@ -16,8 +21,6 @@ def compute_risk_profile(df: pd.DataFrame, bias_results: list) -> dict:
     revenge = bias_map.get("revenge_trading", 0.0)
 
     # Volatility contribution: std(profit_loss) / mean(balance)
-    mean_balance = float(df["balance"].mean()) if n > 0 else 1.0
-    pl_std = float(df["profit_loss"].std()) if n > 1 else 0.0
     volatility_contribution = min(1.0, pl_std / mean_balance if mean_balance > 0 else 0.0)
 
     # Weighted score (biases weighted equally, volatility adds 10% extra weight)
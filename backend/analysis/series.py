@@ -0,0 +1,73 @@
+"""
+Chart series helpers — derived timeline columns and LTTB downsampling.
+All operations are vectorized except the per-bucket LTTB selection.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+DERIVED_COLUMNS = ["cum_pnl", "peak", "drawdown_pct"]
+
+
+def add_derived_columns(df: pd.DataFrame, pnl_before: float = 0.0, peak_before: Optional[float] = None) -> pd.DataFrame:
+    """
+    Adds cumulative P&L, running balance peak and drawdown columns; drawdown_pct
+    is a fraction (0–1) like the feature frame's and the live feed's.
+    Missing P&L counts as 0 and a missing balance keeps the previous peak, so
+    the derived columns are never null (a missing balance has drawdown 0).
+    For a page, `pnl_before` / `peak_before` carry in the trades before it.
+    """
+    df = df.copy()
+    if "profit_loss" in df.columns:
+        df["cum_pnl"] = pnl_before + df["profit_loss"].fillna(0).cumsum()
+    if "balance" in df.columns:
+        peak = df["balance"].cummax()
+        if peak_before is not None:
+            peak = peak.clip(lower=peak_before)
+        df["peak"] = peak.ffill().fillna(0 if peak_before is None else peak_before)
+        df["drawdown_pct"] = ((df["peak"] - df["balance"]) / df["peak"].replace(0, float("nan"))).fillna(0)
+    return df
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling over an evenly spaced x axis
+    (trade number). Returns the sorted row positions to keep, always including
+    the first and last rows. Missing values in `y` take the value before them
+    and are only kept when their whole bucket is missing.
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        raise ValueError("LTTB needs at least 3 output points.")
+
+    y = np.asarray(y, dtype=np.float64)
+    missing = np.isnan(y)
+    if missing.any():
+        # A NaN area would win its bucket's argmax; gaps take the nearest earlier value
+        y = pd.Series(y).ffill().bfill().fillna(0).to_numpy()
+    x = np.arange(n, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point for the final bucket)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        area[missing[start:end]] = -1.0
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
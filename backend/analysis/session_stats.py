@@ -0,0 +1,128 @@
+"""
+Session-level running statistics shared by ML scoring, the risk profile and the
+report summary. Updated chunk by chunk like the detector states, so appended
+trades never require revisiting the session's history.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def init_session_stats() -> dict:
+    return {
+        "n": 0,
+        "first_timestamp": None,
+        "last_timestamp": None,
+        "last_is_loss": False,
+        "win_count": 0,
+        "loss_count": 0,
+        "win_sum": 0.0,
+        "loss_sum": 0.0,
+        "pnl_count": 0,         # non-null profit_loss values
+        "pnl_sum": 0.0,
+        "pnl_mean": 0.0,
+        "pnl_m2": 0.0,          # sum of squared deviations (Chan/Welford merge)
+        "balance_count": 0,
+        "balance_sum": 0.0,
+        "gap_after_loss_sum": 0.0,
+        "gap_after_loss_count": 0,
+    }
+
+
+def update_session_stats(state: dict, df: pd.DataFrame, features: pd.DataFrame) -> dict:
+    """Fold a chunk of trades (sorted, all after the state's last trade) into the stats."""
+    state = dict(state or init_session_stats())
+    m = len(df)
+    if m == 0:
+        return state
+
+    loss_mask = features["is_loss"]
+    win_mask = features["is_win"]
+    pnl = df["profit_loss"]
+
+    # Seconds to re-entry after a loss; the first row pairs with the previous chunk's last trade
+    gaps = features["gap_seconds"]
+    prev_loss = loss_mask.shift(1, fill_value=state["last_is_loss"]).astype(bool)
+    after_loss = gaps[prev_loss].dropna()
+
+    # Merge the chunk's mean/M2 into the running values (NaNs skipped, like pandas)
+    k = state["pnl_count"]
+    chunk_k = int(pnl.count())
+    if chunk_k > 0:
+        chunk_mean = float(pnl.mean())
+        chunk_m2 = float(((pnl - chunk_mean) ** 2).sum())
+        delta = chunk_mean - state["pnl_mean"]
+        total = k + chunk_k
+        state["pnl_m2"] += chunk_m2 + delta * delta * k * chunk_k / total
+        state["pnl_mean"] += delta * chunk_k / total
+        state["pnl_count"] = total
+
+    if state["first_timestamp"] is None:
+        state["first_timestamp"] = df["timestamp"].iloc[0].isoformat()
+    state["n"] += m
+    state["last_timestamp"] = df["timestamp"].iloc[-1].isoformat()
+    state["last_is_loss"] = bool(loss_mask.iloc[-1])
+    state["win_count"] += int(win_mask.sum())
+    state["loss_count"] += int(loss_mask.sum())
+    state["win_sum"] += float(pnl[win_mask].sum())
+    state["loss_sum"] += float(pnl[loss_mask].sum())
+    state["pnl_sum"] += float(pnl.sum())
+    state["balance_count"] += int(df["balance"].count())
+    state["balance_sum"] += float(df["balance"].sum())
+    state["gap_after_loss_sum"] += float(after_loss.sum())
+    state["gap_after_loss_count"] += len(after_loss)
+    return state
+
+
+def pnl_std(state: dict) -> float:
+    """Sample standard deviation of profit_loss (ddof=1, like pandas)."""
+    k = state["pnl_count"]
+    return math.sqrt(state["pnl_m2"] / (k - 1)) if k > 1 else 0.0
+
+
+def grouped_session_stats(df: pd.DataFrame, groups: np.ndarray) -> pd.DataFrame:
+    """
+    What update_session_stats(None, group) gives for each of many independent
+    groups of trades, computed in one pass: one row per group, indexed by group
+    id, with the columns ML features need (n, span_seconds, win/loss counts and
+    sums, pnl_count/pnl_m2, gap_after_loss sum/count).
+    `groups` is aligned with `df`; each group's rows must be contiguous and sorted by timestamp.
+    """
+    groups = np.asarray(groups)
+    pnl = df["profit_loss"].to_numpy(dtype=float)
+    loss, win = pnl < 0, pnl > 0
+    starts = np.r_[True, groups[1:] != groups[:-1]]
+
+    gaps = df["timestamp"].diff().dt.total_seconds().to_numpy(copy=True)
+    gaps[starts] = np.nan
+    after_loss = np.r_[False, loss[:-1]] & ~starts & ~np.isnan(gaps)
+
+    frame = pd.DataFrame({
+        "timestamp": df["timestamp"].to_numpy(),
+        "win": win,
+        "loss": loss,
+        "win_pnl": np.where(win, pnl, 0.0),
+        "loss_pnl": np.where(loss, pnl, 0.0),
+        "pnl": pnl,
+        "gap_after_loss": np.where(after_loss, gaps, 0.0),
+        "after_loss": after_loss,
+    })
+    by_group = frame.groupby(groups, sort=False)
+    pnl_mean = by_group["pnl"].transform("mean").to_numpy()
+    frame["pnl_dev2"] = (pnl - pnl_mean) ** 2
+
+    by_group = frame.groupby(groups, sort=False)
+    stats = pd.DataFrame({
+        "n": by_group.size(),
+        "span_seconds": (by_group["timestamp"].last() - by_group["timestamp"].first()).dt.total_seconds(),
+        "win_count": by_group["win"].sum(),
+        "loss_count": by_group["loss"].sum(),
+        "win_sum": by_group["win_pnl"].sum(),
+        "loss_sum": by_group["loss_pnl"].sum(),
+        "pnl_count": by_group["pnl"].count(),
+        "pnl_m2": by_group["pnl_dev2"].sum(),
+        "gap_after_loss_sum": by_group["gap_after_loss"].sum(),
+        "gap_after_loss_count": by_group["after_loss"].sum(),
+    })
+    return stats
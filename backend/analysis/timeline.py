@@ -0,0 +1,74 @@
+"""
+Bias-score timeline — detector and ML scores per window of a session.
+
+A window is a calendar span ("1D", "12h", "2W"; bins start at midnight of the
+first trade's day, or the Monday of its week) or a number of trades
+("100trades"). Each detector's per-trade signals are computed once over the
+whole session, so trades at a window edge still see their real neighbours,
+then scored for all windows at once (analysis/grouped_scores.py). Windows
+without trades are omitted.
+"""
+import re
+from typing import List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from analysis.features import build_feature_frame
+from analysis.grouped_scores import group_scores, score_record
+
+MAX_TIMELINE_WINDOWS = 10_000
+TIMELINE_COLUMNS = ["timestamp", "quantity", "entry_price", "exit_price", "profit_loss", "balance"]
+
+_WINDOW_RE = re.compile(r"(\d*)\s*(h|d|w|trades?)")
+_TIME_UNITS = {"h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_window(window: str) -> Tuple[str, Union[int, pd.Timedelta]]:
+    """("time", Timedelta) for "1D" / "12h" / "2W", ("trades", n) for "100trades"."""
+    match = _WINDOW_RE.fullmatch(window.strip().lower())
+    count = int(match.group(1) or 1) if match else 0
+    if not match or count < 1:
+        raise ValueError(f"Invalid window '{window}'. Use e.g. 1D, 12h, 1W or 100trades.")
+    unit = match.group(2)
+    if unit.startswith("trade"):
+        return "trades", count
+    return "time", pd.Timedelta(**{_TIME_UNITS[unit]: count})
+
+
+def window_ids(timestamps: pd.Series, window: str) -> Tuple[np.ndarray, pd.Timestamp, Union[int, pd.Timedelta]]:
+    """Window number of every trade (non-decreasing), plus the time origin and window size."""
+    kind, size = parse_window(window)
+    if kind == "trades":
+        return np.arange(len(timestamps)) // size, None, size
+    origin = timestamps.iloc[0].normalize()
+    if size % pd.Timedelta(weeks=1) == pd.Timedelta(0):
+        origin -= pd.Timedelta(days=origin.dayofweek)
+    return ((timestamps - origin) // size).to_numpy(dtype=np.int64), origin, size
+
+
+def bias_timeline(df: pd.DataFrame, window: str) -> List[dict]:
+    """
+    One point per non-empty window of `df` (sorted trades): start, end,
+    trade_count, `scores` from the detectors' rules and `ml_scores` from the
+    model, each keyed overtrading / loss_aversion / revenge_trading (0-1).
+    """
+    if len(df) == 0:
+        return []
+    ids, origin, size = window_ids(df["timestamp"], window)
+    n_windows = len(np.unique(ids))
+    if n_windows > MAX_TIMELINE_WINDOWS:
+        raise ValueError(f"Window '{window}' gives {n_windows} windows; the limit is {MAX_TIMELINE_WINDOWS}.")
+
+    scores = group_scores(df, build_feature_frame(df), ids)
+    if origin is None:
+        bounds = df["timestamp"].groupby(ids).agg(["first", "last"])
+        starts, ends = bounds["first"], bounds["last"]
+    else:
+        starts = origin + scores.index * size
+        ends = starts + size
+
+    return [
+        {"start": start.isoformat(), "end": end.isoformat(), **score_record(row)}
+        for start, end, row in zip(starts, ends, scores.itertuples())
+    ]
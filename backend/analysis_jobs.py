@@ -0,0 +1,385 @@
+"""
+Background analysis jobs.
+
+POST /analyze submits the analysis of a session to a bounded pool of worker
+threads (ANALYSIS_WORKERS) and answers with the job at once, so a big session
+no longer holds a request open until a proxy times it out. Clients poll
+GET /jobs/{id} for status and progress (stage, and which detectors have
+finished) and fetch the report from GET /jobs/{id}/result.
+
+A submission for a session (with the same options) that already has a
+queued or running job joins that job instead of starting another. Jobs stop
+cooperatively: the worker checks for a cancel request and for its deadline
+(ANALYSIS_JOB_TIMEOUT seconds from submission) between stages and whenever a
+detector finishes, and a stopped job saves nothing to the session. At most
+ANALYSIS_QUEUE_SIZE jobs wait for a worker; finished jobs are kept for
+ANALYSIS_JOB_TTL seconds.
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models.db_models import TradingSession
+from storage.trade_store import read_trades
+from storage.analysis_cache import hash_trades, cache_key, get_cached, put_cached
+from analysis.aggregator import update_analysis_state, build_report, is_current_state, analysis_version
+from analysis.breakdown import bias_breakdown
+from range_analysis import EmptyRange, analyze_range
+from metrics import span, collect_timings, register_collector, render_value
+from serialization import dumps, dumps_str, loads
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED, TIMED_OUT = (
+    "queued", "running", "succeeded", "failed", "cancelled", "timed_out",
+)
+FINISHED = (SUCCEEDED, FAILED, CANCELLED, TIMED_OUT)
+
+# Options of the plain full-session analysis (the one saved as the session's report)
+FULL_ANALYSIS = {"breakdown": False}
+
+
+def max_workers() -> int:
+    return int(os.getenv("ANALYSIS_WORKERS", "2"))
+
+
+def job_timeout() -> float:
+    return float(os.getenv("ANALYSIS_JOB_TIMEOUT", "600"))
+
+
+def max_queued() -> int:
+    return int(os.getenv("ANALYSIS_QUEUE_SIZE", "64"))
+
+
+def job_ttl() -> float:
+    return float(os.getenv("ANALYSIS_JOB_TTL", "3600"))
+
+
+class QueueFull(Exception):
+    """Too many jobs are already waiting for a worker."""
+
+
+class JobStopped(Exception):
+    """Raised in a job's worker once it is cancelled or past its deadline."""
+
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+
+# ── Jobs ──────────────────────────────────────────────────────────────────────
+
+class AnalysisJob:
+    """One submitted analysis: its options, status, progress and (once done) result."""
+
+    def __init__(self, session_id: str, options: dict, timeout: float):
+        self.id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.options = options
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.detectors_done: List[str] = []
+        self.detectors_total = 0
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.deadline = time.monotonic() + timeout
+        self.result: Optional[bytes] = None
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.error_status = 500
+        self.cancel_requested = threading.Event()
+        self.done = threading.Event()
+        self.future = None
+
+    def check(self):
+        """Raises JobStopped if the job was cancelled or ran past its deadline."""
+        if self.cancel_requested.is_set():
+            raise JobStopped(CANCELLED)
+        if time.monotonic() > self.deadline:
+            raise JobStopped(TIMED_OUT)
+
+    def enter(self, stage: str):
+        self.check()
+        self.stage = stage
+
+    def detector_done(self, name: str, completed: int, total: int):
+        self.detectors_done.append(name)
+        self.detectors_total = total
+        self.check()
+
+    def finish(self, status: str, error: Optional[str] = None, error_status: int = 500):
+        self.status = status
+        self.error = error
+        self.error_status = error_status
+        self.finished_at = time.time()
+        self.done.set()
+
+    def to_dict(self) -> dict:
+        total = self.detectors_total
+        if self.status == SUCCEEDED:
+            fraction = 1.0
+        else:
+            fraction = len(self.detectors_done) / total if total else 0.0
+        return {
+            "job_id": self.id,
+            "session_id": self.session_id,
+            "status": self.status,
+            "options": self.options,
+            "progress": {
+                "stage": self.stage,
+                "detectors_completed": list(self.detectors_done),
+                "detectors_total": total,
+                "fraction": round(fraction, 3),
+            },
+            "cancel_requested": self.cancel_requested.is_set(),
+            "submitted_at": _iso(self.submitted_at),
+            "started_at": _iso(self.started_at),
+            "finished_at": _iso(self.finished_at),
+            "deadline_in_seconds": round(max(self.deadline - time.monotonic(), 0.0), 3) if self.status not in FINISHED else None,
+            "error": self.error,
+            "timings": self.timings if self.status in FINISHED else None,
+        }
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+
+# ── Worker pool ───────────────────────────────────────────────────────────────
+
+class JobManager:
+    """Bounded worker pool plus the registry of jobs, merging duplicate submissions."""
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, AnalysisJob] = {}
+        self._active: Dict[tuple, AnalysisJob] = {}
+        self._lock = threading.Lock()
+        self.counts = {status: 0 for status in FINISHED}
+        self.merged = 0
+
+    def submit(self, session_id: str, options: dict, timeout: Optional[float] = None) -> AnalysisJob:
+        """Queues an analysis of the session, or returns the queued/running job with the same options."""
+        key = (session_id, tuple(sorted(options.items())))
+        limit = job_timeout() if timeout is None else min(timeout, job_timeout())
+        with self._lock:
+            self._prune()
+            job = self._active.get(key)
+            if job is not None and not job.cancel_requested.is_set():
+                self.merged += 1
+                return job
+            if sum(j.status == QUEUED for j in self._active.values()) >= max_queued():
+                raise QueueFull(f"{max_queued()} analysis jobs are already queued; try again later.")
+            job = AnalysisJob(session_id, options, limit)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max_workers(), thread_name_prefix="analysis-job")
+            job.future = self._executor.submit(self._run, job, key)
+        return job
+
+    def find(self, session_id: str, options: dict) -> Optional[AnalysisJob]:
+        """The queued or running job for the session and options, if any."""
+        with self._lock:
+            return self._active.get((session_id, tuple(sorted(options.items()))))
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[AnalysisJob]:
+        """Asks the job to stop. A queued job is dropped at once; a running one at its next check."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.cancel_requested.set()
+            if job.future.cancel():
+                self._finish(job, self._key_of(job), CANCELLED)
+        return job
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._active.values():
+                job.cancel_requested.set()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: AnalysisJob, key: tuple):
+        job.status = RUNNING
+        job.started_at = time.time()
+        status, error, error_status = SUCCEEDED, None, 500
+        db = SessionLocal()
+        try:
+            with collect_timings() as stage_ms:
+                try:
+                    job.check()
+                    job.result = run_analysis(db, job)
+                except JobStopped as e:
+                    db.rollback()
+                    status = e.status
+                except EmptyRange as e:
+                    status, error, error_status = FAILED, str(e), 404
+                except LookupError as e:
+                    status, error, error_status = FAILED, str(e), 404
+                except Exception as e:
+                    logger.error(f"Analysis job {job.id} for session {job.session_id} failed: {e}", exc_info=True)
+                    status, error = FAILED, f"Analysis failed: {str(e)}"
+            job.timings = stage_ms
+        finally:
+            db.close()
+            with self._lock:
+                self._finish(job, key, status, error, error_status)
+
+    def _finish(self, job: AnalysisJob, key: tuple, status: str, error: Optional[str] = None, error_status: int = 500):
+        if self._active.get(key) is job:
+            del self._active[key]
+        self.counts[status] += 1
+        job.finish(status, error, error_status)
+
+    @staticmethod
+    def _key_of(job: AnalysisJob) -> tuple:
+        return job.session_id, tuple(sorted(job.options.items()))
+
+    def _prune(self):
+        cutoff = time.time() - job_ttl()
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def render(self) -> str:
+        with self._lock:
+            queued = sum(job.status == QUEUED for job in self._active.values())
+            running = sum(job.status == RUNNING for job in self._active.values())
+            counts, merged = dict(self.counts), self.merged
+        return "".join([
+            render_value("bias_detector_analysis_jobs_queued", "Analysis jobs waiting for a worker.", "gauge", queued),
+            render_value("bias_detector_analysis_jobs_running", "Analysis jobs being run.", "gauge", running),
+            render_value("bias_detector_analysis_jobs_merged_total", "Submissions that joined an existing job.", "counter", merged),
+            *(render_value(f"bias_detector_analysis_jobs_{status}_total", f"Analysis jobs that ended {status.replace('_', ' ')}.", "counter", n)
+              for status, n in counts.items()),
+        ])
+
+
+jobs = JobManager()
+register_collector(jobs.render)
+
+
+# ── The analysis a job runs ───────────────────────────────────────────────────
+
+def run_analysis(db: Session, job: AnalysisJob) -> bytes:
+    """
+    The encoded report for the job's session and options. A full-session
+    analysis (served from the content-addressed cache when possible) is saved
+    as the session's report; a range analysis (options from / to / asset) is not.
+    """
+    job.enter("load_session")
+    with span("analyze.load_session"):
+        session = db.query(TradingSession).filter(TradingSession.id == job.session_id).first()
+        if not session or not session.trades_path:
+            raise LookupError("Session not found or has no trades.")
+        state = loads(session.analysis_state_json) if session.analysis_state_json else None
+        # What the save at the end checks is still there
+        seen_count, content_hash = session.trade_count, session.content_hash
+
+    options = job.options
+    if options.get("from") or options.get("to") or options.get("asset"):
+        job.enter("range")
+        start, end = (pd.Timestamp(v) if v else None for v in (options.get("from"), options.get("to")))
+        return dumps(analyze_range(db, session, start, end, options.get("asset"), options.get("breakdown", False),
+                                   on_done=job.detector_done))
+
+    df = None
+    new_hash = content_hash
+    if content_hash is None:
+        # Appended sessions are re-hashed lazily, once
+        job.enter("read_trades")
+        with span("analyze.read_trades"):
+            df = read_trades(session.trades_path)
+        job.enter("hash")
+        with span("analyze.hash"):
+            new_hash = hash_trades(df)
+    key = cache_key(new_hash, analysis_version())
+
+    job.enter("cache_lookup")
+    with span("analyze.cache_lookup"):
+        cached = get_cached(db, key)
+    if cached:
+        # The stored state is reused as-is; only the report's session_id changes
+        state_json, report_json = cached
+        with span("analyze.serialize"):
+            report = loads(report_json)
+            report["session_id"] = session.id
+            report_bytes = dumps(report)
+    else:
+        if not is_current_state(state, seen_count):
+            if df is None:
+                job.enter("read_trades")
+                with span("analyze.read_trades"):
+                    df = read_trades(session.trades_path)
+            job.enter("detectors")
+            state = update_analysis_state(None, df, on_done=job.detector_done)
+        job.enter("report")
+        with span("analysis.report"):
+            report = build_report(state, session.id)
+        with span("analyze.serialize"):
+            state_json, report_bytes = dumps_str(state), dumps(report)
+        with span("analyze.cache_store"):
+            put_cached(db, key, state_json, report_bytes.decode())
+
+    if options.get("breakdown"):
+        # Cached reports leave it out; it is computed from the trades on request
+        if df is None:
+            job.enter("read_trades")
+            with span("analyze.read_trades"):
+                df = read_trades(session.trades_path)
+        job.enter("breakdown")
+        with span("analysis.breakdown"):
+            report["breakdown"] = bias_breakdown(df)
+        with span("analyze.serialize"):
+            report_bytes = dumps(report)
+
+    # Last check: a cancelled or late job leaves the session as it was
+    job.enter("commit")
+    with span("analyze.commit"):
+        saved = _save_if_unchanged(db, session.id, seen_count, content_hash, df, {
+            "content_hash": new_hash,
+            "analysis_state_json": state_json,
+            "report_json": report_bytes.decode(),
+        })
+    if not saved:
+        logger.info(f"Session {session.id} changed during analysis job {job.id}; its result was not saved.")
+    return report_bytes
+
+
+def _save_if_unchanged(db: Session, session_id: str, seen_count: int, seen_hash: Optional[str],
+                       df: Optional[pd.DataFrame], values: dict) -> bool:
+    """
+    Writes `values` to the session only if its trades are still the ones that
+    were analyzed: same trade count and content hash as when it was loaded,
+    and (if the trades were read) as many rows as that count. An append that
+    landed in between makes this a no-op, so a stale hash is never stored.
+    """
+    if df is not None and len(df) != seen_count:
+        return False
+    unchanged = (TradingSession.content_hash.is_(None) if seen_hash is None
+                 else TradingSession.content_hash == seen_hash)
+    updated = (
+        db.query(TradingSession)
+        .filter(TradingSession.id == session_id, TradingSession.trade_count == seen_count, unchanged)
+        .update(values, synchronize_session=False)
+    )
+    db.commit()
+    return updated == 1
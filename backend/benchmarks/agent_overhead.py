@@ -0,0 +1,111 @@
+"""
+Per-turn agent overhead with the model call taken out.
+
+The Cerebras client is replaced by an in-process fake that answers instantly
+(one tool call, then a short reply), so each timed turn covers only our side:
+session load and commit, graph setup, LangGraph execution, the tool, and the
+session refresh. Turns are timed with the shared compiled graph and with the
+graph recompiled on every turn (what /chat used to do).
+
+    python benchmarks/agent_overhead.py --turns 200
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _FakeStream:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _FakeCompletions:
+    """Requests `tool_name` after a user message, otherwise replies with a few tokens."""
+
+    def __init__(self, tool_name: str):
+        self.tool_name = tool_name
+
+    async def create(self, messages, stream=False, **_):
+        if not stream:     # conversation summary (agents/memory.py)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Earlier turns."))])
+        if messages[-1]["role"] == "user":
+            call = SimpleNamespace(index=0, id="call_0", function=SimpleNamespace(name=self.tool_name, arguments="{}"))
+            deltas = [SimpleNamespace(content=None, tool_calls=[call])]
+        else:
+            deltas = [SimpleNamespace(content=w, tool_calls=None) for w in ("You ", "are ", "doing ", "fine.")]
+        return _FakeStream(SimpleNamespace(choices=[SimpleNamespace(delta=d)]) for d in deltas)
+
+
+async def _time_turns(run_agent, db, session_id: str, turns: int, reset=None):
+    samples = []
+    for _ in range(turns):
+        if reset:
+            reset()
+        t0 = time.perf_counter()
+        await run_agent(session_id, "How am I doing?", [], db)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--tool-name", default="get_trade_summary")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="agent_overhead_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import logging
+    logging.disable(logging.INFO)
+
+    import agents.graph as graph
+    from database import SessionLocal, init_db
+    from models.db_models import TradingSession
+
+    init_db()
+    db = SessionLocal()
+    db.add(TradingSession(id="bench", filename="bench", onboarding_complete=True))
+    db.commit()
+    graph._cerebras_client = SimpleNamespace(chat=SimpleNamespace(completions=_FakeCompletions(args.tool_name)))
+
+    def recompile():
+        graph._graph = None
+
+    t0 = time.perf_counter()
+    graph.build_graph()
+    print(f"compile once: {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+    async def run():
+        await _time_turns(graph.run_agent, db, "bench", 10)     # warm-up
+        per_turn = await _time_turns(graph.run_agent, db, "bench", args.turns, reset=recompile)
+        shared = await _time_turns(graph.run_agent, db, "bench", args.turns)
+        return per_turn, shared
+
+    per_turn, shared = asyncio.run(run())
+    for label, samples in (("recompiled per turn", per_turn), ("compiled once", shared)):
+        print(f"{label:>20}: median {statistics.median(samples) * 1000:.2f} ms, "
+              f"mean {statistics.fmean(samples) * 1000:.2f} ms over {len(samples)} turns")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Prompt size and per-turn latency over a long coaching conversation.
+
+Runs many agent turns against an instant in-process fake model that records
+the prompt it receives (the model call itself is excluded). With server-side
+memory the prompt should level off at the CHAT_CONTEXT_TOKENS budget plus the
+system prompt, while the transcript — what a client resending the full history
+used to forward — keeps growing.
+
+    python benchmarks/chat_memory.py --turns 200
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+USER_TURN = "I opened three more trades right after that loss because I wanted to win it back before the close. " * 2
+REPLY = ("That pattern matches your data: after your five largest losses you re-entered within ten minutes "
+         "with larger size. What would make a fifteen-minute cooldown realistic for you? ") * 2
+SUMMARY = "The trader re-enters quickly after losses with larger size and is weighing a cooldown rule. " * 6
+
+
+class _FakeCompletions:
+    def __init__(self):
+        self.prompt_tokens = []
+
+    async def create(self, messages, stream=False, **_):
+        from agents.memory import estimate_tokens
+        from benchmarks.agent_overhead import _FakeStream
+        if not stream:     # summarization call
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=SUMMARY))])
+        self.prompt_tokens.append(sum(estimate_tokens(m["content"]) for m in messages))
+        delta = SimpleNamespace(content=REPLY, tool_calls=None)
+        return _FakeStream([SimpleNamespace(choices=[SimpleNamespace(delta=delta)])])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="chat_memory_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import logging
+    logging.disable(logging.INFO)
+
+    import agents.graph as graph
+    from agents.memory import estimate_tokens, CHAT_CONTEXT_TOKENS
+    from database import SessionLocal, init_db
+    from models.db_models import TradingSession
+
+    init_db()
+    db = SessionLocal()
+    db.add(TradingSession(id="bench", filename="bench", onboarding_complete=True))
+    db.commit()
+    fake = _FakeCompletions()
+    graph._cerebras_client = SimpleNamespace(chat=SimpleNamespace(completions=fake))
+
+    async def run():
+        latencies, transcript = [], 0
+        for _ in range(args.turns):
+            t0 = time.perf_counter()
+            await graph.run_agent("bench", USER_TURN, [], db)
+            latencies.append(time.perf_counter() - t0)
+            transcript += estimate_tokens(USER_TURN) + estimate_tokens(REPLY)
+            await asyncio.sleep(0)      # let background compaction run between turns
+        return latencies, transcript
+
+    latencies, transcript = asyncio.run(run())
+    print(f"budget CHAT_CONTEXT_TOKENS={CHAT_CONTEXT_TOKENS}, transcript after {args.turns} turns ~{transcript} tokens")
+    print(f"{'turn':>6} {'prompt tokens':>14} {'turn ms':>8}")
+    for turn in sorted({1, 10, 25, 50, 100, args.turns} & set(range(1, args.turns + 1))):
+        window = latencies[max(0, turn - 5):turn]
+        print(f"{turn:>6} {fake.prompt_tokens[turn - 1]:>14} {statistics.median(window) * 1000:>8.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
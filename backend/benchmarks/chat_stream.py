@@ -0,0 +1,123 @@
+"""
+Chat latency against the local LLM stub (benchmarks/llm_stub.py).
+
+Starts the stub and the API on local ports, uploads a sample session, then
+measures POST /chat against POST /chat/stream (time to first token and to the
+final `done` event), and /health latency while several chat turns are in
+flight — a blocking model call would stall /health for the whole turn.
+
+    python benchmarks/chat_stream.py --concurrent 8
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(app, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def _stream_turn(client, session_id: str) -> dict:
+    t0 = time.perf_counter()
+    first_token, events = None, []
+    async with client.stream("POST", "/chat/stream", json={"session_id": session_id, "message": "How am I doing?"}) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            events.append(event["type"])
+            if event["type"] == "token" and first_token is None:
+                first_token = time.perf_counter() - t0
+            if event["type"] in ("done", "error"):
+                assert event["type"] == "done", event
+    return {"first_token": first_token, "total": time.perf_counter() - t0, "events": events}
+
+
+async def run(api_url: str, concurrent: int):
+    import httpx
+    async with httpx.AsyncClient(base_url=api_url, timeout=60) as client:
+        with open(os.path.join(BACKEND_DIR, "..", "trading_datasets", "calm_trader.csv"), "rb") as f:
+            r = await client.post("/upload", files={"file": ("calm_trader.csv", f.read())})
+        session_id = r.json()["session_id"]
+        (await client.post(f"/analyze/{session_id}?wait=true")).raise_for_status()
+
+        t0 = time.perf_counter()
+        (await client.post("/chat", json={"session_id": session_id, "message": "How am I doing?"})).raise_for_status()
+        print(f"POST /chat          total {time.perf_counter() - t0:.3f}s")
+
+        turn = await _stream_turn(client, session_id)
+        print(f"POST /chat/stream   first token {turn['first_token']:.3f}s, total {turn['total']:.3f}s")
+        print(f"  events: {' '.join(dict.fromkeys(turn['events']))} ({turn['events'].count('token')} tokens)")
+
+        health = []
+
+        async def probe(stop):
+            while not stop.is_set():
+                t = time.perf_counter()
+                await client.get("/health")
+                health.append(time.perf_counter() - t)
+                await asyncio.sleep(0.01)
+
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe(stop))
+        t0 = time.perf_counter()
+        turns = await asyncio.gather(*(_stream_turn(client, session_id) for _ in range(concurrent)))
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await prober
+        print(f"{concurrent} concurrent streamed turns in {elapsed:.3f}s "
+              f"(first token median {statistics.median(t['first_token'] for t in turns):.3f}s)")
+        print(f"  /health during turns: median {statistics.median(health) * 1000:.1f} ms, max {max(health) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrent", type=int, default=8)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--tool-name", default="get_trade_summary")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="chat_stream_")
+    stub_port, api_port = _free_port(), _free_port()
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{tmp}/bench.db",
+        "UPLOAD_DIR": os.path.join(tmp, "uploads"),
+        "CEREBRAS_BASE_URL": f"http://127.0.0.1:{stub_port}",
+        "CEREBRAS_API_KEY": "stub",
+    })
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import logging
+    logging.disable(logging.INFO)
+
+    from benchmarks.llm_stub import create_app
+    import main as api
+    _serve(create_app(args.first_token_delay, args.token_delay, args.tool_name), stub_port)
+    _serve(api.app, api_port)
+    asyncio.run(run(f"http://127.0.0.1:{api_port}", args.concurrent))
+
+
+if __name__ == "__main__":
+    main()
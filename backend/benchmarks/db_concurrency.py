@@ -0,0 +1,105 @@
+"""
+Event-loop responsiveness under concurrent analysis writes.
+
+Uploads several synthetic sessions, then fires concurrent POST /analyze calls
+(each reads trades, runs the detectors and commits report + state) while
+probing GET /health every few milliseconds. /health latency should stay close
+to its idle value; blocking DB or pandas work on the event loop shows up as
+latency spikes the length of a whole analysis.
+
+    python benchmarks/db_concurrency.py --sessions 8 --rows 200000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {
+        "n": len(samples),
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "p95_ms": round(pick(0.95) * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+async def _probe_health(client, stop: asyncio.Event, interval: float):
+    """Probe on a fixed schedule; latency counts from when the probe was due,
+    so time spent waiting on a blocked event loop is included."""
+    latencies = []
+    due = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        await client.get("/health")
+        latencies.append(time.perf_counter() - due)
+        due += interval
+    return latencies
+
+
+async def run(sessions: int, rows: int, interval: float):
+    import httpx
+    import main
+    from benchmarks.upload_memory import write_csv
+
+    await main.startup_event()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        session_ids = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for i in range(sessions):
+                path = os.path.join(tmp, f"s{i}.csv")
+                write_csv(path, target_mb=max(1, rows * 100 // (1024 * 1024)), chunk_rows=rows, seed=i)
+                with open(path, "rb") as f:
+                    r = await client.post("/upload", files={"file": (f"s{i}.csv", f.read())})
+                r.raise_for_status()
+                session_ids.append(r.json()["session_id"])
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_health(client, stop, interval))
+        await asyncio.sleep(1.0)
+        stop.set()
+        idle = await probe
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_health(client, stop, interval))
+        t0 = time.perf_counter()
+        responses = await asyncio.gather(*(client.post(f"/analyze/{sid}?wait=true") for sid in session_ids))
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        loaded = await probe
+
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses if r.status_code != 200]
+    print(f"{sessions} concurrent /analyze of {rows} rows each: {elapsed:.2f}s")
+    print("  /health idle  ", _percentiles(idle))
+    print("  /health loaded", _percentiles(loaded))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between /health probes")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="db_concurrency_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+    # Timed as whole analyses: ?wait=true waits for the job however long it runs
+    os.environ["ANALYZE_WAIT_SECONDS"] = "600"
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import logging
+    logging.disable(logging.INFO)
+    asyncio.run(run(args.sessions, args.rows, args.interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Live trade feed latency and per-feed memory.
+
+Starts the API on a local port, uploads --history trades as a session, then
+sends --trades more over /ws/session/{id}/trades one at a time (each waits for
+its answer) and prints the round-trip latency percentiles and alert counts.
+Batches are appended to the session while the feed runs, so the slowest
+answers include the event loop sharing the CPU with a store. Finally it feeds
+the same trades straight into a LiveDetector under tracemalloc: the detector's
+memory must not grow with the number of trades.
+
+    python benchmarks/live_feed.py --history 100k --trades 20000
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _trade_message(row) -> str:
+    return json.dumps({
+        "timestamp": row.timestamp.isoformat(), "asset": str(row.asset), "side": str(row.side),
+        "quantity": float(row.quantity), "entry_price": float(row.entry_price),
+        "exit_price": float(row.exit_price), "profit_loss": float(row.profit_loss), "balance": float(row.balance),
+    })
+
+
+async def run(port: int, history_csv: bytes, messages: list) -> tuple:
+    import httpx
+    import websockets
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=300) as client:
+        r = await client.post("/upload?analyze=true", files={"file": ("history.csv", history_csv)})
+        r.raise_for_status()
+        session_id = r.json()["session_id"]
+        (await client.get(f"/report/{session_id}")).raise_for_status()
+
+    latencies, alerts = [], {}
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws/session/{session_id}/trades") as ws:
+        for message in messages:
+            t0 = time.perf_counter()
+            await ws.send(message)
+            answer = json.loads(await ws.recv())
+            latencies.append(time.perf_counter() - t0)
+            for alert in answer.get("alerts", []):
+                alerts[alert["signal"]] = alerts.get(alert["signal"], 0) + 1
+    return latencies, alerts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", default="100k")
+    parser.add_argument("--trades", type=int, default=20_000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="live_feed_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import logging
+    logging.disable(logging.INFO)
+    import numpy as np
+    from benchmarks.suite import build_trades, parse_size
+    from benchmarks.chat_stream import _free_port, _serve
+    from storage.file_handler import REQUIRED_COLUMNS
+    from analysis.live import LiveDetector, parse_timestamp
+
+    n_history = parse_size(args.history)
+    df = build_trades(n_history + args.trades)[REQUIRED_COLUMNS].dropna().reset_index(drop=True)
+    history, live = df.iloc[:n_history], df.iloc[n_history:]
+    messages = [_trade_message(row) for row in live.itertuples()]
+
+    import main as api
+    port = _free_port()
+    _serve(api.app, port)
+    latencies, alerts = asyncio.run(run(port, history.to_csv(index=False).encode(), messages))
+
+    ms = np.array(latencies) * 1000
+    print(f"{len(messages):,} live trades after {len(history):,} uploaded")
+    print(f"  round trip  p50 {np.percentile(ms, 50):.2f} ms  p99 {np.percentile(ms, 99):.2f} ms  max {ms.max():.2f} ms")
+    print(f"  alerts      {', '.join(f'{k}={v}' for k, v in sorted(alerts.items()))}")
+
+    detector = LiveDetector()
+    rows = list(zip(live["timestamp"].map(lambda t: parse_timestamp(t.isoformat())),
+                    live["quantity"].astype(float), live["profit_loss"].astype(float), live["balance"].astype(float)))
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for i, row in enumerate(rows):
+        detector.update(*row)
+        if i == 999:
+            after_1k = tracemalloc.get_traced_memory()[0]
+    elapsed = time.perf_counter() - t0
+    growth = tracemalloc.get_traced_memory()[0] - after_1k
+    tracemalloc.stop()
+    print(f"  detector    {elapsed / len(rows) * 1e6:.1f} µs/trade (under tracemalloc), "
+          f"{growth} bytes of growth over the last {len(rows) - 1000:,} trades")
+
+
+if __name__ == "__main__":
+    main()
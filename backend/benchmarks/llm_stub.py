@@ -0,0 +1,95 @@
+"""
+Local OpenAI-compatible chat-completions stub for exercising the agent
+without a Cerebras key. Point the backend at it with
+
+    CEREBRAS_BASE_URL=http://127.0.0.1:8100 CEREBRAS_API_KEY=stub
+
+and run it with `python benchmarks/llm_stub.py --port 8100`.
+
+Responses carry system_fingerprint, which the Cerebras SDK needs to tell
+chunks from full completions. The stub answers every turn with REPLY, one word per chunk, after a
+first-token delay. With --tool-name it first requests that tool whenever the
+last message is from the user, so tool events show up in the stream.
+"""
+import json
+import time
+import uuid
+import asyncio
+import argparse
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+REPLY = "Your revenge trading score is driven by larger positions after losses. Want to set a cooldown rule?"
+
+
+def create_app(first_token_delay: float = 0.3, token_delay: float = 0.02, tool_name: str | None = None) -> FastAPI:
+    app = FastAPI(title="LLM stub")
+
+    def chunk(model: str, delta: dict, finish_reason=None) -> str:
+        body = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "system_fingerprint": "stub",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(body)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "stub")
+        wants_tool = tool_name and body["messages"][-1]["role"] == "user"
+
+        if wants_tool:
+            tool_call = {"index": 0, "id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+                         "function": {"name": tool_name, "arguments": "{}"}}
+        words = REPLY.split(" ")
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_delay + token_delay * len(words))
+            message = {"role": "assistant", "content": "" if wants_tool else REPLY}
+            if wants_tool:
+                message["tool_calls"] = [tool_call]
+            return {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "system_fingerprint": "stub",
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if wants_tool else "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)},
+            }
+
+        async def stream():
+            await asyncio.sleep(first_token_delay)
+            if wants_tool:
+                yield chunk(model, {"role": "assistant", "tool_calls": [tool_call]})
+                yield chunk(model, {}, "tool_calls")
+            else:
+                for i, word in enumerate(words):
+                    yield chunk(model, {"role": "assistant", "content": word if i == 0 else " " + word})
+                    await asyncio.sleep(token_delay)
+                yield chunk(model, {}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--tool-name")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.first_token_delay, args.token_delay, args.tool_name), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
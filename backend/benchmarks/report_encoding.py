@@ -0,0 +1,93 @@
+"""
+Encoding cost of the report and trade-page responses, stdlib pipeline vs serialization.py.
+
+For a session of --rows trades (built like benchmarks/suite.py), times:
+  store    — encoding the analysis state and report for the database
+  report   — GET /report: stdlib decodes the stored text and FastAPI re-encodes
+             it; now the stored text is the response body
+  trades   — a MAX_PAGE_SIZE trade page: pandas to_json -> json.loads -> TradesPage
+             -> FastAPI encoding, against the pandas output embedded as a Fragment
+Both sides produce the same JSON (checked).
+
+    python benchmarks/report_encoding.py --rows 1m
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1m")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import warnings
+    warnings.filterwarnings("ignore")
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from benchmarks.suite import build_trades, parse_size
+    from analysis.aggregator import update_analysis_state, build_report
+    from analysis.series import add_derived_columns
+    from models.schemas import TradesPage
+    from serialization import Fragment, dumps, dumps_str, json_response, loads
+    from main import MAX_PAGE_SIZE
+
+    n_rows = parse_size(args.rows)
+    df = build_trades(n_rows)
+    state = update_analysis_state(None, df)
+    report = build_report(state, "bench")
+    stored = json.dumps(report)
+
+    def fastapi_body(obj) -> bytes:
+        return JSONResponse(jsonable_encoder(obj)).body
+
+    page = add_derived_columns(df.head(MAX_PAGE_SIZE))
+    page.insert(0, "idx", range(1, len(page) + 1))
+    columns = list(page.columns)
+
+    def trades_old():
+        return fastapi_body(TradesPage(
+            session_id="bench", total=n_rows, columns=columns,
+            trades=json.loads(page.to_json(orient="records", date_format="iso")),
+            next_cursor=str(MAX_PAGE_SIZE), downsampled=False,
+        ))
+
+    def trades_new():
+        return json_response({
+            "session_id": "bench", "total": n_rows, "columns": columns,
+            "trades": Fragment(page.to_json(orient="records", date_format="iso")),
+            "next_cursor": str(MAX_PAGE_SIZE), "downsampled": False,
+        }).body
+
+    assert loads(fastapi_body(loads(stored))) == loads(json_response(dumps_str(report)).body)
+    assert loads(trades_old()) == loads(trades_new())
+
+    cases = [
+        ("store", lambda: (json.dumps(state), json.dumps(report)), lambda: (dumps_str(state), dumps_str(report))),
+        ("report", lambda: fastapi_body(json.loads(stored)), lambda: json_response(stored).body),
+        ("trades", trades_old, trades_new),
+    ]
+    print(f"{n_rows:,} trades; report {len(stored):,} bytes, trade page {len(trades_new()):,} bytes")
+    for name, old, new in cases:
+        t_old, t_new = best_of(old, args.repeat), best_of(new, args.repeat)
+        print(f"{name:>8}: stdlib {t_old * 1000:8.3f} ms   orjson {t_new * 1000:8.3f} ms   ({t_old / t_new:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Benchmark suite: ingestion, detectors, ML scoring, the full analysis and the API flow.
+
+Inputs are built from the four trading_datasets/ archetypes, tiled in
+10k-trade blocks (timestamps shifted, balances chained) up to each size.
+Every (case, size) runs in a fresh subprocess so peak memory is its own:
+the kernel's RSS high-water mark is reset after the inputs are loaded
+(Linux; elsewhere ru_maxrss is used and includes input loading). Time is the
+best of --repeat runs.
+
+Results are written as JSON; --baseline compares against a stored run and
+exits non-zero if any case got slower or bigger than --tolerance allows.
+
+    python benchmarks/suite.py --sizes 10k 100k --out results.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json
+    python benchmarks/suite.py --sizes 10k 100k 1m --save-baseline benchmarks/baseline.json
+"""
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import subprocess
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASETS_DIR = os.path.join(BACKEND_DIR, "..", "trading_datasets")
+ARCHETYPES = ["calm_trader", "overtrader", "loss_averse_trader", "revenge_trader"]
+
+DEFAULT_SIZES = ["10k", "100k", "1m", "5m"]
+DEFAULT_DATA_DIR = os.path.join("/tmp", "bias-detector-bench")
+
+# Largest size each case runs at unless --no-caps: a 5M-row JSON document is
+# several GB once parsed, and the API flow re-does the CSV work end to end.
+CASE_MAX_ROWS = {
+    "parse_json_upload": 1_000_000,
+    "api_flow": 1_000_000,
+}
+
+
+def parse_size(text: str) -> int:
+    text = text.lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+# ── Inputs ────────────────────────────────────────────────────────────────────
+
+def build_trades(n_rows: int):
+    """n_rows trades made of the archetypes in round-robin 10k blocks."""
+    import pandas as pd
+    blocks = [pd.read_csv(os.path.join(DATASETS_DIR, f"{name}.csv"), parse_dates=["timestamp"]) for name in ARCHETYPES]
+    out, total, i = [], 0, 0
+    next_start, balance_offset = blocks[0]["timestamp"].iloc[0], 0.0
+    while total < n_rows:
+        block = blocks[i % len(blocks)].head(n_rows - total).copy()
+        block["timestamp"] = block["timestamp"] - block["timestamp"].iloc[0] + next_start
+        block["balance"] = block["balance"] + balance_offset
+        next_start = block["timestamp"].iloc[-1] + pd.Timedelta(hours=12)
+        last_balance = block["balance"].dropna()
+        balance_offset = (last_balance.iloc[-1] - 10_000.0) if len(last_balance) else balance_offset
+        out.append(block)
+        total += len(block)
+        i += 1
+    return pd.concat(out, ignore_index=True)
+
+
+def input_path(data_dir: str, n_rows: int, kind: str) -> str:
+    """Path of a cached input file (parquet, csv or json), generating it on first use."""
+    import pandas as pd
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"trades_{n_rows}.{kind}")
+    if os.path.exists(path):
+        return path
+    parquet = os.path.join(data_dir, f"trades_{n_rows}.parquet")
+    if not os.path.exists(parquet):
+        build_trades(n_rows).to_parquet(parquet, index=False)
+    if kind == "csv":
+        pd.read_parquet(parquet).to_csv(path, index=False)
+    elif kind == "json":
+        pd.read_parquet(parquet).to_json(path, orient="records", date_format="iso")
+    return path
+
+
+# ── Cases ─────────────────────────────────────────────────────────────────────
+# Each case is prepare(n_rows, data_dir) -> run() ; only run() is measured.
+
+def _trades_frame(n_rows, data_dir):
+    import pandas as pd
+    return pd.read_parquet(input_path(data_dir, n_rows, "parquet"))
+
+
+def case_parse_csv_upload(n_rows, data_dir):
+    from storage.file_handler import parse_csv_upload
+    with open(input_path(data_dir, n_rows, "csv"), "rb") as f:
+        content = f.read()
+    return lambda: parse_csv_upload(content)
+
+
+def case_parse_json_upload(n_rows, data_dir):
+    from storage.file_handler import parse_json_upload
+    with open(input_path(data_dir, n_rows, "json"), "rb") as f:
+        content = f.read()
+    return lambda: parse_json_upload(content)
+
+
+def case_detect_overtrading(n_rows, data_dir):
+    from analysis.overtrading import detect_overtrading
+    df = _trades_frame(n_rows, data_dir)
+    return lambda: detect_overtrading(df)
+
+
+def case_detect_loss_aversion(n_rows, data_dir):
+    from analysis.loss_aversion import detect_loss_aversion
+    df = _trades_frame(n_rows, data_dir)
+    return lambda: detect_loss_aversion(df)
+
+
+def case_detect_revenge_trading(n_rows, data_dir):
+    from analysis.revenge_trading import detect_revenge_trading
+    df = _trades_frame(n_rows, data_dir)
+    return lambda: detect_revenge_trading(df)
+
+
+def case_detect_anchoring(n_rows, data_dir):
+    from analysis.anchoring import detect_anchoring
+    df = _trades_frame(n_rows, data_dir)
+    return lambda: detect_anchoring(df)
+
+
+def case_predict_bias_scores(n_rows, data_dir):
+    from analysis.ml_scoring import predict_bias_scores, get_model
+    get_model()
+    df = _trades_frame(n_rows, data_dir)
+    return lambda: predict_bias_scores(df)
+
+
+def case_run_full_analysis(n_rows, data_dir):
+    from analysis.aggregator import run_full_analysis
+    from analysis.ml_scoring import get_model
+    get_model()
+    df = _trades_frame(n_rows, data_dir)
+    return lambda: run_full_analysis(df, "bench")
+
+
+def case_api_flow(n_rows, data_dir):
+    """POST /upload -> POST /analyze -> GET /report through TestClient (a fresh session each run)."""
+    import tempfile
+    work = tempfile.mkdtemp(prefix="bench_api_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{work}/bench.db"
+    os.environ["UPLOAD_DIR"] = os.path.join(work, "uploads")
+    # Every run uploads the same content; a zero-byte analysis cache keeps
+    # /analyze from answering runs after the first out of the cache
+    os.environ["ANALYSIS_CACHE_MAX_BYTES"] = "0"
+    # Timed as whole analyses: ?wait=true waits for the job however long it runs
+    os.environ["ANALYZE_WAIT_SECONDS"] = "600"
+    from fastapi.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    client.__enter__()      # run startup (DB init, model load) outside the measurement
+    with open(input_path(data_dir, n_rows, "csv"), "rb") as f:
+        content = f.read()
+    runs = iter(range(10**6))
+
+    def run():
+        r = client.post("/upload", files={"file": (f"bench_{next(runs)}.csv", content)})
+        r.raise_for_status()
+        session_id = r.json()["session_id"]
+        client.post(f"/analyze/{session_id}?wait=true").raise_for_status()
+        client.get(f"/report/{session_id}").raise_for_status()
+
+    return run
+
+
+CASES = {
+    name[len("case_"):]: fn for name, fn in globals().items() if name.startswith("case_")
+}
+
+
+# ── Measurement (runs inside the per-case subprocess) ─────────────────────────
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _reset_peak() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(case: str, n_rows: int, data_dir: str, repeat: int) -> dict:
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import logging
+    import warnings
+    logging.disable(logging.WARNING)
+    warnings.filterwarnings("ignore")
+
+    run = CASES[case](n_rows, data_dir)
+    gc.collect()
+    baseline = _rss_mb()
+    isolated = _reset_peak()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+        gc.collect()
+    return {
+        "case": case,
+        "rows": n_rows,
+        "seconds": round(min(times), 4),
+        "seconds_all": [round(t, 4) for t in times],
+        "peak_mb": round(max(0.0, _peak_mb() - baseline), 1),
+        "peak_isolated": isolated,
+    }
+
+
+# ── Driver ────────────────────────────────────────────────────────────────────
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(results: list, baseline: dict, tolerance: float, min_seconds: float) -> list:
+    """Regressions against `baseline`: slower or bigger than (1 + tolerance) x."""
+    base = {(r["case"], r["rows"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = base.get((r["case"], r["rows"]))
+        if not b:
+            continue
+        # Sub-threshold timings are noise; judge them on memory only
+        if r["seconds"] >= min_seconds and r["seconds"] > b["seconds"] * (1 + tolerance):
+            regressions.append(f"{r['case']} @ {r['rows']}: {b['seconds']}s -> {r['seconds']}s")
+        if r["peak_mb"] > max(b["peak_mb"] * (1 + tolerance), b["peak_mb"] + 16):
+            regressions.append(f"{r['case']} @ {r['rows']}: {b['peak_mb']} MB -> {r['peak_mb']} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="row counts, e.g. 10k 100k 1m 5m")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (1 above 1M rows)")
+    parser.add_argument("--no-caps", action="store_true", help="ignore CASE_MAX_ROWS")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="cache for generated inputs")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--save-baseline", help="write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-seconds", type=float, default=0.05)
+    parser.add_argument("--measure", nargs=2, metavar=("CASE", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure[0], int(args.measure[1]), args.data_dir, args.repeat)))
+        return
+
+    results = []
+    for size in map(parse_size, args.sizes):
+        for case in args.cases:
+            if not args.no_caps and size > CASE_MAX_ROWS.get(case, size):
+                print(f"{case:>24} {size:>9,}  skipped (above CASE_MAX_ROWS)")
+                continue
+            repeat = 1 if size > 1_000_000 else args.repeat
+            cmd = [sys.executable, os.path.abspath(__file__), "--measure", case, str(size),
+                   "--repeat", str(repeat), "--data-dir", args.data_dir]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"{case:>24} {size:>9,}  FAILED\n{proc.stderr[-2000:]}")
+                results.append({"case": case, "rows": size, "error": proc.stderr[-500:]})
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{case:>24} {size:>9,}  {result['seconds']:>9.3f} s  {result['peak_mb']:>8.1f} MB")
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} cpu",
+        "results": results,
+    }
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    failed = any("error" in r for r in results)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare([r for r in results if "error" not in r], json.load(f),
+                                  args.tolerance, args.min_seconds)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+In-memory size of a session's trades under each schema.
+
+Builds --rows trades (like benchmarks/suite.py), stores them, and measures
+bytes per trade (pandas memory_usage, deep) of:
+  object   — asset/side as Python str objects, every number float64 (the old DTYPE_MAP)
+  str      — pandas' string dtype, every number float64
+  compact  — read_trades: categorical asset, enum-coded side, float32 where lossless
+  float32  — compact with TRADE_FLOAT32=all (prices in float32 too)
+and how long read_trades takes for the two compact variants.
+
+    python benchmarks/trade_memory.py --rows 1m
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1m")
+    args = parser.parse_args()
+
+    os.environ["UPLOAD_DIR"] = tempfile.mkdtemp(prefix="trade-memory-")
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    import warnings
+    warnings.filterwarnings("ignore")
+    from benchmarks.suite import build_trades, parse_size
+    from storage.file_handler import REQUIRED_COLUMNS
+    from storage.trade_store import write_trades, read_trades
+
+    n_rows = parse_size(args.rows)
+    df = build_trades(n_rows)[REQUIRED_COLUMNS]
+    path = write_trades("bench", df)
+    numbers = {c: "float64" for c in REQUIRED_COLUMNS[3:]}
+
+    def read(mode):
+        os.environ["TRADE_FLOAT32"] = mode
+        t0 = time.perf_counter()
+        out = read_trades(path)
+        return out, time.perf_counter() - t0
+
+    compact, t_compact = read("lossless")
+    narrow, t_narrow = read("all")
+    variants = [
+        ("object", df.astype({"asset": object, "side": object, **numbers}), None),
+        ("str", df.astype({"asset": "str", "side": "str", **numbers}), None),
+        ("compact", compact, t_compact),
+        ("float32", narrow, t_narrow),
+    ]
+
+    base = variants[0][1].memory_usage(index=False, deep=True).sum() / n_rows
+    print(f"{n_rows:,} trades")
+    print(f"{'schema':>8} {'bytes/trade':>12} {'vs object':>10} {'read_trades':>12}   per column")
+    for name, frame, seconds in variants:
+        usage = frame.memory_usage(index=False, deep=True)
+        per_trade = usage.sum() / n_rows
+        columns = " ".join(f"{col}={usage[col] / n_rows:.1f}" for col in REQUIRED_COLUMNS)
+        read_time = f"{seconds * 1000:9.0f} ms" if seconds is not None else f"{'':>12}"
+        print(f"{name:>8} {per_trade:12.1f} {base / per_trade:9.1f}x {read_time}   {columns}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Peak-memory check for the streaming CSV upload path.
+
+Generates synthetic trade CSVs of increasing size, streams each one through
+iter_csv_chunks -> TradeWriter (+ TradeHasher) in a fresh subprocess, and
+records the subprocess's peak RSS. Streaming keeps one chunk in memory, so the
+peak should stay roughly flat as the file grows; the script exits non-zero if
+the largest file peaks more than --max-growth times the smallest.
+
+    python benchmarks/upload_memory.py                 # 50 MB and 500 MB files
+    python benchmarks/upload_memory.py --sizes 20 100 --legacy
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_csv(path: str, target_mb: int, chunk_rows: int = 250_000, seed: int = 0):
+    """Write a sorted synthetic trade CSV of roughly `target_mb` megabytes."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-01-01")
+    balance = 10_000.0
+    with open(path, "w") as f:
+        header = True
+        while f.tell() < target_mb * 1024 * 1024:
+            pnl = rng.normal(0, 50, chunk_rows)
+            entry = rng.uniform(10, 500, chunk_rows)
+            chunk = pd.DataFrame({
+                "timestamp": start + pd.to_timedelta(np.cumsum(rng.integers(1, 120, chunk_rows)), unit="s"),
+                "asset": rng.choice(["AAPL", "MSFT", "TSLA", "AMZN", "NVDA"], chunk_rows),
+                "side": rng.choice(["BUY", "SELL"], chunk_rows),
+                "quantity": rng.integers(1, 200, chunk_rows).astype(float),
+                "entry_price": entry,
+                "exit_price": entry + rng.normal(0, 1, chunk_rows),
+                "profit_loss": pnl,
+                "balance": balance + np.cumsum(pnl),
+            })
+            start = chunk["timestamp"].iloc[-1]
+            balance = chunk["balance"].iloc[-1]
+            chunk.to_csv(f, index=False, header=header)
+            header = False
+
+
+def _ingest(csv_path: str, legacy: bool):
+    """Subprocess body: ingest one file and print rows, seconds and peak RSS as JSON."""
+    import resource
+    os.environ["UPLOAD_DIR"] = tempfile.mkdtemp(prefix="upload_mem_")
+    sys.path.insert(0, BACKEND_DIR)
+    from storage.file_handler import iter_csv_chunks, parse_csv_upload
+    from storage.trade_store import TradeWriter, write_trades
+    from storage.analysis_cache import TradeHasher, hash_trades
+
+    t0 = time.perf_counter()
+    if legacy:
+        # The pre-streaming path: whole body in memory, concatenated, then written
+        with open(csv_path, "rb") as f:
+            df = parse_csv_upload(f.read())
+        write_trades("bench", df)
+        hash_trades(df)
+        rows = len(df)
+    else:
+        hasher = TradeHasher()
+        with open(csv_path, "rb") as f, TradeWriter("bench") as writer:
+            for chunk in iter_csv_chunks(f):
+                writer.write(chunk)
+                hasher.update(chunk)
+        rows = writer.row_count
+    print(json.dumps({
+        "rows": rows,
+        "seconds": round(time.perf_counter() - t0, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500], help="file sizes in MB")
+    parser.add_argument("--legacy", action="store_true", help="also measure the whole-file parse path")
+    parser.add_argument("--max-growth", type=float, default=1.5)
+    parser.add_argument("--ingest", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.ingest:
+        _ingest(args.ingest, args.legacy)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"trades_{size}mb.csv")
+            write_csv(path, size)
+            modes = ["stream", "legacy"] if args.legacy else ["stream"]
+            for mode in modes:
+                cmd = [sys.executable, __file__, "--ingest", path] + (["--legacy"] if mode == "legacy" else [])
+                out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+                results[(mode, size)] = json.loads(out.strip().splitlines()[-1])
+                print(f"{mode:>6} {size:>5} MB  {results[(mode, size)]}")
+
+    smallest, largest = results[("stream", min(args.sizes))], results[("stream", max(args.sizes))]
+    growth = largest["peak_rss_mb"] / smallest["peak_rss_mb"]
+    print(f"stream peak growth {min(args.sizes)} MB -> {max(args.sizes)} MB: {growth:.2f}x (limit {args.max_growth}x)")
+    sys.exit(0 if growth <= args.max_growth else 1)
+
+
+if __name__ == "__main__":
+    main()
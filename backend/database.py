@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -8,11 +8,33 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./bias_detector.db")
 
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IN_MEMORY = IS_SQLITE and (":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") == "sqlite:")
+
+# Sync handlers run on the AnyIO threadpool (sized to match in main.py), so
+# the pool must hand every worker thread a connection without queueing.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    **({} if IN_MEMORY else {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_pre_ping": True}),
 )
 
+
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, _record):
+        """WAL lets readers run alongside a writer; busy_timeout makes writers wait instead of failing."""
+        cursor = dbapi_connection.cursor()
+        if not IN_MEMORY:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -26,6 +48,21 @@ def get_db():
         db.close()
 
 
+def _add_missing_columns():
+    """create_all() never alters existing tables, so add new nullable columns by hand."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'))
+
+
 def init_db():
-    from models.db_models import TradingSession  # noqa: F401
+    from models.db_models import TradingSession, ChatMessage, AnalysisCacheEntry  # noqa: F401
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
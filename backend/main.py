@@ -1,34 +1,66 @@
 import os
 import uuid
-import json
+import asyncio
 import logging
 from datetime import datetime
-from typing import List
+from typing import Awaitable, List, Optional, Tuple
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+import anyio
+import anyio.to_thread
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from database import get_db, init_db
+from database import get_db, init_db, SessionLocal, DB_POOL_SIZE, DB_MAX_OVERFLOW
 from models.db_models import TradingSession
 from models.schemas import (
     UploadResponse,
     ManualUploadRequest,
+    TradeRecord,
     ChatRequest,
     ChatResponse,
     OnboardingStatus,
     FullReport,
+    TradesPage,
+    BiasTimeline,
 )
-from storage.file_handler import parse_csv_upload, parse_json_upload, parse_manual_trades
-from analysis.aggregator import run_full_analysis
-from agents.graph import run_agent
+from storage.file_handler import REQUIRED_COLUMNS, SIDES, iter_csv_chunks, parse_json_upload, parse_manual_trades
+from storage.trade_store import (
+    TradeWriter, write_trades, append_trades, read_trades, totals_before, migrate_legacy_trades, session_lock,
+)
+from storage.analysis_cache import TradeHasher, hash_trades
+from analysis.aggregator import update_analysis_state, build_report, is_current_state
+from analysis.ml_scoring import get_model
+from analysis.series import DERIVED_COLUMNS, add_derived_columns, lttb_indices
+from analysis.timeline import TIMELINE_COLUMNS, bias_timeline
+from analysis.live import LiveDetector, parse_timestamp
+from agents.graph import run_agent, stream_agent, get_graph
+from metrics import span, render_metrics
+from serialization import Fragment, dumps_str, loads, json_response
+from range_analysis import parse_range
+from analysis_jobs import AnalysisJob, QueueFull, CANCELLED, FAILED, TIMED_OUT, FULL_ANALYSIS, jobs
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MAX_PAGE_SIZE = 10_000
+# Live feed trades are appended to the session in batches of this many (or
+# after this many idle seconds); a feed stops reading while this many wait
+LIVE_FLUSH_TRADES = int(os.getenv("LIVE_FLUSH_TRADES", "500"))
+LIVE_FLUSH_SECONDS = float(os.getenv("LIVE_FLUSH_SECONDS", "30"))
+LIVE_MAX_PENDING_TRADES = int(os.getenv("LIVE_MAX_PENDING_TRADES", "5000"))
+# How long GET /report waits on an in-flight analysis before giving up, and
+# how long POST /analyze?wait=true waits before answering with the job instead;
+# both hold a threadpool worker meanwhile
+REPORT_WAIT_SECONDS = float(os.getenv("REPORT_WAIT_SECONDS", "5"))
+ANALYZE_WAIT_SECONDS = float(os.getenv("ANALYZE_WAIT_SECONDS", "10"))
+
 app = FastAPI(title="Financial Bias Detector API", version="1.0.0")
 
 app.add_middleware(
@@ -42,122 +74,518 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_event():
+    # Handlers are plain `def` so FastAPI runs their blocking DB and pandas work
+    # on the threadpool; size it to the connection pool so no thread waits on it.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = DB_POOL_SIZE + DB_MAX_OVERFLOW
     init_db()
     os.makedirs(os.getenv("UPLOAD_DIR", "uploads"), exist_ok=True)
+    db = SessionLocal()
+    try:
+        migrated = migrate_legacy_trades(db)
+    finally:
+        db.close()
+    if migrated:
+        logger.info(f"Migrated {migrated} legacy sessions to columnar trade storage.")
+    # Map the compiled model (or unpickle the sklearn fallback) before serving
+    await run_in_threadpool(get_model)
+    get_graph()
     logger.info("Database initialized and upload directory ready.")
 
 
+@app.on_event("shutdown")
+def shutdown_event():
+    # Running analysis jobs stop at their next check; queued ones are dropped
+    jobs.shutdown()
+
+
 # ── Upload endpoints ──────────────────────────────────────────────────────────
 
 @app.post("/upload", response_model=UploadResponse)
-async def upload_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+def upload_csv(file: UploadFile = File(...), analyze: bool = False, db: Session = Depends(get_db)):
+    """Stores the trades as a new session; `analyze=true` starts its analysis in the background."""
     if not (file.filename.endswith(".csv") or file.filename.endswith(".json")):
         raise HTTPException(status_code=400, detail="Only CSV or JSON files are accepted.")
 
     session_id = str(uuid.uuid4())
-    content = await file.read()
 
     try:
         if file.filename.endswith(".csv"):
-            df, trades_json = parse_csv_upload(content)
+            # Stream the spooled upload chunk by chunk straight into storage
+            hasher = TradeHasher()
+            with span("upload.csv_ingest"), TradeWriter(session_id) as writer:
+                for chunk in iter_csv_chunks(file.file):
+                    writer.write(chunk)
+                    hasher.update(chunk)
+            trades_path, trade_count = writer.path, writer.row_count
+            # A re-sorted upload no longer matches the streamed hash; /analyze rehashes it
+            content_hash = None if writer.resorted else hasher.hexdigest()
         else:
-            df, trades_json = parse_json_upload(content)
+            with span("upload.json_parse"):
+                df = parse_json_upload(file.file.read())
+            with span("upload.json_write"):
+                trades_path, trade_count, content_hash = write_trades(session_id, df), len(df), hash_trades(df)
     except Exception as e:
         raise HTTPException(status_code=422, detail=f"File parse error: {str(e)}")
 
-    # No capped sampling; process full dataset for analysis
-    # trades_json already contains the full dataset from parse_csv_upload/parse_json_upload
-
     session = TradingSession(
         id=session_id,
         filename=file.filename,
-        trade_count=len(df),
-        trades_json=trades_json,
+        trade_count=trade_count,
+        trades_path=trades_path,
+        content_hash=content_hash,
     )
     db.add(session)
     db.commit()
 
     return UploadResponse(
         session_id=session_id,
-        trade_count=len(df),
+        trade_count=trade_count,
         filename=file.filename,
+        job_id=_start_analysis(session_id) if analyze else None,
     )
 
 
 @app.post("/upload/manual", response_model=UploadResponse)
-async def upload_manual(request: ManualUploadRequest, db: Session = Depends(get_db)):
+def upload_manual(request: ManualUploadRequest, db: Session = Depends(get_db)):
     session_id = request.session_id or str(uuid.uuid4())
 
     try:
-        df, trades_json = parse_manual_trades(request.trades)
+        df = parse_manual_trades(request.trades)
     except Exception as e:
         raise HTTPException(status_code=422, detail=f"Trade parse error: {str(e)}")
 
+    trade_count, report_current = _store_trades(db, session_id, df, request.append)
+    # An in-order append already updated the report incrementally
+    return UploadResponse(
+        session_id=session_id,
+        trade_count=trade_count,
+        filename="manual_entry",
+        job_id=_start_analysis(session_id) if request.analyze and not report_current else None,
+    )
+
+
+def _store_trades(db: Session, session_id: str, df, append: bool, filename: str = "manual_entry") -> Tuple[int, bool]:
+    """
+    Saves parsed trades to the session (created if missing), replacing its
+    trades or appending to them. Returns the session's trade count and whether
+    its report is already current (an in-order append folded into its state).
+    Writers to one session (manual uploads, live feed batches) take turns.
+    """
+    with session_lock(session_id):
+        return _store_trades_locked(db, session_id, df, append, filename)
+
+
+def _store_trades_locked(db: Session, session_id: str, df, append: bool, filename: str) -> Tuple[int, bool]:
     existing = db.query(TradingSession).filter(TradingSession.id == session_id).first()
-    if existing:
-        existing.trades_json = trades_json
+    report_current = False
+    if existing and append and existing.trades_path:
+        # Append mode: fold only the new trades into the stored detector state
+        previous_count = existing.trade_count
+        in_order = append_trades(session_id, df)
+        # Incremented in SQL, not written back from the count read above
+        db.query(TradingSession).filter(TradingSession.id == session_id).update(
+            {TradingSession.trade_count: TradingSession.trade_count + len(df)}, synchronize_session=False,
+        )
+        existing.content_hash = None
+        # Written even if already None: an analysis job may have stored a hash since this row was loaded
+        flag_modified(existing, "content_hash")
+        state = loads(existing.analysis_state_json) if existing.analysis_state_json else None
+        report_current = in_order and is_current_state(state, previous_count)
+        if report_current:
+            state = update_analysis_state(state, df)
+            existing.analysis_state_json = dumps_str(state)
+            existing.report_json = dumps_str(build_report(state, session_id))
+        else:
+            _invalidate_report(existing)
+        db.commit()
+    elif existing:
+        existing.trades_path = write_trades(session_id, df)
+        existing.trades_json = None
         existing.trade_count = len(df)
+        existing.content_hash = hash_trades(df)
+        _invalidate_report(existing)
         db.commit()
     else:
         session = TradingSession(
             id=session_id,
-            filename="manual_entry",
+            filename=filename,
             trade_count=len(df),
-            trades_json=trades_json,
+            trades_path=write_trades(session_id, df),
+            content_hash=hash_trades(df),
         )
         db.add(session)
         db.commit()
+    return (existing.trade_count if existing else len(df)), report_current
 
-    return UploadResponse(
-        session_id=session_id,
-        trade_count=len(df),
-        filename="manual_entry",
-    )
+
+def _invalidate_report(session: TradingSession) -> None:
+    """Drops the detector state and the report built from it; the next /analyze rebuilds both."""
+    session.analysis_state_json = None
+    session.report_json = None
+    # Written even if already None, like content_hash above
+    flag_modified(session, "analysis_state_json")
+    flag_modified(session, "report_json")
+
+
+def _start_analysis(session_id: str) -> Optional[str]:
+    """Queues the session's full analysis right after an upload; a full queue doesn't fail the upload."""
+    stale = jobs.find(session_id, FULL_ANALYSIS)
+    if stale is not None:
+        # It is analyzing the trades this upload replaced or extended
+        jobs.cancel(stale.id)
+    try:
+        return jobs.submit(session_id, FULL_ANALYSIS).id
+    except QueueFull as e:
+        logger.warning(f"No eager analysis for session {session_id}: {e}")
+        return None
 
 
 # ── Analysis endpoints ────────────────────────────────────────────────────────
 
 @app.post("/analyze/{session_id}")
-async def analyze_session(session_id: str, db: Session = Depends(get_db)):
+def analyze_session(
+    session_id: str,
+    timings: bool = False,
+    breakdown: bool = False,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    asset: Optional[str] = None,
+    wait: bool = False,
+    timeout: Optional[float] = Query(None, gt=0),
+    db: Session = Depends(get_db),
+):
+    """
+    Submits the analysis as a background job and answers 202 with the job
+    (poll GET /jobs/{job_id}, then GET /jobs/{job_id}/result); a session with
+    a queued or running job for the same options gets that job back.
+    `wait=true` waits up to ANALYZE_WAIT_SECONDS for the job and returns the
+    report itself, or the 202 job if it is still running by then.
+    `breakdown=true` adds per-asset and per-side scores to the report;
+    `timings=true` adds per-stage milliseconds (with `wait`). `from` / `to`
+    (ISO dates or timestamps, inclusive) and `asset` analyze only the
+    matching trades; that report is cached on its own and does not replace
+    the session's report. `timeout` (seconds) shortens the job's deadline.
+    """
     session = db.query(TradingSession).filter(TradingSession.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found.")
-    if not session.trades_json:
+    if not session.trades_path:
         raise HTTPException(status_code=400, detail="No trades loaded for this session.")
+    # The job's worker opens its own connection; don't hold this one while waiting
+    db.close()
+
+    options = {"breakdown": breakdown}
+    if date_from or date_to or asset:
+        try:
+            start, end = parse_range(date_from, date_to)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid range: {e}")
+        options.update({
+            "from": start.isoformat() if start is not None else None,
+            "to": end.isoformat() if end is not None else None,
+            "asset": asset,
+        })
+    try:
+        job = jobs.submit(session_id, options, timeout)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-    import pandas as pd
-    import io
-    df = pd.read_json(io.StringIO(session.trades_json), orient="records")
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    if not wait or not job.done.wait(ANALYZE_WAIT_SECONDS):
+        return JSONResponse(job.to_dict(), status_code=202)
+    report_bytes = _job_result(job)
+    if timings:
+        return json_response({**loads(report_bytes), "timings": job.timings})
+    return json_response(report_bytes)
 
-    try:
-        report = run_full_analysis(df, session_id)
-    except Exception as e:
-        logger.error(f"Analysis error for session {session_id}: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-    session.report_json = json.dumps(report)
-    db.commit()
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status and progress of an analysis job."""
+    return _find_job(job_id).to_dict()
+
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    """The report of a succeeded job; 409 while it is still queued or running."""
+    job = _find_job(job_id)
+    if not job.done.is_set():
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}.")
+    return json_response(_job_result(job))
+
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Cancels a queued job at once and a running one at its next stage or detector."""
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
+
+
+def _find_job(job_id: str) -> AnalysisJob:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
 
-    return report
+def _job_result(job: AnalysisJob) -> bytes:
+    """The finished job's encoded report, or the HTTP error for how it ended."""
+    if job.status == CANCELLED:
+        raise HTTPException(status_code=409, detail="Analysis was cancelled.")
+    if job.status == TIMED_OUT:
+        raise HTTPException(status_code=504, detail="Analysis ran past its deadline.")
+    if job.status == FAILED:
+        raise HTTPException(status_code=job.error_status, detail=job.error)
+    return job.result
 
 
 @app.get("/report/{session_id}")
-async def get_report(session_id: str, db: Session = Depends(get_db)):
+def get_report(session_id: str, db: Session = Depends(get_db)):
+    """
+    The session's stored report. While its full analysis is queued or running
+    (e.g. started at upload), waits up to REPORT_WAIT_SECONDS for it first.
+    """
+    job = jobs.find(session_id, FULL_ANALYSIS)
+    if job is not None:
+        job.done.wait(REPORT_WAIT_SECONDS)
+
     session = db.query(TradingSession).filter(TradingSession.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found.")
     if not session.report_json:
+        if job is not None and not job.done.is_set():
+            raise HTTPException(status_code=404, detail=f"Analysis still running; poll GET /jobs/{job.id}.")
         raise HTTPException(status_code=404, detail="No report generated yet. Call POST /analyze/{session_id} first.")
 
-    return json.loads(session.report_json)
+    # Stored already encoded; served without a decode/encode round trip
+    return json_response(session.report_json)
+
+
+# ── Trade series endpoint ─────────────────────────────────────────────────────
+
+@app.get("/session/{session_id}/trades", response_model=TradesPage)
+def get_session_trades(
+    session_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
+    columns: Optional[str] = None,
+    points: Optional[int] = Query(None, ge=3, le=MAX_PAGE_SIZE),
+    y: str = "balance",
+    db: Session = Depends(get_db),
+):
+    """
+    Paginated trade rows for charts. `columns` projects stored and derived
+    columns; `points` LTTB-downsamples the whole session on column `y` instead
+    of paginating.
+    """
+    session = db.query(TradingSession).filter(TradingSession.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found.")
+    if not session.trades_path:
+        raise HTTPException(status_code=400, detail="No trades loaded for this session.")
+
+    allowed = REQUIRED_COLUMNS + DERIVED_COLUMNS
+    requested = [c.strip() for c in columns.split(",") if c.strip()] if columns else list(REQUIRED_COLUMNS)
+    unknown = [c for c in requested + [y] if c not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {unknown}")
+
+    needed = set(requested) | ({y} if points else set())
+    stored = [c for c in REQUIRED_COLUMNS if c in needed]
+    if needed & {"peak", "drawdown_pct"}:
+        stored.append("balance")
+    if "cum_pnl" in needed:
+        stored.append("profit_loss")
+    stored = list(dict.fromkeys(stored))
+    derived = bool(needed & set(DERIVED_COLUMNS))
+
+    next_cursor = None
+    if points:
+        df = read_trades(session.trades_path, columns=stored)
+        if derived:
+            df = add_derived_columns(df)
+        df.insert(0, "idx", range(1, len(df) + 1))
+        total = len(df)
+        page = df.iloc[lttb_indices(df[y].to_numpy(), points)]
+    else:
+        try:
+            offset = int(cursor) if cursor else 0
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        # A negative offset would slice from the end of the session
+        if offset < 0:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        # Only the page's rows are read; running columns start from the totals before it
+        with session_lock(session_id):
+            # The count matching the stored parts (appends update both under this lock)
+            db.refresh(session)
+            total = session.trade_count
+            page = read_trades(session.trades_path, columns=stored, offset=offset, limit=limit)
+            if derived:
+                page = add_derived_columns(page, *totals_before(session.trades_path, offset))
+        page.insert(0, "idx", range(offset + 1, offset + len(page) + 1))
+        if offset + limit < total:
+            next_cursor = str(offset + limit)
+
+    page = page[["idx"] + requested]
+    # pandas encodes the rows; they are embedded in the TradesPage body without re-parsing
+    return json_response({
+        "session_id": session_id,
+        "total": total,
+        "columns": ["idx"] + requested,
+        "trades": Fragment(page.to_json(orient="records", date_format="iso")),
+        "next_cursor": next_cursor,
+        "downsampled": bool(points) and len(page) < total,
+    })
+
+
+# ── Bias timeline endpoint ────────────────────────────────────────────────────
+
+@app.get("/session/{session_id}/bias_timeline", response_model=BiasTimeline)
+def get_bias_timeline(session_id: str, window: str = "1D", db: Session = Depends(get_db)):
+    """
+    Detector and ML bias scores per window: a calendar span ("1D", "12h",
+    "1W") or a number of trades ("100trades"). Windows without trades are left out.
+    """
+    session = db.query(TradingSession).filter(TradingSession.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found.")
+    if not session.trades_path:
+        raise HTTPException(status_code=400, detail="No trades loaded for this session.")
+
+    with span("timeline.read_trades"):
+        df = read_trades(session.trades_path, columns=TIMELINE_COLUMNS)
+    try:
+        with span("timeline.compute"):
+            points = bias_timeline(df, window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return json_response({"session_id": session_id, "window": window, "points": points})
+
+
+# ── Live trade feed ───────────────────────────────────────────────────────────
+
+# Sessions with an open feed; a second feed would interleave appends
+_live_sessions = set()
+
+
+@app.websocket("/ws/session/{session_id}/trades")
+async def live_trade_feed(websocket: WebSocket, session_id: str):
+    """
+    Takes trades one message at a time (a TradeRecord as JSON) as they
+    execute and answers each at once with the bias alerts it triggers:
+    {"type": "trade", "index", "alerts", "live"}, or {"type": "error"} for a
+    trade that is rejected. The feed's state is a LiveDetector seeded from
+    the session's stored analysis. Trades are appended to the session (created
+    if missing) off the event loop in batches, and when the feed closes, so
+    the session's report keeps up.
+    """
+    await websocket.accept()
+    if session_id in _live_sessions:
+        await websocket.close(code=1008, reason="This session already has a live feed.")
+        return
+    _live_sessions.add(session_id)
+    pending: List[TradeRecord] = []
+    flushing: Optional[asyncio.Future] = None
+
+    async def flush():
+        nonlocal pending, flushing
+        if flushing is not None:
+            await _finish_flush(websocket, session_id, flushing)
+        batch, pending = pending, []
+        flushing = asyncio.ensure_future(run_in_threadpool(_store_live_trades, session_id, batch))
+
+    try:
+        detector = await run_in_threadpool(_load_live_detector, session_id)
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive_text(), LIVE_FLUSH_SECONDS if pending else None)
+            except asyncio.TimeoutError:
+                await flush()
+                continue
+            try:
+                trade, timestamp = _parse_live_trade(message, detector)
+            except ValueError as e:
+                await websocket.send_text(dumps_str({"type": "error", "detail": str(e)}))
+                continue
+            alerts = detector.update(timestamp, trade.quantity, trade.profit_loss, trade.balance)
+            await websocket.send_text(dumps_str({
+                "type": "trade",
+                "index": detector.trade_count - 1,
+                "alerts": alerts,
+                "live": detector.snapshot(),
+            }))
+            pending.append(trade)
+            if flushing is not None and flushing.done():
+                await _finish_flush(websocket, session_id, flushing)
+                flushing = None
+            # Start a batch when none is being stored; wait for it once too many pile up
+            if (len(pending) >= LIVE_FLUSH_TRADES and flushing is None) or len(pending) >= LIVE_MAX_PENDING_TRADES:
+                await flush()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Store what is left even if the handler is being cancelled (server shutdown)
+        with anyio.CancelScope(shield=True):
+            try:
+                if flushing is not None:
+                    await _finish_flush(None, session_id, flushing)
+                if pending:
+                    await _finish_flush(None, session_id, run_in_threadpool(_store_live_trades, session_id, pending))
+            finally:
+                _live_sessions.discard(session_id)
+
+
+def _load_live_detector(session_id: str) -> LiveDetector:
+    db = SessionLocal()
+    try:
+        session = db.query(TradingSession).filter(TradingSession.id == session_id).first()
+        state = loads(session.analysis_state_json) if session and session.analysis_state_json else None
+        # A stale state would pair the first live trade with the wrong history
+        return LiveDetector.from_state(state if state and is_current_state(state, session.trade_count) else None)
+    finally:
+        db.close()
+
+
+def _parse_live_trade(message: str, detector: LiveDetector):
+    """The validated trade (timestamp normalized) and its timestamp; ValueError if it can't be taken."""
+    trade = TradeRecord.model_validate_json(message)
+    timestamp = parse_timestamp(trade.timestamp)
+    if trade.side.strip().upper() not in SIDES:
+        raise ValueError(f"Unknown side '{trade.side}'. Expected one of {SIDES}.")
+    if detector.last_timestamp is not None and timestamp < detector.last_timestamp:
+        raise ValueError("Trade is older than the previous one; live trades must arrive in order.")
+    return trade.model_copy(update={"timestamp": timestamp.isoformat()}), timestamp
+
+
+def _store_live_trades(session_id: str, trades: List[TradeRecord]) -> int:
+    db = SessionLocal()
+    try:
+        trade_count, _ = _store_trades(db, session_id, parse_manual_trades(trades), append=True, filename="live_feed")
+        return trade_count
+    finally:
+        db.close()
+
+
+async def _finish_flush(websocket: Optional[WebSocket], session_id: str, flushing: Awaitable[int]):
+    """Waits for a stored batch; a failure is logged and reported on the feed, which carries on."""
+    try:
+        await flushing
+    except Exception as e:
+        logger.error(f"Storing live trades for session {session_id} failed: {e}", exc_info=True)
+        if websocket is not None:
+            await websocket.send_text(dumps_str({"type": "error", "detail": f"Storing trades failed: {str(e)}"}))
 
 
 # ── Chat endpoint ─────────────────────────────────────────────────────────────
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest, db: Session = Depends(get_db)):
-    session = db.query(TradingSession).filter(TradingSession.id == request.session_id).first()
+    session = await run_in_threadpool(
+        lambda: db.query(TradingSession).filter(TradingSession.id == request.session_id).first()
+    )
     if not session:
         raise HTTPException(status_code=404, detail="Session not found.")
 
@@ -174,18 +602,63 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
         logger.error(f"Agent error for session {request.session_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
 
-    return ChatResponse(
-        response=response_text,
-        onboarding_complete=updated_session.onboarding_complete,
-        turn_count=updated_session.chat_turn_count,
-        updated_report=json.loads(updated_session.report_json) if updated_session.report_json else None,
+    return json_response({"response": response_text, **_session_fields(updated_session)})
+
+
+def _session_fields(session: TradingSession) -> dict:
+    """ChatResponse fields besides `response`; the stored report is embedded without decoding it."""
+    return {
+        "onboarding_complete": session.onboarding_complete,
+        "turn_count": session.chat_turn_count,
+        "updated_report": Fragment(session.report_json) if session.report_json else None,
+    }
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {dumps_str(event)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Same turn as POST /chat, streamed as Server-Sent Events:
+    `token` (assistant text deltas), `tool_start` / `tool_end`, then `done`
+    with the ChatResponse fields, or `error`.
+    """
+    # The stream outlives the request's dependencies, so it owns its DB session
+    db = SessionLocal()
+    session = await run_in_threadpool(
+        lambda: db.query(TradingSession).filter(TradingSession.id == request.session_id).first()
+    )
+    if not session:
+        db.close()
+        raise HTTPException(status_code=404, detail="Session not found.")
+
+    history = [{"role": m.role, "content": m.content} for m in (request.history or [])]
+
+    async def events():
+        try:
+            async for event in stream_agent(request.session_id, request.message, history, db):
+                if event["type"] == "done":
+                    event.update(_session_fields(event.pop("session")))
+                yield _sse(event)
+        except Exception as e:
+            logger.error(f"Agent error for session {request.session_id}: {e}", exc_info=True)
+            yield _sse({"type": "error", "detail": f"Agent error: {str(e)}"})
+        finally:
+            await run_in_threadpool(db.close)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 # ── Onboarding status ─────────────────────────────────────────────────────────
 
 @app.get("/session/{session_id}/onboarding_status", response_model=OnboardingStatus)
-async def get_onboarding_status(session_id: str, db: Session = Depends(get_db)):
+def get_onboarding_status(session_id: str, db: Session = Depends(get_db)):
     session = db.query(TradingSession).filter(TradingSession.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found.")
@@ -197,8 +670,14 @@ async def get_onboarding_status(session_id: str, db: Session = Depends(get_db)):
     )
 
 
-# ── Health check ──────────────────────────────────────────────────────────────
+# ── Health check / metrics ────────────────────────────────────────────────────
 
 @app.get("/health")
 async def health():
     return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage timing histograms in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
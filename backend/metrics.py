@@ -0,0 +1,120 @@
+"""
+Stage timing and a Prometheus-format metrics registry.
+
+    with span("analysis.features"):
+        ...
+
+Every span is observed into the `bias_detector_stage_seconds` histogram
+(labelled by stage), rendered at GET /metrics. Inside `collect_timings()`
+the spans of the current request are also summed into a dict, which
+/analyze returns as the report's optional `timings` block. Components with
+their own counters (e.g. the frame cache) register a collector.
+A span costs two perf_counter calls and a bucket increment under a lock.
+"""
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative Prometheus histogram with one label."""
+
+    def __init__(self, name: str, help: str, label: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[str, list] = {}     # label value -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, seconds: float):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for value, series in sorted(snapshot.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_SECONDS = Histogram(
+    "bias_detector_stage_seconds",
+    "Time spent in each stage of upload, analysis and agent turns.",
+    label="stage",
+)
+
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+def observe(stage: str, seconds: float):
+    """Records a stage duration measured elsewhere (e.g. in a worker process)."""
+    STAGE_SECONDS.observe(stage, seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 3)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def collect_timings() -> Iterator[Dict[str, float]]:
+    """Collects the milliseconds spent per stage by spans in this context."""
+    timings: Dict[str, float] = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+_collectors: List[Callable[[], str]] = []
+
+
+def register_collector(render: Callable[[], str]):
+    """Adds a component's own metrics (rendered text, see render_value) to GET /metrics."""
+    _collectors.append(render)
+
+
+def render_value(name: str, help: str, kind: str, value: float) -> str:
+    """One unlabelled counter or gauge in the text format."""
+    return f"# HELP {name} {help}\n# TYPE {name} {kind}\n{name} {value}\n"
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return STAGE_SECONDS.render() + "".join(render() for render in _collectors)
@@ -12,13 +12,20 @@ class TradingSession(Base):
     trade_count = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     report_json = Column(Text, nullable=True)        # cached full report JSON
-    trades_json = Column(Text, nullable=True)        # serialized trades DataFrame as JSON records
+    analysis_state_json = Column(Text, nullable=True)  # running detector state for incremental appends
+    trades_json = Column(Text, nullable=True)        # legacy JSON records; migrated to trades_path on startup
+    trades_path = Column(String, nullable=True)      # Parquet dataset directory under UPLOAD_DIR
+    content_hash = Column(String, nullable=True)     # hash of the normalized trades; None until computed
 
     # Psychological profile / onboarding
     psychological_profile = Column(Text, nullable=True)   # JSON string
     onboarding_complete = Column(Boolean, default=False)
     chat_turn_count = Column(Integer, default=0)
 
+    # Conversation memory: rolling summary of messages up to chat_summary_through (a ChatMessage id)
+    chat_summary = Column(Text, nullable=True)
+    chat_summary_through = Column(Integer, nullable=True)
+
     def get_psychological_profile(self) -> dict:
         if self.psychological_profile:
             return json.loads(self.psychological_profile)
@@ -26,3 +33,25 @@ class TradingSession(Base):
 
     def set_psychological_profile(self, profile: dict):
         self.psychological_profile = json.dumps(profile)
+
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String, index=True, nullable=False)
+    role = Column(String, nullable=False)            # "user" or "assistant"
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AnalysisCacheEntry(Base):
+    __tablename__ = "analysis_cache"
+
+    key = Column(String, primary_key=True)           # content hash + analysis/model versions
+    state_json = Column(Text, nullable=False)
+    report_json = Column(Text, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+    hit_count = Column(Integer, default=0)
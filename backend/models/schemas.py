@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict
 from datetime import datetime
 
 
@@ -19,12 +19,15 @@ class TradeRecord(BaseModel):
 class ManualUploadRequest(BaseModel):
     session_id: Optional[str] = None
     trades: List[TradeRecord]
+    append: bool = False    # add to the session's trades instead of replacing them
+    analyze: bool = False   # start the analysis in the background once stored
 
 
 class UploadResponse(BaseModel):
     session_id: str
     trade_count: int
     filename: Optional[str] = None
+    job_id: Optional[str] = None    # the background analysis started with analyze=true
 
 
 # ── Analysis ──────────────────────────────────────────────────────────────────
@@ -52,6 +55,29 @@ class RiskProfile(BaseModel):
     components: dict
 
 
+class TradesPage(BaseModel):
+    session_id: str
+    total: int
+    columns: List[str]
+    trades: List[dict]
+    next_cursor: Optional[str] = None
+    downsampled: bool = False
+
+
+class BiasTimelinePoint(BaseModel):
+    start: str
+    end: str
+    trade_count: int
+    scores: Dict[str, float]
+    ml_scores: Dict[str, float]
+
+
+class BiasTimeline(BaseModel):
+    session_id: str
+    window: str
+    points: List[BiasTimelinePoint]
+
+
 class FullReport(BaseModel):
     session_id: str
     generated_at: str
@@ -61,6 +87,7 @@ class FullReport(BaseModel):
     risk_profile: dict
     overall_risk_score: float
     top_recommendation: str
+    breakdown: Optional[Dict[str, List[dict]]] = None
 
 
 # ── Chat ──────────────────────────────────────────────────────────────────────
@@ -73,7 +100,7 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     session_id: str
     message: str
-    history: Optional[List[ChatMessage]] = []
+    history: Optional[List[ChatMessage]] = []   # only seeds server-side memory for sessions with none stored
 
 
 class ChatResponse(BaseModel):
@@ -0,0 +1,99 @@
+"""
+Analysis of part of a session — a date range and/or one asset.
+
+Only the matching rows are read (storage/trade_store.read_trades prunes by
+row-group timestamp statistics). Range reports go through the analysis cache
+under their own keys (the session's content hash plus the range), so a
+repeated question about "last week" is answered without touching the trades,
+and they never replace the session's full report.
+"""
+from typing import Callable, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from models.db_models import TradingSession
+from storage.trade_store import read_trades
+from storage.analysis_cache import hash_trades, cache_key, get_cached, put_cached
+from analysis.aggregator import update_analysis_state, build_report, analysis_version
+from analysis.breakdown import bias_breakdown
+from metrics import span
+from serialization import dumps_str, loads
+
+
+class EmptyRange(ValueError):
+    """No stored trades match the requested range."""
+
+
+def parse_range(date_from: Optional[str], date_to: Optional[str]) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    """
+    Inclusive bounds from ISO dates/timestamps; a date-only `date_to` covers
+    that whole day. Raises ValueError on unparseable input or from > to.
+    """
+    start = _naive(pd.Timestamp(date_from)) if date_from else None
+    end = _naive(pd.Timestamp(date_to)) if date_to else None
+    if end is not None and len(date_to.strip()) <= len("YYYY-MM-DD"):
+        end += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    if start is not None and end is not None and start > end:
+        raise ValueError("'from' is after 'to'.")
+    return start, end
+
+
+def analyze_range(db: Session, session: TradingSession, start: Optional[pd.Timestamp],
+                  end: Optional[pd.Timestamp], asset: Optional[str], breakdown: bool = False,
+                  on_done: Optional[Callable[[str, int, int], None]] = None) -> dict:
+    """
+    Report for the session's trades in [start, end] (and of `asset`), with a
+    `range` field describing the selection. Raises EmptyRange when nothing matches.
+    `on_done` is passed on to update_analysis_state (an analysis job's progress and cancel checks).
+    """
+    selection = {
+        "from": start.isoformat() if start is not None else None,
+        "to": end.isoformat() if end is not None else None,
+        "asset": asset,
+    }
+    df = None
+    if session.content_hash is not None:
+        key = _range_key(session.content_hash, selection)
+    else:
+        # Unhashed (appended) session: key on the selected trades themselves
+        with span("analyze.read_trades"):
+            df = read_trades(session.trades_path, start=start, end=end, asset=asset)
+        with span("analyze.hash"):
+            key = _range_key(hash_trades(df), selection)
+
+    with span("analyze.cache_lookup"):
+        cached = get_cached(db, key)
+    if cached:
+        report = loads(cached[1])
+    else:
+        if df is None:
+            with span("analyze.read_trades"):
+                df = read_trades(session.trades_path, start=start, end=end, asset=asset)
+        if len(df) == 0:
+            raise EmptyRange("No trades in the requested range.")
+        state = update_analysis_state(None, df, on_done=on_done)
+        with span("analysis.report"):
+            report = build_report(state, session.id)
+        report["range"] = selection
+        with span("analyze.cache_store"):
+            put_cached(db, key, dumps_str({}), dumps_str(report))
+
+    report["session_id"] = session.id
+    if breakdown:
+        if df is None:
+            with span("analyze.read_trades"):
+                df = read_trades(session.trades_path, start=start, end=end, asset=asset)
+        with span("analysis.breakdown"):
+            report["breakdown"] = bias_breakdown(df)
+    return report
+
+
+def _naive(ts: pd.Timestamp) -> pd.Timestamp:
+    """Stored timestamps carry no zone; aware bounds are compared in UTC."""
+    return ts.tz_convert(None) if ts.tzinfo is not None else ts
+
+
+def _range_key(content_hash: str, selection: dict) -> str:
+    return cache_key(content_hash, analysis_version(), "range",
+                     selection["from"], selection["to"], selection["asset"])
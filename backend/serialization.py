@@ -0,0 +1,52 @@
+"""
+JSON encoding for reports, analysis states and API responses, backed by orjson.
+
+Reports are encoded once: the bytes stored in `report_json` are what
+GET /report returns, and responses that embed a stored report or a
+pandas-encoded page wrap it in a `Fragment` instead of decoding it again.
+NumPy arrays and scalars, pandas Timestamps and NaT are handled; NaN and
+infinities encode as null (the stdlib wrote invalid `NaN` literals).
+"""
+from datetime import date, datetime
+from typing import Any, Union
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi.responses import Response
+
+Fragment = orjson.Fragment
+
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, (datetime, date)):      # pd.Timestamp is a datetime subclass
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, pd.Series):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+
+def dumps_str(obj: Any) -> str:
+    """Encoded as text, for the JSON columns of the database."""
+    return dumps(obj).decode()
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    return orjson.loads(data)
+
+
+def json_response(content: Union[bytes, str, Any], status_code: int = 200) -> Response:
+    """A JSON response from already-encoded bytes/str, or from an object encoded once here."""
+    if not isinstance(content, (bytes, str)):
+        content = dumps(content)
+    return Response(content=content, status_code=status_code, media_type="application/json")
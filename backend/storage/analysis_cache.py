@@ -0,0 +1,96 @@
+"""
+Content-addressed analysis cache.
+Reports and detector states are keyed by a hash of the normalized trades plus
+the analysis state version and the ML model version, so re-uploads of the same
+data (and repeated /analyze calls on an unchanged session) skip the analysis.
+Entries live in the `analysis_cache` table and are evicted least-recently-used
+once their total size exceeds ANALYSIS_CACHE_MAX_BYTES.
+"""
+import os
+import hashlib
+from datetime import datetime
+from typing import Optional, Tuple
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from models.db_models import AnalysisCacheEntry
+from storage.file_handler import REQUIRED_COLUMNS, FLOAT32_COLUMNS
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def max_cache_bytes() -> int:
+    return int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+
+
+class TradeHasher:
+    """Incremental form of hash_trades: feeding chunks in order gives the same digest."""
+
+    def __init__(self):
+        self._digest = hashlib.blake2b(digest_size=20)
+        self._digest.update(",".join(REQUIRED_COLUMNS).encode())
+
+    def update(self, df: pd.DataFrame):
+        # Categorical and float32 columns hash like the strings / float64 they hold
+        normalized = df[REQUIRED_COLUMNS].astype({col: "float64" for col in FLOAT32_COLUMNS}).assign(
+            timestamp=df["timestamp"].astype("datetime64[us]"),
+        )
+        self._digest.update(pd.util.hash_pandas_object(normalized, index=False).to_numpy().tobytes())
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def hash_trades(df: pd.DataFrame) -> str:
+    """Order-sensitive hash of the trades as stored (timestamps at microsecond precision)."""
+    hasher = TradeHasher()
+    hasher.update(df)
+    return hasher.hexdigest()
+
+
+def cache_key(content_hash: str, *versions) -> str:
+    """Key for a content hash under the given analysis/model versions."""
+    return hashlib.blake2b(":".join([content_hash, *map(str, versions)]).encode(), digest_size=20).hexdigest()
+
+
+def get_cached(db: Session, key: str) -> Optional[Tuple[str, str]]:
+    """Returns the encoded (state, report) for `key` and marks the entry as recently used, or None."""
+    entry = db.get(AnalysisCacheEntry, key)
+    if entry is None:
+        return None
+    entry.last_used_at = datetime.utcnow()
+    entry.hit_count += 1
+    db.commit()
+    return entry.state_json, entry.report_json
+
+
+def put_cached(db: Session, key: str, state_json: str, report_json: str):
+    """Stores an encoded analysis result, then evicts old entries past the size bound."""
+    db.merge(AnalysisCacheEntry(
+        key=key,
+        state_json=state_json,
+        report_json=report_json,
+        size_bytes=len(state_json) + len(report_json),
+        created_at=datetime.utcnow(),
+        last_used_at=datetime.utcnow(),
+        hit_count=0,
+    ))
+    db.commit()
+    evict(db, max_cache_bytes())
+
+
+def evict(db: Session, max_bytes: int) -> int:
+    """Deletes least-recently-used entries until the cache fits in `max_bytes`. Returns the count removed."""
+    rows = db.query(AnalysisCacheEntry.key, AnalysisCacheEntry.size_bytes).order_by(AnalysisCacheEntry.last_used_at).all()
+    total = sum(size for _, size in rows)
+    stale = []
+    for key, size in rows:
+        if total <= max_bytes:
+            break
+        stale.append(key)
+        total -= size
+    if stale:
+        db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.key.in_(stale)).delete(synchronize_session=False)
+        db.commit()
+    return len(stale)
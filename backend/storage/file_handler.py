@@ -1,17 +1,27 @@
 import io
-import json
-from typing import Tuple, List
+import os
+import logging
+from typing import BinaryIO, Iterator, List
+
+import numpy as np
 import pandas as pd
 
+import storage.frame_cache  # noqa: F401 (turns on copy-on-write, which _cast_columns relies on)
+
+logger = logging.getLogger(__name__)
 
 REQUIRED_COLUMNS = [
     "timestamp", "asset", "side", "quantity",
     "entry_price", "exit_price", "profit_loss", "balance"
 ]
 
+SIDES = ["BUY", "SELL"]
+# Enum-coded side: one byte per trade, codes fixed across sessions
+SIDE_DTYPE = pd.CategoricalDtype(SIDES)
+
 DTYPE_MAP = {
-    "asset": str,
-    "side": str,
+    "asset": "category",
+    "side": "category",
     "quantity": float,
     "entry_price": float,
     "exit_price": float,
@@ -19,60 +29,103 @@ DTYPE_MAP = {
     "balance": float,
 }
 
+# Columns that may be held as float32 (see compact_floats); P&L and balance stay float64
+FLOAT32_COLUMNS = ["quantity", "entry_price", "exit_price"]
 
-def _validate_and_clean(df: pd.DataFrame) -> pd.DataFrame:
-    """Validate columns and cast dtypes."""
+
+CSV_CHUNK_ROWS = 128_000
+
+
+def float32_mode() -> str:
+    """
+    TRADE_FLOAT32: "lossless" (default) holds a FLOAT32_COLUMNS column as
+    float32 when every value survives the round trip exactly (e.g. whole-share
+    quantities); "all" always does (prices keep ~7 significant digits); "off" never.
+    """
+    return os.getenv("TRADE_FLOAT32", "lossless").lower()
+
+
+def compact_floats(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcasts FLOAT32_COLUMNS per float32_mode(), in place. Returns `df`."""
+    mode = float32_mode()
+    if mode == "off":
+        return df
+    for col in FLOAT32_COLUMNS:
+        if col not in df.columns or df[col].dtype != np.float64 or len(df) == 0:
+            continue
+        values = df[col].to_numpy()
+        narrow = values.astype(np.float32)
+        if mode == "all" or np.array_equal(narrow, values, equal_nan=True):
+            df[col] = narrow
+    return df
+
+
+def encode_side(side: pd.Series) -> pd.Series:
+    """
+    `side` as SIDE_DTYPE, ignoring case and surrounding spaces. Missing values
+    and values other than SIDES (e.g. "LONG", "SELL_SHORT") become missing.
+    """
+    side = side.astype("category")
+    names = side.cat.categories.astype(str).str.strip().str.upper()
+    unknown = sorted(set(names) - set(SIDES))
+    if unknown:
+        logger.warning(f"Side values {unknown} are not one of {SIDES}; stored as missing.")
+    # Category code -> SIDES index (-1 for unknown names); the trailing -1 keeps missing (code -1) missing
+    lookup = np.array([SIDES.index(name) if name in SIDES else -1 for name in names] + [-1], dtype=np.int8)
+    codes = lookup[side.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=SIDE_DTYPE), index=side.index, name=side.name)
+
+
+def _cast_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Validate columns and cast dtypes, keeping row order."""
     missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
     if missing:
         raise ValueError(f"Missing required columns: {missing}")
 
-    df = df[REQUIRED_COLUMNS].copy()
+    # Under copy-on-write the selection is a new frame; no defensive copy
+    df = df[REQUIRED_COLUMNS]
     df["timestamp"] = pd.to_datetime(df["timestamp"])
 
     for col, dtype in DTYPE_MAP.items():
         df[col] = df[col].astype(dtype)
+    df["side"] = encode_side(df["side"])
+    return compact_floats(df)
 
-    df = df.sort_values("timestamp").reset_index(drop=True)
-    return df
+
+def _validate_and_clean(df: pd.DataFrame) -> pd.DataFrame:
+    """Validate columns and cast dtypes."""
+    df = _cast_columns(df)
+    if not df["timestamp"].is_monotonic_increasing:
+        df = df.sort_values("timestamp")
+    return df.reset_index(drop=True)
+
+
+def parse_csv_upload(content: bytes) -> pd.DataFrame:
+    """Parse CSV bytes, validate schema, return a typed DataFrame.
+    Uploads stream through iter_csv_chunks instead; this is for in-memory content."""
+    df = pd.concat(iter_csv_chunks(io.BytesIO(content)), ignore_index=True)
+    return _validate_and_clean(df)
+
+
+def iter_csv_chunks(stream: BinaryIO, chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Parse a CSV file object chunk by chunk, validating and casting each chunk.
+    Only one chunk is held at a time; chunks keep file order (callers sort).
+    """
+    reader = pd.read_csv(stream, dtype=DTYPE_MAP, parse_dates=["timestamp"], chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            yield _cast_columns(chunk)
 
 
-def parse_csv_upload(content: bytes) -> Tuple[pd.DataFrame, str]:
-    """Parse CSV bytes, validate schema, return (DataFrame, json_string).
-    Uses chunked reading for large files."""
-    # For large files, read in chunks
-    chunk_size = 50000
-    if len(content) > 10 * 1024 * 1024:  # > 10MB
-        chunks = []
-        for chunk in pd.read_csv(
-            io.BytesIO(content),
-            dtype=DTYPE_MAP,
-            parse_dates=["timestamp"],
-            chunksize=chunk_size,
-        ):
-            chunks.append(chunk)
-        df = pd.concat(chunks, ignore_index=True)
-    else:
-        df = pd.read_csv(
-            io.BytesIO(content),
-            dtype=DTYPE_MAP,
-            parse_dates=["timestamp"],
-        )
-    df = _validate_and_clean(df)
-    trades_json = df.to_json(orient="records", date_format="iso")
-    return df, trades_json
-
-def parse_json_upload(content: bytes) -> Tuple[pd.DataFrame, str]:
-    """Parse JSON bytes, validate schema, return (DataFrame, json_string)."""
+def parse_json_upload(content: bytes) -> pd.DataFrame:
+    """Parse JSON bytes, validate schema, return a typed DataFrame."""
     df = pd.read_json(io.BytesIO(content), orient="records")
-    df = _validate_and_clean(df)
-    trades_json = df.to_json(orient="records", date_format="iso")
-    return df, trades_json
+    return _validate_and_clean(df)
 
 
-def parse_manual_trades(trades: List) -> Tuple[pd.DataFrame, str]:
+def parse_manual_trades(trades: List) -> pd.DataFrame:
     """Convert list of TradeRecord pydantic objects to DataFrame."""
     records = [t.model_dump() for t in trades]
     df = pd.DataFrame(records)
-    df = _validate_and_clean(df)
-    trades_json = df.to_json(orient="records", date_format="iso")
-    return df, trades_json
+    return _validate_and_clean(df)
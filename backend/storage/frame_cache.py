@@ -0,0 +1,123 @@
+"""
+In-process LRU cache of decoded session trades.
+
+Holds the full typed DataFrame of recently read sessions so repeated
+/analyze calls, dashboard pages and drill-downs on a hot session skip the
+Parquet decode. Entries are keyed by the session's dataset path and
+validated against its data version (the part files' names, sizes and
+mtimes), so a write that bypasses invalidate() still can't serve stale
+trades. The cache is bounded by the frames' in-memory bytes
+(TRADE_FRAME_CACHE_BYTES, 0 disables it), evicting least recently used first.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import pandas as pd
+
+from metrics import register_collector, render_value
+
+# Frames handed out from the cache are shallow copies, safe only under
+# copy-on-write: always on from pandas 3.0, opted into on earlier versions
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def max_frame_bytes() -> int:
+    return int(os.getenv("TRADE_FRAME_CACHE_BYTES", str(DEFAULT_MAX_BYTES)))
+
+
+def data_version(path: str) -> Tuple:
+    """Changes whenever a part file of the dataset is added, removed or rewritten."""
+    try:
+        entries = sorted(os.scandir(path), key=lambda e: e.name)
+    except FileNotFoundError:
+        return ()
+    return tuple(
+        (e.name, e.stat().st_size, e.stat().st_mtime_ns)
+        for e in entries if e.name.endswith(".parquet")
+    )
+
+
+class FrameCache:
+    """Byte-bounded LRU of (path -> (version, DataFrame, bytes)) with hit/miss counters."""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return max_frame_bytes() if self._max_bytes is None else self._max_bytes
+
+    def get(self, path: str, version: Tuple) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._drop(path)
+            self.misses += 1
+            return None
+
+    def put(self, path: str, version: Tuple, df: pd.DataFrame):
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            if path in self._entries:
+                self._drop(path)
+            if size > self.max_bytes:
+                return
+            self._entries[path] = (version, df, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, path: str):
+        with self._lock:
+            if path in self._entries:
+                self._drop(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _drop(self, path: str):
+        _, _, size = self._entries.pop(path)
+        self.bytes -= size
+
+    def render(self) -> str:
+        stats = self.stats()
+        return "".join([
+            render_value("bias_detector_frame_cache_hits_total", "Trade reads served from the frame cache.", "counter", stats["hits"]),
+            render_value("bias_detector_frame_cache_misses_total", "Trade reads that decoded Parquet.", "counter", stats["misses"]),
+            render_value("bias_detector_frame_cache_evictions_total", "Frames evicted to stay under the byte bound.", "counter", stats["evictions"]),
+            render_value("bias_detector_frame_cache_bytes", "In-memory bytes of the cached frames.", "gauge", stats["bytes"]),
+            render_value("bias_detector_frame_cache_entries", "Sessions whose trades are cached.", "gauge", stats["entries"]),
+        ])
+
+
+frame_cache = FrameCache()
+register_collector(frame_cache.render)
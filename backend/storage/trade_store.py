@@ -0,0 +1,395 @@
+"""
+Columnar trade storage.
+Each session's trades live in a Parquet dataset (a directory of part files)
+under UPLOAD_DIR, with typed columns, so loading a session never re-parses JSON.
+Part files are numbered in append order and hold trades sorted by timestamp;
+each is written under a temporary name and renamed into place, so a reader
+never sees half a part. Writes to a session hold its session_lock.
+Reads return the compact in-memory schema of storage/file_handler.py
+(categorical asset and side, float32 where it loses nothing).
+"""
+import io
+import os
+import shutil
+import logging
+import uuid
+import threading
+import weakref
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from storage.file_handler import REQUIRED_COLUMNS, SIDE_DTYPE, compact_floats
+from storage.frame_cache import frame_cache, data_version
+
+logger = logging.getLogger(__name__)
+
+TRADE_SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("us")),
+    ("asset", pa.string()),
+    ("side", pa.string()),
+    ("quantity", pa.float64()),
+    ("entry_price", pa.float64()),
+    ("exit_price", pa.float64()),
+    ("profit_loss", pa.float64()),
+    ("balance", pa.float64()),
+])
+
+# In memory, asset and side come back as categoricals straight from the
+# Parquet dictionary pages, never materialized as one string per trade
+_READ_SCHEMA = TRADE_SCHEMA.set(
+    TRADE_SCHEMA.get_field_index("asset"), pa.field("asset", pa.dictionary(pa.int32(), pa.string())),
+).set(
+    TRADE_SCHEMA.get_field_index("side"), pa.field("side", pa.dictionary(pa.int32(), pa.string())),
+)
+_READ_FORMAT = ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(dictionary_columns=["asset", "side"]))
+
+ROW_GROUP_SIZE = 128_000
+MAX_PARTS = 64
+
+
+# One lock per session for as long as someone holds it; re-entrant so a
+# caller holding it can still use the functions below that take it
+_session_locks: "weakref.WeakValueDictionary[str, threading.RLock]" = weakref.WeakValueDictionary()
+_session_locks_guard = threading.Lock()
+
+
+def session_lock(session_id: str) -> threading.RLock:
+    """Serializes writes to one session's trades (and the row counts kept alongside them)."""
+    with _session_locks_guard:
+        lock = _session_locks.get(session_id)
+        if lock is None:
+            lock = _session_locks[session_id] = threading.RLock()
+        return lock
+
+
+def upload_dir() -> str:
+    return os.getenv("UPLOAD_DIR", "uploads")
+
+
+def trades_dir(session_id: str) -> str:
+    """Directory holding the Parquet part files for a session."""
+    return os.path.join(upload_dir(), "trades", session_id)
+
+
+def _to_table(df: pd.DataFrame) -> pa.Table:
+    return pa.Table.from_pandas(df[REQUIRED_COLUMNS], schema=TRADE_SCHEMA, preserve_index=False)
+
+
+def write_trades(session_id: str, df: pd.DataFrame) -> str:
+    """Replace the stored trades of a session with `df`. Returns the dataset path."""
+    path = trades_dir(session_id)
+    with session_lock(session_id):
+        frame_cache.invalidate(path)
+        os.makedirs(path, exist_ok=True)
+        old_parts = _part_files(path)
+        _write_part(path, _to_table(df))
+        for part in old_parts:
+            os.remove(part)
+    return path
+
+
+def _write_part(path: str, table: pa.Table) -> str:
+    """Adds `table` as the dataset's new last part file. The caller holds the session lock."""
+    parts = _part_files(path)
+    target = os.path.join(path, f"part-{_part_number(parts[-1]) + 1 if parts else 0:05d}.parquet")
+    temp = _temp_part(path)
+    try:
+        pq.write_table(table, temp, row_group_size=ROW_GROUP_SIZE)
+        os.replace(temp, target)
+    except BaseException:
+        _remove_quietly(temp)
+        raise
+    return target
+
+
+def _temp_part(path: str) -> str:
+    # No .parquet suffix: readers and data_version() skip it until it is renamed
+    return os.path.join(path, f".part-{uuid.uuid4().hex}.tmp")
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class TradeWriter:
+    """
+    Streams chunks of trades into a session's dataset (replacing what was
+    stored), so an upload never holds more than one chunk in memory.
+    Chunks arriving out of timestamp order are sorted once on close;
+    `resorted` tells the caller the stored order differs from the input.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.path = trades_dir(session_id)
+        self.row_count = 0
+        self.resorted = False
+        self._last = None
+        self._in_order = True
+        self._writer = None
+        self._temp = None
+
+    def __enter__(self):
+        frame_cache.invalidate(self.path)
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        os.makedirs(self.path, exist_ok=True)
+        self._temp = _temp_part(self.path)
+        self._writer = pq.ParquetWriter(self._temp, TRADE_SCHEMA)
+        return self
+
+    def write(self, df: pd.DataFrame):
+        if len(df) == 0:
+            return
+        ts = df["timestamp"]
+        if not ts.is_monotonic_increasing or (self._last is not None and ts.iloc[0] < self._last):
+            self._in_order = False
+        self._last = ts.iloc[-1]
+        self._writer.write_table(_to_table(df), row_group_size=ROW_GROUP_SIZE)
+        self.row_count += len(df)
+
+    def __exit__(self, exc_type, exc, tb):
+        self._writer.close()
+        if exc_type is not None:
+            _remove_quietly(self._temp)
+            delete_trades(self.session_id)
+            return False
+        if not self._in_order:
+            # Sorting needs the whole dataset, but as Arrow columns rather than
+            # the row-by-row pandas copies of the old upload path
+            table = pq.read_table(self._temp, schema=TRADE_SCHEMA).sort_by("timestamp")
+            pq.write_table(table, self._temp, row_group_size=ROW_GROUP_SIZE)
+            self.resorted = True
+        os.replace(self._temp, os.path.join(self.path, "part-00000.parquet"))
+        return False
+
+
+def _part_files(path: str) -> List[str]:
+    """Part files in append order (by number: a session's numbering keeps growing past compactions)."""
+    return sorted(
+        (os.path.join(path, f) for f in os.listdir(path) if f.endswith(".parquet")),
+        key=_part_number,
+    )
+
+
+def _part_number(part: str) -> int:
+    return int(os.path.basename(part)[len("part-"):-len(".parquet")])
+
+
+def read_trades(path: str, columns: Optional[List[str]] = None,
+                start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None,
+                asset: Optional[str] = None, offset: Optional[int] = None,
+                limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    Load a session's trades (optionally a subset of columns) as a typed DataFrame.
+    `start` / `end` (inclusive) and `asset` select matching rows only;
+    `offset` / `limit` select rows by position instead (a page).
+
+    Whole-session reads go through the frame cache (storage/frame_cache.py):
+    later reads of the same data version, any columns or range, are served
+    from memory. A range read on a cold session decodes only the part files
+    and row groups whose timestamp statistics overlap the range, and a page
+    only the row groups holding its rows; neither is cached.
+    The returned frame is the caller's to modify.
+    """
+    filtered = start is not None or end is not None or asset is not None
+    paged = offset is not None or limit is not None
+    offset = offset or 0
+    frame = frame_cache.get(path, data_version(path))
+    if frame is None:
+        # Decoded under the session lock, so a rewrite can't remove parts mid-read
+        with session_lock(os.path.basename(path)):
+            if filtered:
+                return _read_dataset(path, columns, start, end, asset)
+            if paged:
+                return _read_rows(path, columns, offset, limit)
+            version = data_version(path)
+            frame = _read_dataset(path)
+        frame_cache.put(path, version, frame)
+
+    if paged:
+        frame = frame.iloc[offset:None if limit is None else offset + limit].reset_index(drop=True)
+
+    if filtered:
+        keep = np.ones(len(frame), dtype=bool)
+        timestamps = frame["timestamp"].to_numpy()
+        if start is not None:
+            keep &= timestamps >= pd.Timestamp(start).to_datetime64()
+        if end is not None:
+            keep &= timestamps <= pd.Timestamp(end).to_datetime64()
+        if asset is not None:
+            keep &= (frame["asset"] == asset).to_numpy()
+        frame = frame[keep].reset_index(drop=True)
+    # Copy-on-write (see storage/frame_cache.py): callers adding or changing
+    # columns never touch the cached frame
+    return frame[columns] if columns else frame.copy(deep=False)
+
+
+def _read_dataset(path: str, columns: Optional[List[str]] = None,
+                  start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None,
+                  asset: Optional[str] = None) -> pd.DataFrame:
+    """Decodes the Parquet dataset; filters skip part files and row groups by their statistics."""
+    dataset = ds.dataset(_part_files(path), schema=_READ_SCHEMA, format=_READ_FORMAT)
+    conditions = []
+    if start is not None:
+        conditions.append(ds.field("timestamp") >= pa.scalar(_us(start), pa.timestamp("us")))
+    if end is not None:
+        conditions.append(ds.field("timestamp") <= pa.scalar(_us(end), pa.timestamp("us")))
+    if asset is not None:
+        conditions.append(ds.field("asset") == asset)
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+    return _to_frame(dataset.to_table(columns=columns, filter=condition))
+
+
+def _us(ts) -> np.datetime64:
+    # Stored timestamps are microseconds; pandas < 3 hands out nanoseconds
+    return pd.Timestamp(ts).as_unit("us").to_datetime64()
+
+
+def _read_rows(path: str, columns: Optional[List[str]], offset: int, limit: Optional[int]) -> pd.DataFrame:
+    """Decodes rows [offset, offset + limit) from just the row groups that hold them."""
+    stop = None if limit is None else offset + limit
+    tables, row = [], 0
+    for part in _part_files(path):
+        parquet = pq.ParquetFile(part, read_dictionary=["asset", "side"])
+        for i in range(parquet.metadata.num_row_groups):
+            n = parquet.metadata.row_group(i).num_rows
+            if row + n > offset and (stop is None or row < stop):
+                first = max(offset - row, 0)
+                last = n if stop is None else min(stop - row, n)
+                tables.append(parquet.read_row_group(i, columns=columns).slice(first, last - first))
+            row += n
+    if not tables:
+        schema = _READ_SCHEMA if columns is None else pa.schema([_READ_SCHEMA.field(c) for c in columns])
+        return _to_frame(schema.empty_table())
+    return _to_frame(pa.concat_tables(tables).unify_dictionaries())
+
+
+def _to_frame(table: pa.Table) -> pd.DataFrame:
+    df = table.to_pandas()
+    if "side" in df.columns:
+        df["side"] = df["side"].astype(SIDE_DTYPE)
+    return compact_floats(df)
+
+
+def totals_before(path: str, offset: int) -> Tuple[float, Optional[float]]:
+    """
+    The P&L sum (missing P&L as 0) and the peak balance (None if no balance
+    is known) of a session's first `offset` trades, for running columns that
+    start mid-session. Whole row groups count from per-row-group totals,
+    computed once per part file; only the row group `offset` falls in is read.
+    """
+    pnl, peak, row = 0.0, np.nan, 0
+    with session_lock(os.path.basename(path)):
+        for part in _part_files(path):
+            if row >= offset:
+                break
+            stat = os.stat(part)
+            for i, (n, group_pnl, group_peak) in enumerate(_row_group_totals(part, stat.st_size, stat.st_mtime_ns)):
+                if row >= offset:
+                    break
+                if row + n > offset:
+                    table = pq.ParquetFile(part).read_row_group(i, columns=["profit_loss", "balance"]).slice(0, offset - row)
+                    n, group_pnl, group_peak = _totals(table)
+                pnl += group_pnl
+                peak = np.fmax(peak, group_peak)
+                row += n
+    return pnl, None if np.isnan(peak) else float(peak)
+
+
+@lru_cache(maxsize=4096)
+def _row_group_totals(part: str, size: int, mtime_ns: int) -> Tuple[Tuple[int, float, float], ...]:
+    # Keyed by the file's size and mtime too: a part rewritten under the same name is summed afresh
+    parquet = pq.ParquetFile(part)
+    return tuple(
+        _totals(parquet.read_row_group(i, columns=["profit_loss", "balance"]))
+        for i in range(parquet.metadata.num_row_groups)
+    )
+
+
+def _totals(table: pa.Table) -> Tuple[int, float, float]:
+    pnl = table.column("profit_loss").to_numpy()
+    balance = table.column("balance").to_numpy()
+    peak = np.nanmax(balance) if len(balance) and not np.isnan(balance).all() else np.nan
+    return table.num_rows, float(np.nansum(pnl)), float(peak)
+
+
+def last_timestamp(path: str) -> Optional[pd.Timestamp]:
+    """Latest stored timestamp, read from the last part's row-group statistics."""
+    parts = _part_files(path)
+    if not parts:
+        return None
+    metadata = pq.ParquetFile(parts[-1]).metadata
+    col = TRADE_SCHEMA.get_field_index("timestamp")
+    maxima = [
+        metadata.row_group(i).column(col).statistics.max
+        for i in range(metadata.num_row_groups)
+    ]
+    return pd.Timestamp(max(maxima)) if maxima else None
+
+
+def append_trades(session_id: str, df: pd.DataFrame) -> bool:
+    """
+    Append trades to a session as a new part file. Returns True when the new
+    trades all come after the stored ones; otherwise the dataset is rewritten
+    in timestamp order and False is returned (incremental state is then invalid).
+    """
+    path = trades_dir(session_id)
+    with session_lock(session_id):
+        frame_cache.invalidate(path)
+        os.makedirs(path, exist_ok=True)
+        last = last_timestamp(path)
+        if last is not None and len(df) > 0 and df["timestamp"].iloc[0] < last:
+            merged = pd.concat([_read_dataset(path), df[REQUIRED_COLUMNS]], ignore_index=True)
+            write_trades(session_id, merged.sort_values("timestamp", kind="stable").reset_index(drop=True))
+            return False
+        _write_part(path, _to_table(df))
+        if len(_part_files(path)) > MAX_PARTS:
+            # Many small appends: compact so reads stay a single sequential scan
+            write_trades(session_id, _read_dataset(path))
+    return True
+
+
+def delete_trades(session_id: str):
+    with session_lock(session_id):
+        frame_cache.invalidate(trades_dir(session_id))
+        shutil.rmtree(trades_dir(session_id), ignore_errors=True)
+
+
+def migrate_legacy_trades(db) -> int:
+    """
+    Move trades still stored in the legacy `trades_json` column into Parquet
+    storage. Safe to run on every startup; returns the number of sessions migrated.
+    """
+    from models.db_models import TradingSession
+    from storage.file_handler import _validate_and_clean
+
+    legacy = (
+        db.query(TradingSession)
+        .filter(TradingSession.trades_json.isnot(None), TradingSession.trades_path.is_(None))
+        .all()
+    )
+    migrated = 0
+    for session in legacy:
+        try:
+            df = pd.read_json(io.StringIO(session.trades_json), orient="records")
+            df = _validate_and_clean(df)
+        except Exception as e:
+            logger.warning(f"Skipping migration of session {session.id}: {e}")
+            continue
+        session.trades_path = write_trades(session.id, df)
+        session.trades_json = None
+        db.commit()
+        migrated += 1
+    return migrated
@@ -1,13 +1,22 @@
 """
 Bias tools for the LangGraph agent.
-All 8 tools + psychological profile tools.
+All 10 tools + psychological profile tools.
 """
 import json
 import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
 from sqlalchemy.orm import Session
 
+from serialization import dumps_str, loads
+
 logger = logging.getLogger(__name__)
 
+# Groups returned by get_bias_breakdown (largest by trade count)
+MAX_BREAKDOWN_GROUPS = 15
+
 
 # ── Tool implementations ───────────────────────────────────────────────────────
 
@@ -75,6 +84,53 @@ def compare_bias_scores(session_id: str, db: Session) -> str:
     ], indent=2)
 
 
+def get_bias_breakdown(session_id: str, by: str, db: Session) -> str:
+    """Bias scores per asset or per side; the largest groups only, to keep the reply short."""
+    if by not in ("asset", "side"):
+        return "Unknown breakdown. Use 'asset' or 'side'."
+    report = _get_cached_report(session_id, db)
+    if not report:
+        return "No analysis found. Ask the user to run analysis first."
+    groups = (report.get("breakdown") or {}).get(by)
+    if groups is None:
+        from models.db_models import TradingSession
+        from storage.trade_store import read_trades
+        from analysis.breakdown import bias_breakdown
+        session = db.query(TradingSession).filter(TradingSession.id == session_id).first()
+        if not session or not session.trades_path:
+            return "No trades found."
+        groups = bias_breakdown(read_trades(session.trades_path), by=[by])[by]
+    return json.dumps({
+        "by": by,
+        "groups": groups[:MAX_BREAKDOWN_GROUPS],
+        "omitted_groups": max(0, len(groups) - MAX_BREAKDOWN_GROUPS),
+    }, indent=2)
+
+
+def get_range_analysis(session_id: str, date_from: Optional[str], date_to: Optional[str],
+                       asset: Optional[str], db: Session) -> str:
+    """Bias scores for part of the session; reads only the matching trades, cached per range."""
+    from models.db_models import TradingSession
+    from range_analysis import EmptyRange, parse_range, analyze_range
+    session = db.query(TradingSession).filter(TradingSession.id == session_id).first()
+    if not session or not session.trades_path:
+        return "No trades found."
+    try:
+        start, end = parse_range(date_from, date_to)
+        report = analyze_range(db, session, start, end, asset or None)
+    except EmptyRange:
+        return "No trades in that range."
+    except ValueError as e:
+        return f"Invalid range: {e}"
+    return json.dumps({
+        "range": report["range"],
+        "trade_count": report["trade_count"],
+        "date_range": report["date_range"],
+        "biases": [{"bias": b["bias"], "score": b["score"], "severity": b["severity"]} for b in report["biases"]],
+        "summary_stats": report.get("summary_stats", {}),
+    }, indent=2)
+
+
 def update_psychological_profile(session_id: str, profile_update: str, db: Session) -> str:
     """Merge profile_update JSON into the stored profile."""
     from models.db_models import TradingSession
@@ -92,7 +148,7 @@ def update_psychological_profile(session_id: str, profile_update: str, db: Sessi
 
     # Adjust the dashboard report scoring based on the onboarding answers
     if session.report_json:
-        report = json.loads(session.report_json)
+        report = _parse_report(session.report_json)
         
         # If the user states they trade immediately after a loss, drastically increase their revenge score
         post_loss = update_dict.get("post_loss_urge", "").lower() + " " + update_dict.get("post_loss", "").lower()
@@ -112,13 +168,14 @@ def update_psychological_profile(session_id: str, profile_update: str, db: Sessi
             # Update overall risk score average
             scores = [b["score"] for b in report.get("biases", [])]
             report["overall_risk_score"] = round(sum(scores) / len(scores), 2) if scores else 0.0
-            session.report_json = json.dumps(report)
+            session.report_json = dumps_str(report)
 
     # Check if onboarding is complete
     if update_dict.get("onboarding_complete", False):
         session.onboarding_complete = True
 
     db.commit()
+    _invalidate_report(session_id)
     return "Profile updated and dashboard stats adjusted if necessary."
 
 
@@ -138,7 +195,7 @@ def adjust_bias_scores(session_id: str, adjustments_json: str, db: Session) -> s
     except json.JSONDecodeError:
         return "Invalid JSON in adjustments."
 
-    report = json.loads(session.report_json)
+    report = _parse_report(session.report_json)
     biases = report.get("biases", [])
     
     updated_biases = []
@@ -160,8 +217,9 @@ def adjust_bias_scores(session_id: str, adjustments_json: str, db: Session) -> s
         # Recalculate overall risk score
         scores = [b["score"] for b in biases]
         report["overall_risk_score"] = round(sum(scores) / len(scores), 2) if scores else 0.0
-        session.report_json = json.dumps(report)
+        session.report_json = dumps_str(report)
         db.commit()
+        _invalidate_report(session_id)
         return f"Adjusted scores for: {', '.join(updated_biases)}. Dashboard updated."
     
     return "No matching biases found to adjust."
@@ -235,6 +293,40 @@ TOOLS_SCHEMA = [
             "parameters": {"type": "object", "properties": {}, "required": []},
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_bias_breakdown",
+            "description": "Returns the bias scores per asset (ticker) or per side (BUY/SELL), to find where a bias concentrates. Groups are ordered by trade count.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "by": {
+                        "type": "string",
+                        "enum": ["asset", "side"],
+                        "description": "Group trades by 'asset' or by 'side'.",
+                    }
+                },
+                "required": ["by"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_range_analysis",
+            "description": "Analyzes only part of the trader's history — a date range and/or one asset — e.g. for questions about 'last week' or 'my NVDA trades'. Returns bias scores and trade stats for that slice. Use the full report's date_range to pick dates.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "date_from": {"type": "string", "description": "Start date or timestamp (ISO, inclusive), e.g. '2025-03-01'."},
+                    "date_to": {"type": "string", "description": "End date or timestamp (ISO, inclusive; a date covers the whole day)."},
+                    "asset": {"type": "string", "description": "Only this ticker, e.g. 'NVDA'."},
+                },
+                "required": [],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -288,20 +380,78 @@ TOOL_MAP = {
     "get_trade_summary": get_trade_summary,
     "get_risk_profile": get_risk_profile,
     "compare_bias_scores": compare_bias_scores,
+    "get_bias_breakdown": get_bias_breakdown,
+    "get_range_analysis": get_range_analysis,
     "update_psychological_profile": update_psychological_profile,
     "get_psychological_profile": get_psychological_profile,
     "adjust_bias_scores": adjust_bias_scores,
 }
 
 
+# ── Per-turn report memoization ─────────────────────────────────────────────────
+
+class TurnReports:
+    """
+    Parsed reports shared by every tool call in one agent turn, so a turn that
+    calls several read tools queries and parses report_json once per session.
+    Write tools invalidate their session's entry. `parses` counts report_json decodes.
+    """
+
+    def __init__(self):
+        self._reports = {}
+        self.parses = 0
+
+    def get(self, session_id: str, db: Session) -> dict | None:
+        if session_id not in self._reports:
+            self._reports[session_id] = _load_report(session_id, db)
+        return self._reports[session_id]
+
+    def invalidate(self, session_id: str):
+        self._reports.pop(session_id, None)
+
+
+_turn_reports: ContextVar[Optional[TurnReports]] = ContextVar("turn_reports", default=None)
+
+
+@contextmanager
+def turn_scope() -> Iterator[TurnReports]:
+    """Scope for one agent turn; tool calls made inside (on any thread) share its reports."""
+    reports = TurnReports()
+    token = _turn_reports.set(reports)
+    try:
+        yield reports
+    finally:
+        _turn_reports.reset(token)
+
+
 # ── Helpers ────────────────────────────────────────────────────────────────────
 
-def _get_cached_report(session_id: str, db: Session) -> dict | None:
+def _parse_report(report_json: str) -> dict:
+    reports = _turn_reports.get()
+    if reports is not None:
+        reports.parses += 1
+    return loads(report_json)
+
+
+def _load_report(session_id: str, db: Session) -> dict | None:
     from models.db_models import TradingSession
     session = db.query(TradingSession).filter(TradingSession.id == session_id).first()
     if not session or not session.report_json:
         return None
-    return json.loads(session.report_json)
+    return _parse_report(session.report_json)
+
+
+def _get_cached_report(session_id: str, db: Session) -> dict | None:
+    reports = _turn_reports.get()
+    if reports is None:
+        return _load_report(session_id, db)
+    return reports.get(session_id, db)
+
+
+def _invalidate_report(session_id: str):
+    reports = _turn_reports.get()
+    if reports is not None:
+        reports.invalidate(session_id)
 
 
 def _find_bias(report: dict, bias_name: str) -> dict:
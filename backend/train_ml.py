@@ -1,105 +1,110 @@
-import pandas as pd
-import numpy as np
+"""
+Trains the bias RandomForest on 50-trade chunks of the archetype datasets.
+
+Features come from analysis/ml_scoring.py (the definitions the API scores
+with), computed for every chunk of a file at once with grouped operations.
+Files are processed in parallel. --rows tiles each archetype up to that many
+trades (timestamps shifted per copy) to train on generated data at scale.
+
+    python train_ml.py
+    python train_ml.py --rows 1000000 --n-jobs -1
+"""
 import os
-from sklearn.ensemble import RandomForestRegressor
+import argparse
+
+import numpy as np
+import pandas as pd
 import joblib
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestRegressor
+
+from analysis.ml_scoring import FEATURE_COLUMNS, features_from_grouped_stats
+from analysis.session_stats import grouped_session_stats
 
 DATA_DIR = "../trading_datasets"
 MODELS_DIR = "."
 
-def extract_features(df):
-    """Extract features from a DataFrame (or chunk of trades)"""
-    df = df.copy()
-    if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-    
-    df = df.sort_values("timestamp")
-    
-    # Feature 1: Trade frequency (avg seconds between trades)
-    if len(df) > 1:
-        time_diffs = df["timestamp"].diff().dt.total_seconds().dropna()
-        avg_time_between_trades = time_diffs.mean()
-    else:
-        avg_time_between_trades = 3600
-        
-    # Feature 2: Loss to Win ratio
-    wins = df[df["profit_loss"] > 0]["profit_loss"]
-    losses = df[df["profit_loss"] < 0]["profit_loss"]
-    
-    avg_win = wins.mean() if len(wins) > 0 else 0.001
-    avg_loss = abs(losses.mean()) if len(losses) > 0 else 0.001
-    loss_win_ratio = avg_loss / avg_win if avg_win > 0 else 1.0
-    
-    # Feature 3: Time to re-entry after loss
-    re_entry_times = []
-    df_reset = df.reset_index(drop=True)
-    for i in range(len(df_reset) - 1):
-        if df_reset.loc[i, "profit_loss"] < 0:
-            re_entry_times.append((df_reset.loc[i+1, "timestamp"] - df_reset.loc[i, "timestamp"]).total_seconds())
-            
-    avg_time_after_loss = np.mean(re_entry_times) if len(re_entry_times) > 0 else avg_time_between_trades
-
-    # Feature 4: win rate
-    win_rate = len(wins) / len(df) if len(df) > 0 else 0.5
-    
-    # Feature 5: holding time equivalent (proxy by number of shares or volume metrics or just pnl var)
-    pnl_std = df["profit_loss"].std() if len(df) > 1 else 0
-    
-    return {
-        "avg_time_between_trades": avg_time_between_trades,
-        "loss_win_ratio": loss_win_ratio,
-        "avg_time_after_loss": avg_time_after_loss,
-        "win_rate": win_rate,
-        "pnl_std": pnl_std
-    }
-
-def build_dataset():
-    records = []
-    
-    targets = {
-        "calm_trader": {"overtrading": 5, "loss_aversion": 5, "revenge": 5},
-        "overtrader": {"overtrading": 95, "loss_aversion": 20, "revenge": 30},
-        "loss_averse_trader": {"overtrading": 20, "loss_aversion": 95, "revenge": 25},
-        "revenge_trader": {"overtrading": 30, "loss_aversion": 20, "revenge": 100},
-    }
-    
-    for filename, label_scores in targets.items():
-        path = os.path.join(DATA_DIR, f"{filename}.csv")
-        if not os.path.exists(path):
-            print(f"Skipping {path} (not found)")
-            continue
-            
-        df = pd.read_csv(path)
-        
-        # split into chunks of 50 trades each to generate multiple samples
-        chunk_size = 50
-        for i in range(0, len(df), chunk_size):
-            chunk = df.iloc[i : i + chunk_size]
-            if len(chunk) < 10:
-                continue
-            
-            features = extract_features(chunk)
-            # Add targets
-            row = {**features, **label_scores}
-            records.append(row)
-            
-    return pd.DataFrame(records)
+CHUNK_SIZE = 50         # trades per training sample
+MIN_CHUNK_ROWS = 10     # shorter tail chunks are skipped
+
+TARGETS = {
+    "calm_trader": {"overtrading": 5, "loss_aversion": 5, "revenge": 5},
+    "overtrader": {"overtrading": 95, "loss_aversion": 20, "revenge": 30},
+    "loss_averse_trader": {"overtrading": 20, "loss_aversion": 95, "revenge": 25},
+    "revenge_trader": {"overtrading": 30, "loss_aversion": 20, "revenge": 100},
+}
+TARGET_COLUMNS = ["overtrading", "loss_aversion", "revenge"]
+
+
+def load_archetype(path: str, rows: int | None = None) -> pd.DataFrame:
+    """The archetype's trades, tiled to `rows` trades if given (each copy starts after the previous one)."""
+    df = pd.read_csv(path)
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    if not rows or rows == len(df):
+        return df.head(rows) if rows else df
+    copies = -(-rows // len(df))
+    shift = df["timestamp"].max() - df["timestamp"].min() + pd.Timedelta(days=1)
+    tiled = df.loc[np.tile(df.index, copies)].reset_index(drop=True).head(rows)
+    tiled["timestamp"] += shift * (np.arange(len(tiled)) // len(df))
+    return tiled
+
+
+def chunk_features(df: pd.DataFrame, chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    """Model features of every `chunk_size`-trade chunk (in file order) of `df`."""
+    chunks = np.arange(len(df)) // chunk_size
+    keep = np.bincount(chunks)[chunks] >= MIN_CHUNK_ROWS
+    df, chunks = df[keep], chunks[keep]
+    # Each chunk's trades in time order, chunks kept in file order
+    order = np.lexsort((df["timestamp"].to_numpy(), chunks))
+    stats = grouped_session_stats(df.iloc[order].reset_index(drop=True), chunks[order])
+    return features_from_grouped_stats(stats).reset_index(drop=True)
+
+
+def archetype_dataset(name: str, rows: int | None, chunk_size: int) -> pd.DataFrame:
+    path = os.path.join(DATA_DIR, f"{name}.csv")
+    if not os.path.exists(path):
+        print(f"Skipping {path} (not found)")
+        return pd.DataFrame(columns=FEATURE_COLUMNS + TARGET_COLUMNS)
+    features = chunk_features(load_archetype(path, rows), chunk_size)
+    return features.assign(**TARGETS[name])
+
+
+def build_dataset(rows: int | None = None, chunk_size: int = CHUNK_SIZE, n_jobs: int = 1) -> pd.DataFrame:
+    parts = Parallel(n_jobs=n_jobs)(
+        delayed(archetype_dataset)(name, rows, chunk_size) for name in TARGETS
+    )
+    return pd.concat(parts, ignore_index=True)
+
 
 if __name__ == "__main__":
-    df = build_dataset()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, help="trades per archetype (tiles the dataset files)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--n-jobs", type=int, default=1, help="workers for feature extraction and the forest (-1 = all cores)")
+    parser.add_argument("--out-dir", default=MODELS_DIR)
+    args = parser.parse_args()
+
+    df = build_dataset(args.rows, args.chunk_size, args.n_jobs)
     if len(df) == 0:
         print("No data processed")
         exit()
-        
+
     print(f"Built dataset with {len(df)} samples")
-    
-    X = df[["avg_time_between_trades", "loss_win_ratio", "avg_time_after_loss", "win_rate", "pnl_std"]]
-    y = df[["overtrading", "loss_aversion", "revenge"]]
-    
+
+    X = df[FEATURE_COLUMNS]
+    y = df[TARGET_COLUMNS]
+
     # Train random forest model
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=args.n_jobs)
     model.fit(X, y)
-    
+
     # Save model
-    joblib.dump(model, "bias_model.joblib")
-    print("Model saved to bias_model.joblib")
+    model_file = os.path.join(args.out_dir, "bias_model.joblib")
+    joblib.dump(model, model_file)
+    print(f"Model saved to {model_file}")
+
+    # NumPy export the API scores with (see analysis/forest.py)
+    from analysis.forest import compile_forest
+    compiled_dir = os.path.join(args.out_dir, "bias_model_compiled")
+    compile_forest(model, compiled_dir, source_path=model_file)
+    print(f"Compiled model saved to {compiled_dir}/")
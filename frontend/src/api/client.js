@@ -13,11 +13,12 @@ async function request(path, options = {}) {
 }
 
 export const api = {
-    // Upload
+    // Upload. The analysis starts in the background as soon as the trades are
+    // stored; a following analyze() call joins that job.
     uploadFile: (file) => {
         const form = new FormData()
         form.append('file', file)
-        return fetch(`${BASE_URL}/upload`, { method: 'POST', body: form }).then(r => {
+        return fetch(`${BASE_URL}/upload?analyze=true`, { method: 'POST', body: form }).then(r => {
             if (!r.ok) return r.json().then(e => Promise.reject(new Error(e.detail)))
             return r.json()
         })
@@ -26,16 +27,43 @@ export const api = {
     uploadManual: (trades, sessionId = null) =>
         request('/upload/manual', {
             method: 'POST',
-            body: JSON.stringify({ session_id: sessionId, trades }),
+            body: JSON.stringify({ session_id: sessionId, trades, analyze: true }),
         }),
 
-    // Analysis
-    analyze: (sessionId) =>
-        request(`/analyze/${sessionId}`, { method: 'POST' }),
+    // Analysis runs as a background job: submit it, poll its status until it
+    // ends, then fetch the report. onProgress gets every status while it runs.
+    analyze: async (sessionId, onProgress = () => {}) => {
+        let job = await request(`/analyze/${sessionId}`, { method: 'POST' })
+        while (job.status === 'queued' || job.status === 'running') {
+            onProgress(job)
+            await new Promise(resolve => setTimeout(resolve, 500))
+            job = await request(`/jobs/${job.job_id}`)
+        }
+        return request(`/jobs/${job.job_id}/result`)
+    },
+
+    cancelAnalysis: (jobId) =>
+        request(`/jobs/${jobId}/cancel`, { method: 'POST' }),
 
     getReport: (sessionId) =>
         request(`/report/${sessionId}`),
 
+    // Trade series (paginated, or LTTB-downsampled when `points` is set)
+    getTrades: (sessionId, params = {}) =>
+        request(`/session/${sessionId}/trades?${new URLSearchParams(params)}`),
+
+    // Live trade feed. send() one trade as it executes; onMessage gets the answer
+    // to each ({ type: 'trade', alerts, live } or { type: 'error', detail }).
+    liveTrades: (sessionId, onMessage) => {
+        const ws = new WebSocket(`${BASE_URL.replace(/^http/, 'ws')}/ws/session/${sessionId}/trades`)
+        ws.onmessage = (e) => onMessage(JSON.parse(e.data))
+        return {
+            ready: new Promise((resolve, reject) => { ws.onopen = resolve; ws.onerror = reject }),
+            send: (trade) => ws.send(JSON.stringify(trade)),
+            close: () => ws.close(),
+        }
+    },
+
     // Chat
     chat: (sessionId, message, history = []) =>
         request('/chat', {
@@ -43,6 +71,38 @@ export const api = {
             body: JSON.stringify({ session_id: sessionId, message, history }),
         }),
 
+    // Streamed chat turn (SSE over POST). Calls onEvent for every
+    // token / tool_start / tool_end event and resolves with the final `done` payload.
+    chatStream: async (sessionId, message, history = [], onEvent = () => {}) => {
+        const res = await fetch(`${BASE_URL}/chat/stream`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ session_id: sessionId, message, history }),
+        })
+        if (!res.ok) {
+            const err = await res.json().catch(() => ({ detail: res.statusText }))
+            throw new Error(err.detail || `HTTP ${res.status}`)
+        }
+        const reader = res.body.pipeThrough(new TextDecoderStream()).getReader()
+        let buffer = ''
+        for (;;) {
+            const { value, done } = await reader.read()
+            if (done) break
+            buffer += value
+            const frames = buffer.split('\n\n')
+            buffer = frames.pop()
+            for (const frame of frames) {
+                const data = frame.split('\n').find(l => l.startsWith('data: '))
+                if (!data) continue
+                const event = JSON.parse(data.slice(6))
+                if (event.type === 'error') throw new Error(event.detail)
+                if (event.type === 'done') return event
+                onEvent(event)
+            }
+        }
+        throw new Error('Chat stream ended unexpectedly')
+    },
+
     // Onboarding
     getOnboardingStatus: (sessionId) =>
         request(`/session/${sessionId}/onboarding_status`),
@@ -3,10 +3,10 @@ import { motion, AnimatePresence } from 'framer-motion'
 import { api } from '../api/client'
 import { useSessionStore } from '../store/sessionStore'
 
-function TypingIndicator() {
+function TypingIndicator({ status }) {
     return (
         <div style={{ display: 'flex', alignItems: 'center', gap: 4, padding: '10px 14px' }}>
-            <span style={{ fontSize: 11, color: 'var(--text-tertiary)', marginRight: 6 }}>NBC Coach is thinking…</span>
+            <span style={{ fontSize: 11, color: 'var(--text-tertiary)', marginRight: 6 }}>{status || 'NBC Coach is thinking…'}</span>
             {[0, 1, 2].map(i => (
                 <motion.div key={i} style={{
                     width: 6, height: 6, borderRadius: '50%',
@@ -55,10 +55,19 @@ export default function ChatPanel({ isOpen, onClose }) {
         setLoading(true)
 
         try {
-            const history = messages.filter(m => m.role !== 'system')
-            const res = await api.chat(sessionId, text, history)
-            const agentMsg = { role: 'assistant', content: res.response }
-            setMessages(prev => [...prev, agentMsg])
+            // Stream the reply into a placeholder message as tokens arrive
+            setMessages(prev => [...prev, { role: 'assistant', content: '', streaming: true }])
+            const updateStreaming = (fn) => setMessages(prev => prev.map(m => (m.streaming ? fn(m) : m)))
+            // The server keeps the conversation, so no history is sent
+            const res = await api.chatStream(sessionId, text, [], (event) => {
+                if (event.type === 'token') {
+                    updateStreaming(m => ({ ...m, content: m.content + event.content, status: null }))
+                } else if (event.type === 'tool_start') {
+                    // Text before a tool call is scratch work; the answer follows the tool
+                    updateStreaming(m => ({ ...m, content: '', status: `Checking ${event.name.replace(/_/g, ' ')}…` }))
+                }
+            })
+            updateStreaming(() => ({ role: 'assistant', content: res.response }))
             setTurnCount(res.turn_count)
 
             if (res.updated_report) {
@@ -70,7 +79,7 @@ export default function ChatPanel({ isOpen, onClose }) {
                 setTimeout(() => setOnboardingDone(true), 3000)
             }
         } catch (e) {
-            setMessages(prev => [...prev, {
+            setMessages(prev => [...prev.filter(m => !m.streaming), {
                 role: 'assistant',
                 content: `I encountered an error: ${e.message}. Please try again.`,
             }])
@@ -172,6 +181,8 @@ export default function ChatPanel({ isOpen, onClose }) {
                     {/* Messages */}
                     <div style={{ flex: 1, overflowY: 'auto', padding: '16px 16px 0' }}>
                         {messages.map((msg, i) => {
+                            // An empty streaming placeholder is covered by the typing indicator
+                            if (msg.streaming && !msg.content) return null
                             const isUser = msg.role === 'user'
                             const isQuestion = !isUser && isEndsWithQuestion(msg.content)
                             return (
@@ -211,13 +222,13 @@ export default function ChatPanel({ isOpen, onClose }) {
                             )
                         })}
 
-                        {loading && (
+                        {loading && !messages.some(m => m.streaming && m.content) && (
                             <motion.div
                                 initial={{ opacity: 0 }}
                                 animate={{ opacity: 1 }}
                                 style={{ marginBottom: 12 }}
                             >
-                                <TypingIndicator />
+                                <TypingIndicator status={messages.find(m => m.streaming)?.status} />
                             </motion.div>
                         )}
 
@@ -6,24 +6,15 @@ import { useMemo } from 'react'
 export default function DrawdownChart({ trades }) {
     const data = useMemo(() => {
         if (!trades?.length) return []
-        // Sample for large datasets (max 500 points for chart)
-        let displayTrades = trades
-        if (trades.length > 500) {
-            const step = Math.ceil(trades.length / 500)
-            displayTrades = trades.filter((_, i) => i % step === 0)
-        }
-        let peak = displayTrades[0]?.balance || 0
-        return displayTrades.map((t, i) => {
-            if (t.balance > peak) peak = t.balance
-            const drawdown = peak > 0 ? ((peak - t.balance) / peak) * 100 : 0
-            return {
-                idx: i + 1,
-                balance: parseFloat(t.balance.toFixed(2)),
-                peak: parseFloat(peak.toFixed(2)),
-                drawdown: parseFloat(drawdown.toFixed(2)),
-                timestamp: new Date(t.timestamp).toLocaleDateString(),
-            }
-        })
+        // Trades arrive already downsampled by the server, with running peak/drawdown precomputed
+        // (drawdown_pct as a fraction; shown in percent)
+        return trades.map(t => ({
+            idx: t.idx,
+            balance: parseFloat((t.balance ?? 0).toFixed(2)),
+            peak: parseFloat((t.peak ?? 0).toFixed(2)),
+            drawdown: parseFloat(((t.drawdown_pct ?? 0) * 100).toFixed(2)),
+            timestamp: new Date(t.timestamp).toLocaleDateString(),
+        }))
     }, [trades])
 
     const maxDrawdown = data.length ? Math.max(...data.map(d => d.drawdown)) : 0
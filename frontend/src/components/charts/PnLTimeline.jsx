@@ -6,22 +6,14 @@ import { useMemo } from 'react'
 export default function PnLTimeline({ trades }) {
     const data = useMemo(() => {
         if (!trades?.length) return []
-        // Sample for large datasets (max 500 points for chart)
-        let displayTrades = trades
-        if (trades.length > 500) {
-            const step = Math.ceil(trades.length / 500)
-            displayTrades = trades.filter((_, i) => i % step === 0)
-        }
-        let cumulative = 0
-        return displayTrades.map((t, i) => {
-            cumulative += t.profit_loss
-            return {
-                idx: i + 1,
-                pnl: parseFloat(cumulative.toFixed(2)),
-                trade_pl: t.profit_loss,
-                timestamp: new Date(t.timestamp).toLocaleDateString(),
-            }
-        })
+        // Trades arrive already downsampled by the server, with cumulative P&L precomputed;
+        // missing values count as 0
+        return trades.map(t => ({
+            idx: t.idx,
+            pnl: parseFloat((t.cum_pnl ?? 0).toFixed(2)),
+            trade_pl: t.profit_loss ?? 0,
+            timestamp: new Date(t.timestamp).toLocaleDateString(),
+        }))
     }, [trades])
 
     const CustomTooltip = ({ active, payload }) => {
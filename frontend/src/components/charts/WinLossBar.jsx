@@ -7,12 +7,8 @@ export default function WinLossBar({ report }) {
 
     const { summary_stats } = report
     const { win_count, loss_count } = summary_stats
-
-    const trades = report.trades || []
-    const wins = trades.filter(t => t.profit_loss > 0).map(t => t.profit_loss)
-    const losses = trades.filter(t => t.profit_loss < 0).map(t => Math.abs(t.profit_loss))
-    const avgWin = wins.length ? wins.reduce((a, b) => a + b, 0) / wins.length : 0
-    const avgLoss = losses.length ? losses.reduce((a, b) => a + b, 0) / losses.length : 0
+    const avgWin = summary_stats.avg_win || 0
+    const avgLoss = summary_stats.avg_loss || 0
 
     const data = [
         { name: 'Avg Win', value: parseFloat(avgWin.toFixed(2)), color: '#3dd68c' },
@@ -23,6 +23,7 @@ export default function Dashboard() {
     const [activeNav, setActiveNav] = useState('overview')
     const [chatOpen, setChatOpen] = useState(false)
     const [loading, setLoading] = useState(false)
+    const [trades, setTrades] = useState([])
     const navigate = useNavigate()
 
     useEffect(() => {
@@ -39,6 +40,17 @@ export default function Dashboard() {
         }
     }, [sessionId])
 
+    useEffect(() => {
+        if (!sessionId || !report) return
+        api.getTrades(sessionId, {
+            points: 500,
+            y: 'balance',
+            columns: 'timestamp,profit_loss,balance,cum_pnl,peak,drawdown_pct',
+        })
+            .then(page => setTrades(page.trades))
+            .catch(() => setTrades([]))
+    }, [sessionId, report?.generated_at])
+
     if (loading && !report) {
         return (
             <div style={{
@@ -73,8 +85,6 @@ export default function Dashboard() {
         )
     }
 
-    const trades = report.trades || []
-
     return (
         <div style={{ minHeight: '100vh', display: 'flex', flexDirection: 'column', background: 'var(--bg-primary)' }}>
             {/* Top navbar */}